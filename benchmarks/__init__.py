@@ -0,0 +1,17 @@
+"""
+Benchmarks for Photo Manager
+Generates synthetic libraries under a temp dir and times the library operations
+the app spends its time in, writing the results as JSON so they can be compared
+across releases:
+
+    python -m benchmarks --sizes 1000 10000 --output bench.json
+    python -m benchmarks --sizes 1000 --compare bench.json
+"""
+
+import os
+import sys
+
+# The app's modules are flat files in src/ (imported as `import config`)
+SRC_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src")
+if SRC_FOLDER not in sys.path:
+    sys.path.insert(0, os.path.normpath(SRC_FOLDER))
@@ -0,0 +1,93 @@
+"""Command-line runner: python -m benchmarks --sizes 1000 10000 --output bench.json"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+from benchmarks.suite import run_size
+from benchmarks.synthetic_library import generate_library
+
+
+def git_commit():
+    """Commit of the benchmarked tree (None outside a git checkout)"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline_file):
+    """Print each case's time relative to a baseline report (ratio > 1 = slower)"""
+    with open(baseline_file, "r") as f:
+        baseline = {
+            (row["size"], row["name"]): row["seconds"]
+            for row in json.load(f)["results"]
+        }
+    for row in report["results"]:
+        before = baseline.get((row["size"], row["name"]))
+        if before:
+            print(
+                f"{row['size']:>8} {row['name']:<28} {before:12.6f}s -> "
+                f"{row['seconds']:12.6f}s  x{row['seconds'] / before:.2f}",
+                file=sys.stderr,
+            )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Photo Manager benchmarks")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1000], help="Library sizes to run"
+    )
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--compare", help="Baseline JSON report to compare against")
+    parser.add_argument(
+        "--keep", action="store_true", help="Keep the generated libraries"
+    )
+    args = parser.parse_args(argv)
+
+    report = {
+        "commit": git_commit(),
+        "created": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": [],
+    }
+    root = tempfile.mkdtemp(prefix="photo_bench_")
+    try:
+        for size in args.sizes:
+            for name, seconds, calls in run_size(root, size, generate_library):
+                report["results"].append(
+                    {"size": size, "name": name, "seconds": seconds, "calls": calls}
+                )
+                print(f"{size:>8} {name:<28} {seconds:12.6f}s", file=sys.stderr)
+    finally:
+        if args.keep:
+            print(f"Libraries kept in {root}", file=sys.stderr)
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    if args.compare:
+        compare(report, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
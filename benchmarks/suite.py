@@ -0,0 +1,132 @@
+"""
+Benchmark cases for Photo Manager
+Each case times one library operation on a synthetic library of a given size.
+The UI's entry points are measured through the headless functions they call:
+sync_files -> sync_library, get_weighted_selection_from_list ->
+weighted_selection, create_photo_display -> cached_thumbnail for the summary
+photos, add/remove prefix -> plan_prefix_renames + apply_renames.
+"""
+
+import os
+import random
+import shutil
+import time
+from contextlib import redirect_stdout
+
+import config
+from library_sync import sync_library
+from metadata_manager import MetadataManager
+from pair_selection import comparison_pool, weighted_selection
+from rename_planner import apply_renames, plan_prefix_renames
+from thumbnails import cached_thumbnail
+
+SELECTIONS = 1000  # weighted_selection calls per run
+VOTES = 1000  # update_skills calls per run
+MOVED_FRACTION = 0.01  # Share of files renamed behind the app's back before a sync
+
+
+def _open(folder, opened):
+    manager = MetadataManager(folder)
+    manager.load_metadata()
+    opened.append(manager)
+    return manager
+
+
+def _timed(func, calls=1):
+    """Seconds per call of func() (run once; func makes `calls` calls itself)"""
+    start = time.perf_counter()
+    func()
+    return (time.perf_counter() - start) / calls
+
+
+def run_cases(folder):
+    """Time every case on the library in folder, in an order where each case
+    leaves the library ready for the next. Returns [(name, seconds, calls)]."""
+    results = []
+    opened = []  # Flushed at the end, before the library can be deleted
+
+    def record(name, func, calls=1):
+        results.append((name, _timed(func, calls), calls))
+
+    # Loading: the first load builds the hash and fingerprint caches
+    record("load_metadata_cold", lambda: _open(folder, opened))
+    record("load_metadata_warm", lambda: _open(folder, opened))
+    manager = _open(folder, opened)
+
+    def save():
+        manager.metadata.mark_dirty()
+        manager.save_metadata()
+        manager.flush()
+
+    record("save_metadata", save)
+
+    relative_paths = sorted(manager.metadata.keys())
+    rng = random.Random(0)
+    pairs = [rng.sample(relative_paths, 2) for _ in range(VOTES)]
+
+    def vote():
+        for a, b in pairs:
+            manager.update_skills(a, b, "left")
+        manager.flush()
+
+    record("update_skills", vote, VOTES)
+
+    photo_ids, _ = comparison_pool(manager, relative_paths)
+
+    def select():
+        for _ in range(SELECTIONS):
+            weighted_selection(manager, photo_ids)
+
+    record("weighted_selection", select, SELECTIONS)
+
+    record("sync_library_unchanged", lambda: sync_library(manager))
+    moved = rng.sample(relative_paths, int(len(relative_paths) * MOVED_FRACTION))
+    for relative_path in moved:
+        folder_part, filename = os.path.split(relative_path)
+        os.rename(
+            os.path.join(folder, relative_path),
+            os.path.join(folder, folder_part, "moved_" + filename),
+        )
+    record("sync_library_moved", lambda: sync_library(manager))
+
+    # Summary page thumbnails (worst photos first, as create_photo_display shows)
+    shutil.rmtree(os.path.join(folder, config.THUMBNAIL_CACHE_FOLDER), True)
+    summary = []
+    for relative_path in manager.iter_ranked_photos(worst_first=True):
+        summary.append(relative_path)
+        if len(summary) >= config.SUMMARY_PHOTOS_COUNT:
+            break
+
+    def thumbnails():
+        for relative_path in summary:
+            cached_thumbnail(folder, relative_path, config.SUMMARY_THUMBNAIL_SIZE)
+
+    record("summary_thumbnails_cold", thumbnails, len(summary))
+    record("summary_thumbnails_warm", thumbnails, len(summary))
+
+    for add_prefix in (True, False):
+        action = "add_prefix" if add_prefix else "remove_prefix"
+        planned = []
+        record(
+            f"plan_{action}",
+            lambda: planned.extend(plan_prefix_renames(manager, add_prefix)[0]),
+        )
+        record(
+            f"apply_{action}",
+            lambda: apply_renames(manager, planned),
+            max(1, len(planned)),
+        )
+
+    for opened_manager in opened:
+        opened_manager.flush()
+    return results
+
+
+def run_size(root, size, generate):
+    """Generate a library of size files under root and run every case on it.
+    Library output is discarded so it does not swamp the results."""
+    folder = os.path.join(root, f"library_{size}")
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        generate_seconds = _timed(lambda: generate(folder, size))
+        results = run_cases(folder)
+    return [("generate_library", generate_seconds, 1)] + results
@@ -0,0 +1,107 @@
+"""
+Synthetic photo libraries for the benchmarks
+Small random-noise JPEGs (every photo has distinct content, so fingerprints and
+perceptual hashes behave like a real library) and a few tiny MP4s spread over
+year/month folders, plus a prebuilt .photo_metadata.json with rated entries.
+generate_metadata() writes only the metadata, for the rating hot path at sizes
+where writing the files would dominate (load it with load_metadata(scan=False)).
+"""
+
+import json
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+
+IMAGE_SIZE = (48, 32)
+VIDEO_SIZE = (32, 32)
+VIDEO_FRAMES = 3
+VIDEO_EVERY = 50  # One MP4 per this many files
+YEARS = range(2015, 2025)
+
+
+def library_paths(count):
+    """Relative paths of a synthetic library: YYYY/MM/IMG_NNNNNN.jpg with every
+    VIDEO_EVERY-th file a VID_NNNNNN.mp4"""
+    folders = [f"{year}/{month:02d}" for year in YEARS for month in range(1, 13)]
+    paths = []
+    for i in range(count):
+        folder = folders[i % len(folders)]
+        if i % VIDEO_EVERY == VIDEO_EVERY - 1:
+            paths.append(f"{folder}/VID_{i:06d}.mp4")
+        else:
+            paths.append(f"{folder}/IMG_{i:06d}.jpg")
+    return paths
+
+
+def _write_jpeg(path, rng):
+    from PIL import Image
+
+    width, height = IMAGE_SIZE
+    pixels = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    Image.fromarray(pixels).save(path, "JPEG", quality=80)
+
+
+def _write_mp4(path, rng):
+    import cv2
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 5, VIDEO_SIZE)
+    width, height = VIDEO_SIZE
+    for _ in range(VIDEO_FRAMES):
+        writer.write(rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8))
+    writer.release()
+
+
+def metadata_entries(relative_paths, rng):
+    """Prebuilt metadata: random skills and comparison counts, as the app stores them"""
+    start = datetime(2024, 1, 1)
+    skills = rng.normal(0, 1.5, len(relative_paths))
+    comparisons = rng.poisson(4, len(relative_paths))
+    metadata = {}
+    for i, relative_path in enumerate(relative_paths):
+        compared = int(comparisons[i]) > 0
+        metadata[relative_path] = {
+            "keep": None,
+            "rating": None,
+            "tags": [],
+            "last_compared": (
+                (start + timedelta(minutes=i)).isoformat() if compared else None
+            ),
+            "created_date": start.isoformat(),
+            "skill": float(skills[i]) if compared else 0,
+            "comparisons": int(comparisons[i]),
+            "epoch": 0,
+        }
+    return metadata
+
+
+def generate_library(root, count, seed=0, metadata=True):
+    """Create a library of count files under root (which must not exist yet).
+    Returns the relative paths."""
+    rng = np.random.default_rng(seed)
+    relative_paths = library_paths(count)
+    for folder in sorted({os.path.dirname(path) for path in relative_paths}):
+        os.makedirs(os.path.join(root, folder))
+
+    for relative_path in relative_paths:
+        full_path = os.path.join(root, relative_path)
+        if relative_path.endswith(".mp4"):
+            _write_mp4(full_path, rng)
+        else:
+            _write_jpeg(full_path, rng)
+
+    if metadata:
+        with open(os.path.join(root, ".photo_metadata.json"), "w") as f:
+            json.dump(metadata_entries(relative_paths, rng), f, indent=2)
+    return relative_paths
+
+
+def generate_metadata(root, count, seed=0):
+    """Create root with only the .photo_metadata.json of a count-file library
+    (the files themselves don't exist). Returns the relative paths."""
+    rng = np.random.default_rng(seed)
+    relative_paths = library_paths(count)
+    os.makedirs(root)
+    with open(os.path.join(root, ".photo_metadata.json"), "w") as f:
+        json.dump(metadata_entries(relative_paths, rng), f)
+    return relative_paths
@@ -0,0 +1,92 @@
+"""
+Logging for Photo Manager
+Modules log through loggers under "photo_manager" instead of printing. Messages
+use %-style arguments, so a message below the active level costs one level check
+and is never formatted. Per-file lines (added, removed, migrated, ...) go to
+the "photo_manager.files" logger, which stays silent unless
+config.VERBOSE_FOLDER_EXPLORATION or DEBUG_MODE is set; each operation reports a
+FileSummary line such as "Added 12,304 files to metadata" instead.
+"""
+
+import logging
+import sys
+import time
+
+import config
+
+ROOT_LOGGER = "photo_manager"
+
+
+def get_logger(name):
+    """Logger for a module (pass __name__)"""
+    return logging.getLogger(ROOT_LOGGER).getChild(name)
+
+
+file_log = get_logger("files")  # One line per file; quiet unless verbose
+
+
+def setup_logging(stream=None):
+    """Send the app's log to stderr (or stream) with the levels from config.
+    Without this only warnings and errors reach the console (Python's default),
+    which suits scripts and benchmarks."""
+    root = logging.getLogger(ROOT_LOGGER)
+    if root.handlers:
+        return
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    root.addHandler(handler)
+    root.propagate = False
+    root.setLevel(logging.DEBUG if config.DEBUG_MODE else logging.INFO)
+
+    verbose = config.DEBUG_MODE or config.VERBOSE_FOLDER_EXPLORATION
+    file_log.setLevel(logging.DEBUG if verbose else logging.INFO)
+
+
+class FileSummary:
+    """Counts the files one operation acted on: each is logged to the files
+    logger (only formatted when verbose) and done() logs one summary line"""
+
+    def __init__(self, logger, action, target="files"):
+        self.logger = logger
+        self.action = action  # e.g. "Added"
+        self.target = target  # e.g. "files to metadata"
+        self.count = 0
+        self._verbose = file_log.isEnabledFor(logging.DEBUG)
+
+    def add(self, relative_path, detail=None):
+        self.count += 1
+        if self._verbose:
+            if detail is None:
+                file_log.debug("  %s: %s", self.action, relative_path)
+            else:
+                file_log.debug("  %s: %s -> %s", self.action, relative_path, detail)
+
+    def done(self):
+        """Log the summary (nothing if no file was counted). Returns the count."""
+        if self.count:
+            self.logger.info("%s %s %s", self.action, f"{self.count:,}", self.target)
+        return self.count
+
+
+class RateLimited:
+    """Logs at most one message per interval and counts the ones it held back,
+    for per-file warnings that can repeat thousands of times (an unreadable
+    share, a corrupt folder)"""
+
+    def __init__(self, logger, interval=config.LOG_RATE_LIMIT_SECONDS):
+        self.logger = logger
+        self.interval = interval
+        self._last = None
+        self.suppressed = 0
+
+    def warning(self, message, *args):
+        now = time.monotonic()
+        if self._last is not None and now - self._last < self.interval:
+            self.suppressed += 1
+            return
+        self._last = now
+        if self.suppressed:
+            message += " (%d similar messages suppressed)"
+            args += (self.suppressed,)
+            self.suppressed = 0
+        self.logger.warning(message, *args)
@@ -0,0 +1,131 @@
+"""
+Background library scanning for Photo Manager
+Walks the library and refreshes the perceptual hash and fingerprint caches on a
+worker thread, streaming progress through a queue. For the initial scan the
+worker also reads and replays the comparison logs (LogMerger.prepare), using
+priors copied before it started. The worker never reads or writes the
+metadata: the UI thread drains the queue (poll()) and applies the finished scan
+with apply(), which only does in-memory work, so the window stays responsive
+even on large or network folders.
+"""
+
+import queue
+import threading
+import time
+
+import config
+from app_logging import get_logger
+from comparison_merge import LogMerger, snapshot_priors
+from content_fingerprint import FingerprintCache
+from image_hash import PerceptualHashCache
+from library_sync import sync_library
+
+log = get_logger(__name__)
+
+PROGRESS_INTERVAL_SECONDS = 0.1  # At most this often per progress message
+
+
+class LibraryScan:
+    """One scan of a manager's library. initial=True also runs the load-time
+    reconciliation (migration, moved files, log merge) that load_metadata(scan=False)
+    left out."""
+
+    def __init__(self, manager, initial=False):
+        self.manager = manager
+        self.initial = initial
+        self.messages = queue.Queue()
+        self.status = "Scanning library..."
+        self.files_found = 0
+        self.started = None
+        self.finished = False
+        self._result = None  # (relative_paths, hash_cache, fingerprints, merge)
+        self._error = None
+        self._merger = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        if self.initial and config.MERGE_LOGS_ON_LOAD:
+            priors = snapshot_priors(self.manager)
+            self._merger = LogMerger(self.manager, priors=priors)
+        threading.Thread(target=self._run, daemon=True).start()
+        return self
+
+    def _run(self):
+        """Worker thread: walk the folder, then refresh the caches for what it found"""
+        last_report = [0.0]
+
+        def progress(files_found):
+            now = time.perf_counter()
+            if now - last_report[0] >= PROGRESS_INTERVAL_SECONDS:
+                last_report[0] = now
+                self.messages.put(("progress", files_found))
+
+        try:
+            relative_paths = self.manager.scan_files(progress)
+            self.messages.put(("scanned", len(relative_paths)))
+
+            # Fresh cache objects: the UI thread keeps reading the manager's own
+            # caches (duplicate counts, clusters) while these are being updated
+            photo_folder = self.manager.photo_folder
+            hash_cache = PerceptualHashCache(photo_folder)
+            if config.ENABLE_PERCEPTUAL_HASHING:
+                hash_cache.update(relative_paths)
+            fingerprints = FingerprintCache(photo_folder, config.FINGERPRINT_WORKERS)
+            if config.ENABLE_CONTENT_FINGERPRINTS:
+                fingerprints.update(relative_paths)
+
+            # Replaying the logs can take a while after a reset or an undo
+            merge = None
+            if self._merger:
+                self.messages.put(("merging", None))
+                merge = self._merger.prepare()
+
+            self.messages.put(
+                ("done", (relative_paths, hash_cache, fingerprints, merge))
+            )
+        except Exception as e:
+            self.messages.put(("error", e))
+
+    def poll(self):
+        """Drain the worker's messages (UI thread). Returns True once the scan has
+        finished, successfully or not; status and files_found are kept current."""
+        while True:
+            try:
+                kind, value = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "progress":
+                self.files_found = value
+                self.status = f"Scanning library... {value} files found"
+            elif kind == "scanned":
+                self.files_found = value
+                self.status = f"Checking {value} files for changes..."
+            elif kind == "merging":
+                self.status = "Merging comparison logs..."
+            elif kind == "done":
+                self._result = value
+                self.finished = True
+            else:
+                self._error = value
+                self.finished = True
+        return self.finished
+
+    def apply(self):
+        """Apply the finished scan to the metadata (UI thread).
+        Returns the sync_library() result; raises the worker's error if it failed."""
+        if self._error is not None:
+            raise self._error
+
+        relative_paths, hash_cache, fingerprints, merge = self._result
+        self.manager.adopt_scan_caches(hash_cache, fingerprints)
+        if self.initial:
+            self.manager.reconcile_files(
+                relative_paths, compute_caches=False, prepared_merge=merge
+            )
+        result = sync_library(self.manager, relative_paths, compute_caches=False)
+        log.info(
+            "Library scan finished in %.2fs (%d files)",
+            time.perf_counter() - self.started,
+            len(relative_paths),
+        )
+        return result
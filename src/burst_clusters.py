@@ -0,0 +1,73 @@
+"""
+Burst detection for cluster-first comparison sessions
+Groups photos taken close together in the same folder and merges them with
+the near-duplicate clusters found by perceptual hashing
+"""
+
+import os
+
+
+def find_time_bursts(photo_folder, relative_paths, window_seconds):
+    """Group photos in the same folder whose timestamps are within window_seconds
+    of the previous photo. Returns a list of bursts (lists of relative paths)."""
+    by_folder = {}
+    for relative_path in relative_paths:
+        try:
+            mtime = os.stat(os.path.join(photo_folder, relative_path)).st_mtime
+        except OSError:
+            continue
+        by_folder.setdefault(os.path.dirname(relative_path), []).append(
+            (mtime, relative_path)
+        )
+
+    bursts = []
+    for entries in by_folder.values():
+        entries.sort()
+        current = [entries[0][1]]
+        last_time = entries[0][0]
+
+        for mtime, relative_path in entries[1:]:
+            if mtime - last_time <= window_seconds:
+                current.append(relative_path)
+            else:
+                if len(current) > 1:
+                    bursts.append(current)
+                current = [relative_path]
+            last_time = mtime
+
+        if len(current) > 1:
+            bursts.append(current)
+
+    return bursts
+
+
+def merge_clusters(*cluster_lists):
+    """Merge overlapping clusters from several sources into disjoint clusters,
+    largest first. Clusters with fewer than two photos are dropped."""
+    parent = {}
+
+    def find(path):
+        while parent[path] != path:
+            parent[path] = parent[parent[path]]
+            path = parent[path]
+        return path
+
+    for clusters in cluster_lists:
+        for cluster in clusters:
+            if not cluster:
+                continue
+            for path in cluster:
+                parent.setdefault(path, path)
+            root = find(cluster[0])
+            for path in cluster[1:]:
+                other = find(path)
+                if other != root:
+                    parent[other] = root
+
+    groups = {}
+    for path in parent:
+        groups.setdefault(find(path), []).append(path)
+
+    merged = [sorted(paths) for paths in groups.values() if len(paths) > 1]
+    merged.sort(key=len, reverse=True)
+    return merged
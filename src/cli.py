@@ -0,0 +1,409 @@
+"""
+Command-line interface for Photo Manager
+Runs library jobs without a display, e.g. scheduled on a NAS:
+
+    python cli.py stats /photos
+    python cli.py --format csv sync /photos
+    python cli.py add-prefix /photos --dry-run
+    python cli.py add-prefix /photos --bucket 5 --hysteresis 1 --estimate
+    python cli.py renames /photos --rollback
+    python cli.py export /photos --count 100 --copy-to /photos/review
+    python cli.py link /photos --bucket 5
+    python cli.py cull /photos --delete-below 5 --dry-run
+
+Results go to stdout (or --output) as JSON or CSV; progress and the library's
+own log messages go to stderr so the output can be piped.
+"""
+
+import argparse
+import csv
+import json
+import os
+import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+
+import config
+from app_logging import setup_logging
+from culling import apply_cull, plan_cull
+from library_sync import sync_library
+from link_export import LINK_MODES, export_links
+from photo_core import open_library
+from rename_planner import (
+    apply_renames,
+    estimate_rename_cost,
+    pending_renames,
+    plan_prefix_renames,
+    resume_renames,
+    rollback_renames,
+)
+from thumbnails import cached_thumbnail
+
+
+def progress(done, total, label=""):
+    """Overwrite a single progress line on stderr"""
+    sys.stderr.write(f"\r{done}/{total} {label[:60]:<60}")
+    if done >= total:
+        sys.stderr.write("\n")
+    sys.stderr.flush()
+
+
+def photo_rows(manager, relative_paths):
+    """Output rows (one dict per photo) for the given relative paths"""
+    return [
+        {
+            "path": relative_path,
+            "skill": round(manager.get_skill(relative_path), 4),
+            "quantile": round(manager.get_quantile(relative_path), 2),
+            "comparisons": manager.get_comparisons(relative_path),
+        }
+        for relative_path in relative_paths
+    ]
+
+
+def cmd_scan(manager, args):
+    """List the supported files found in the library"""
+    return [{"path": relative_path} for relative_path in sorted(manager.scan_files())]
+
+
+def cmd_sync(manager, args):
+    """Bring the metadata in line with the files on disk"""
+    result = sync_library(manager)
+    return {
+        "added": len(result["added"]),
+        "removed": len(result["removed"]),
+        "reattached": result["reattached"],
+        "transferred": result["transferred"],
+        "duplicates_removed": result["duplicates_removed"],
+    }
+
+
+def cmd_stats(manager, args):
+    """Library totals and the quantile distribution"""
+    paths = list(manager.metadata.keys())
+    comparisons = [manager.get_comparisons(path) for path in paths]
+    deciles = [0] * 10
+    for path in paths:
+        deciles[min(int(manager.get_quantile(path) // 10), 9)] += 1
+
+    return {
+        "photos": len(paths),
+        "rated": sum(1 for count in comparisons if count > 0),
+        "comparisons": sum(comparisons) // 2,
+        "rating_epoch": manager.rating_epoch,
+        "exact_duplicate_groups": len(manager.get_exact_duplicates()),
+        "quantile_deciles": deciles,
+    }
+
+
+def _rename(manager, args, add_prefix):
+    """Shared body of add-prefix and remove-prefix"""
+    renames, unchanged = plan_prefix_renames(
+        manager, add_prefix, args.bucket, args.hysteresis
+    )
+    if args.estimate:
+        return estimate_rename_cost(manager, renames, unchanged)
+
+    rows = [{"old": old, "new": new, "status": "planned"} for old, new in renames]
+    if args.dry_run or not renames:
+        return rows
+
+    _, failed = apply_renames(
+        manager,
+        renames,
+        progress=lambda i, total, path: progress(i + 1, total, path),
+    )
+    errors = dict(failed)
+    for row in rows:
+        row["status"] = (
+            f"failed: {errors[row['old']]}" if row["old"] in errors else "ok"
+        )
+    return rows
+
+
+def cmd_renames(manager, args):
+    """Finish (or with --rollback undo) an interrupted rename job"""
+    recover = rollback_renames if args.rollback else resume_renames
+    outcome = recover(
+        manager, progress=lambda i, total, path: progress(i + 1, total, path)
+    )
+    count, failed = outcome or (0, [])
+    # The library was opened without a scan so half-renamed files were left alone
+    manager.reconcile_files(manager.scan_files())
+    return {
+        "action": "rollback" if args.rollback else "resume",
+        "files": count,
+        "failed": [{"path": path, "error": error} for path, error in failed],
+    }
+
+
+def cmd_add_prefix(manager, args):
+    """Rename files to QXXX_<name> using their current quantile"""
+    return _rename(manager, args, add_prefix=True)
+
+
+def cmd_remove_prefix(manager, args):
+    """Strip QXXX_ prefixes from file names"""
+    return _rename(manager, args, add_prefix=False)
+
+
+def cmd_cull(manager, args):
+    """Move confidently bottom/top-rated photos to delete/ and keep/"""
+    plan = plan_cull(
+        manager, args.delete_below, args.keep_above, args.z, args.min_comparisons
+    )
+    rows = []
+    for band in ("delete", "keep"):
+        for row in photo_rows(manager, plan[band]):
+            row["move_to"] = band
+            row["status"] = "planned"
+            rows.append(row)
+    if args.dry_run or not rows:
+        return rows
+
+    _, failed = apply_cull(
+        manager, plan, progress=lambda i, total, path: progress(i + 1, total, path)
+    )
+    errors = dict(failed)
+    for row in rows:
+        row["status"] = (
+            f"failed: {errors[row['path']]}" if row["path"] in errors else "ok"
+        )
+    return rows
+
+
+def cmd_thumbnails(manager, args):
+    """Pre-generate the summary thumbnail cache"""
+    relative_paths = sorted(manager.metadata.keys())
+    size = (args.size, args.size)
+
+    def render(relative_path):
+        try:
+            cached_thumbnail(manager.photo_folder, relative_path, size)
+            return None
+        except Exception as e:  # Corrupt or unreadable file
+            return str(e)
+
+    rows = []
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        for i, (relative_path, error) in enumerate(
+            zip(relative_paths, executor.map(render, relative_paths))
+        ):
+            progress(i + 1, len(relative_paths), relative_path)
+            if error:
+                rows.append({"path": relative_path, "error": error})
+    return rows
+
+
+def cmd_export(manager, args):
+    """The worst (or best) N photos, optionally copied to a folder"""
+    ranked = manager.iter_ranked_photos(worst_first=not args.best)
+    selected = []
+    for relative_path in ranked:
+        if len(selected) >= args.count:
+            break
+        if os.path.exists(os.path.join(manager.photo_folder, relative_path)):
+            selected.append(relative_path)
+
+    rows = photo_rows(manager, selected)
+    if args.copy_to:
+        os.makedirs(args.copy_to, exist_ok=True)
+        for i, row in enumerate(rows):
+            progress(i + 1, len(rows), row["path"])
+            target = os.path.join(args.copy_to, row["path"].replace("/", "__"))
+            shutil.copy2(os.path.join(manager.photo_folder, row["path"]), target)
+            row["copy"] = target
+    return rows
+
+
+def cmd_link(manager, args):
+    """Update the ranked view of hardlinks/symlinks named by quantile"""
+    result = export_links(
+        manager,
+        args.to,
+        args.mode,
+        args.bucket,
+        args.hysteresis,
+        progress=lambda i, total, name: progress(i + 1, total, name),
+    )
+    result["failed"] = [
+        {"link": name, "error": error} for name, error in result["failed"]
+    ]
+    return result
+
+
+def cmd_replay(manager, args):
+    """Recompute ratings by replaying the comparison log"""
+    replayed, skipped = manager.replay_comparisons(epoch=args.epoch, k_0=args.k)
+    return {
+        "replayed": replayed,
+        "skipped": skipped,
+        "rating_epoch": manager.rating_epoch,
+    }
+
+
+def cmd_merge(manager, args):
+    """Merge comparison logs from every device into the ratings"""
+    # open_library already merges when config.MERGE_LOGS_ON_LOAD is set
+    return {"merged": manager.merge_comparison_logs()}
+
+
+def cmd_serve(manager, args):
+    """Serve pairs to browsers for multi-user voting until interrupted"""
+    from rating_server import serve
+
+    return serve(manager, args.host, args.port)
+
+
+def write_output(result, output_format, stream):
+    """Write a command result as JSON, or as CSV (a dict becomes one row)"""
+    if output_format == "json":
+        json.dump(result, stream, indent=2)
+        stream.write("\n")
+        return
+
+    rows = [result] if isinstance(result, dict) else result
+    fieldnames = []
+    for row in rows:
+        fieldnames.extend(key for key in row if key not in fieldnames)
+    writer = csv.DictWriter(stream, fieldnames=fieldnames)
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def build_parser():
+    """Argument parser with one subcommand per job"""
+    parser = argparse.ArgumentParser(description="Photo Manager batch operations")
+    parser.add_argument("--format", choices=["json", "csv"], default="json")
+    parser.add_argument("--output", help="Write results to a file instead of stdout")
+    parser.add_argument(
+        "--shards",
+        nargs="+",
+        help="Only load these metadata shards (folders) when sharding is enabled",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_command(name, func):
+        command = commands.add_parser(name, help=func.__doc__)
+        command.add_argument("folder", help="Photo library folder")
+        command.set_defaults(func=func)
+        return command
+
+    add_command("scan", cmd_scan)
+    # Loading without a scan leaves the added and removed files for sync to report
+    sync = add_command("sync", cmd_sync)
+    sync.set_defaults(scan=False)
+    add_command("stats", cmd_stats)
+    add_command("merge", cmd_merge)
+    renames = add_command("renames", cmd_renames)
+    renames.add_argument(
+        "--rollback", action="store_true", help="Restore the old names instead"
+    )
+    renames.set_defaults(scan=False)
+    for name, func in (
+        ("add-prefix", cmd_add_prefix),
+        ("remove-prefix", cmd_remove_prefix),
+    ):
+        rename = add_command(name, func)
+        rename.add_argument(
+            "--dry-run", action="store_true", help="Only list the planned renames"
+        )
+        rename.add_argument(
+            "--estimate",
+            action="store_true",
+            help="Only report the cost of the planned renames",
+        )
+        rename.add_argument(
+            "--bucket",
+            type=float,
+            default=config.PREFIX_BUCKET_SIZE,
+            help="Quantile points per prefix",
+        )
+        rename.add_argument(
+            "--hysteresis",
+            type=float,
+            default=config.PREFIX_HYSTERESIS,
+            help="Keep prefixes until the quantile leaves their bucket by this",
+        )
+
+    cull = add_command("cull", cmd_cull)
+    cull.add_argument(
+        "--dry-run", action="store_true", help="Only list the photos to move"
+    )
+    cull.add_argument("--delete-below", type=float, default=config.CULL_DELETE_QUANTILE)
+    cull.add_argument("--keep-above", type=float, default=config.CULL_KEEP_QUANTILE)
+    cull.add_argument(
+        "--z",
+        type=float,
+        default=config.CULL_CONFIDENCE_Z,
+        help="Confidence bound width in standard errors",
+    )
+    cull.add_argument(
+        "--min-comparisons", type=int, default=config.CULL_MIN_COMPARISONS
+    )
+
+    thumbnails = add_command("thumbnails", cmd_thumbnails)
+    thumbnails.add_argument(
+        "--size", type=int, default=config.SUMMARY_THUMBNAIL_SIZE[0]
+    )
+    thumbnails.add_argument("--workers", type=int, default=os.cpu_count())
+
+    export = add_command("export", cmd_export)
+    export.add_argument("--count", type=int, default=config.SUMMARY_PHOTOS_COUNT)
+    export.add_argument(
+        "--best", action="store_true", help="Export the best photos (default: worst)"
+    )
+    export.add_argument("--copy-to", help="Copy the exported photos to this folder")
+
+    link = add_command("link", cmd_link)
+    link.add_argument(
+        "--to", help=f"Export folder (default: <folder>/{config.EXPORT_FOLDER})"
+    )
+    link.add_argument("--mode", choices=LINK_MODES, default=config.EXPORT_LINK_MODE)
+    link.add_argument("--bucket", type=float, default=config.PREFIX_BUCKET_SIZE)
+    link.add_argument("--hysteresis", type=float, default=config.PREFIX_HYSTERESIS)
+
+    replay = add_command("replay", cmd_replay)
+    replay.add_argument("--epoch", type=int, help="Epoch to replay (default: current)")
+    replay.add_argument("--k", type=float, default=config.DEFAULT_K_VALUE)
+
+    server = add_command("serve", cmd_serve)
+    server.add_argument("--host", default=config.SERVER_HOST)
+    server.add_argument("--port", type=int, default=config.SERVER_PORT)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not os.path.isdir(args.folder):
+        print(f"Not a folder: {args.folder}", file=sys.stderr)
+        return 2
+
+    if args.func is not cmd_renames and pending_renames(args.folder):
+        print(
+            "An interrupted rename is pending; run the renames command first",
+            file=sys.stderr,
+        )
+        return 2
+
+    # Progress goes to the log on stderr; keep stdout for the results
+    setup_logging(sys.stderr)
+    with redirect_stdout(sys.stderr):
+        manager = open_library(
+            args.folder, shards=args.shards, scan=getattr(args, "scan", True)
+        )
+        result = args.func(manager, args)
+        manager.flush()
+
+    if args.output:
+        with open(args.output, "w", newline="") as f:
+            write_output(result, args.format, f)
+    else:
+        write_output(result, args.format, sys.stdout)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
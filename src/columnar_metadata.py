@@ -0,0 +1,530 @@
+"""
+Columnar in-memory metadata store for Photo Manager
+Keeps ratings in numpy arrays indexed by photo ID (see PathTable) instead of one
+dict per photo, with sparse side tables for the fields that are almost always
+at their defaults. A dict-like view keeps existing code working unchanged.
+"""
+
+import numbers
+from collections.abc import MutableMapping
+from datetime import datetime
+
+import numpy as np
+
+NO_TIME = np.iinfo(np.int64).min  # Timestamp column value meaning None
+
+# Dense numeric columns: key -> (dtype, default)
+NUMERIC_COLUMNS = {
+    "skill": (np.float64, 0.0),
+    "comparisons": (np.int32, 0),
+    "epoch": (np.int32, 0),
+    "prior_weight": (np.float32, 0.0),
+    "prior_skill": (np.float64, 0.0),
+}
+
+# Timestamps stored as int64 microseconds since the Unix epoch (local time)
+TIME_COLUMNS = ("created_date", "last_compared")
+
+# Sparse side tables: only photos with a non-default value have an entry
+SPARSE_FIELDS = ("keep", "rating", "tags")
+
+# Key order used for iteration and JSON output (matches the old dict layout)
+ENTRY_KEYS = (
+    "keep",
+    "rating",
+    "tags",
+    "last_compared",
+    "created_date",
+    "skill",
+    "comparisons",
+    "epoch",
+    "prior_weight",
+    "prior_skill",
+)
+
+# Columns left out of JSON output while at their default (absent means default)
+OMIT_WHEN_DEFAULT = ("prior_weight", "prior_skill")
+
+# Quality features (see quality_prior) stored as columns instead of a dict per photo
+QUALITY_COLUMNS = {
+    "sharpness": np.float32,
+    "dark_clip": np.float32,
+    "bright_clip": np.float32,
+    "pixels": np.int64,
+}
+QUALITY_ABSENT, QUALITY_FAILED, QUALITY_PRESENT = 0, 1, 2  # quality_state values
+
+# Fixed-width little-endian record holding every dense column (binary snapshots)
+RECORD_DTYPE = np.dtype(
+    [
+        (key, np.dtype(dtype).newbyteorder("<"))
+        for key, (dtype, _) in NUMERIC_COLUMNS.items()
+    ]
+    + [(key, "<i8") for key in TIME_COLUMNS]
+    + [
+        ("quality_" + key, np.dtype(dtype).newbyteorder("<"))
+        for key, dtype in QUALITY_COLUMNS.items()
+    ]
+    + [("quality_state", "i1")]
+)
+
+
+def _to_micros(value):
+    """Convert an ISO timestamp string to int64 microseconds (None if not storable)"""
+    if value is None:
+        return NO_TIME
+    if not isinstance(value, str):
+        return None
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if dt.tzinfo is not None:
+        return None  # Keep timezone-aware values verbatim in the overflow table
+    return round(dt.timestamp() * 1_000_000)
+
+
+def _from_micros(micros):
+    """Convert int64 microseconds back to the ISO string the app stores"""
+    if micros == NO_TIME:
+        return None
+    return datetime.fromtimestamp(micros / 1_000_000).isoformat()
+
+
+class EntryView(MutableMapping):
+    """Dict-like view of one photo's row in a ColumnarMetadata store"""
+
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store, row):
+        self._store = store
+        self._row = row
+
+    def __getitem__(self, key):
+        return self._store._get_field(self._row, key)
+
+    def __setitem__(self, key, value):
+        self._store._set_field(self._row, key, value)
+
+    def __delitem__(self, key):
+        self._store._del_field(self._row, key)
+
+    def edit_tags(self):
+        """The photo's tags as a list to edit in place (reads give a tuple)"""
+        return self._store._tags_for_update(self._row)
+
+    def __iter__(self):
+        yield from ENTRY_KEYS
+        if self._store._quality_state[self._row] != QUALITY_ABSENT:
+            yield "quality"
+        extra = self._store._extra.get(self._row)
+        if extra:
+            yield from (key for key in extra if key not in ENTRY_KEYS)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"EntryView({dict(self)!r})"
+
+
+class ColumnarMetadata(MutableMapping):
+    """Metadata store keyed by relative path, backed by numpy columns.
+    Rows are photo IDs from the shared PathTable, so a photo's row never moves."""
+
+    def __init__(self, paths, capacity=1024):
+        self.paths = paths
+        self._capacity = 0
+        self._live = np.zeros(0, dtype=bool)
+        self._numeric = {
+            key: np.zeros(0, dtype=dtype) for key, (dtype, _) in NUMERIC_COLUMNS.items()
+        }
+        self._times = {key: np.zeros(0, dtype=np.int64) for key in TIME_COLUMNS}
+        self._quality = {
+            key: np.zeros(0, dtype=dtype) for key, dtype in QUALITY_COLUMNS.items()
+        }
+        self._quality_state = np.zeros(0, dtype=np.int8)
+        self._sparse = {key: {} for key in SPARSE_FIELDS}
+        self._extra = {}  # row -> {key: value} for unknown keys / unstorable values
+        self._dirty = np.zeros(0, dtype=bool)  # Rows changed since take_dirty_rows()
+        self._count = 0
+        self._grow(capacity)
+
+    # ---- sizing -------------------------------------------------------------
+
+    def _grow(self, minimum):
+        """Grow every column to hold at least `minimum` rows (amortized doubling)"""
+        if minimum <= self._capacity:
+            return
+        new_capacity = max(minimum, self._capacity * 2, 1024)
+
+        def resized(array, fill):
+            grown = np.full(new_capacity, fill, dtype=array.dtype)
+            grown[: len(array)] = array
+            return grown
+
+        self._live = resized(self._live, False)
+        for key, (_, default) in NUMERIC_COLUMNS.items():
+            self._numeric[key] = resized(self._numeric[key], default)
+        for key in TIME_COLUMNS:
+            self._times[key] = resized(self._times[key], NO_TIME)
+        for key in QUALITY_COLUMNS:
+            self._quality[key] = resized(self._quality[key], 0)
+        self._quality_state = resized(self._quality_state, QUALITY_ABSENT)
+        self._dirty = resized(self._dirty, False)
+        self._capacity = new_capacity
+
+    # ---- field access -------------------------------------------------------
+
+    def _get_field(self, row, key):
+        extra = self._extra.get(row)
+        if extra is not None and key in extra:
+            return extra[key]
+        if key in NUMERIC_COLUMNS:
+            return self._numeric[key][row].item()
+        if key in TIME_COLUMNS:
+            return _from_micros(int(self._times[key][row]))
+        if key == "tags":
+            # A copy, so reads never share or grow the sparse table
+            return tuple(self._sparse["tags"].get(row, ()))
+        if key in SPARSE_FIELDS:
+            return self._sparse[key].get(row)
+        if key == "quality":
+            state = self._quality_state[row]
+            if state == QUALITY_PRESENT:
+                return {
+                    name: self._quality[name][row].item() for name in QUALITY_COLUMNS
+                }
+            if state == QUALITY_FAILED:
+                return None
+        raise KeyError(key)
+
+    def _tags_for_update(self, row):
+        """The row's stored tags list (created if it has none), so in-place
+        edits are kept; the row is marked dirty as it may be changed"""
+        self._dirty[row] = True
+        return self._sparse["tags"].setdefault(row, [])
+
+    def _set_field(self, row, key, value):
+        self._dirty[row] = True
+        stored = False
+        if key in NUMERIC_COLUMNS:
+            # numbers.Real covers numpy scalars (np.float32, np.int64, ...) too
+            if isinstance(value, numbers.Real) and not isinstance(
+                value, (bool, np.bool_)
+            ):
+                self._numeric[key][row] = value
+                stored = True
+        elif key in TIME_COLUMNS:
+            micros = _to_micros(value)
+            if micros is not None:
+                self._times[key][row] = micros
+                stored = True
+        elif key in SPARSE_FIELDS:
+            if value is None or (key == "tags" and not value):
+                self._sparse[key].pop(row, None)
+            elif key == "tags" and isinstance(value, (list, tuple)):
+                self._sparse[key][row] = list(value)  # Never shared with the caller
+            else:
+                self._sparse[key][row] = value
+            stored = True
+        elif key == "quality":
+            if value is None:
+                self._quality_state[row] = QUALITY_FAILED
+                stored = True
+            elif isinstance(value, dict) and set(value) == set(QUALITY_COLUMNS):
+                for name in QUALITY_COLUMNS:
+                    self._quality[name][row] = value[name]
+                self._quality_state[row] = QUALITY_PRESENT
+                stored = True
+
+        extra = self._extra.get(row)
+        if stored:
+            # A storable value replaces any earlier overflow value for this key
+            if extra is not None and key in extra:
+                del extra[key]
+                if not extra:
+                    del self._extra[row]
+        else:
+            if key == "quality":
+                self._quality_state[row] = QUALITY_ABSENT
+            self._extra.setdefault(row, {})[key] = value
+
+    def _del_field(self, row, key):
+        self._dirty[row] = True
+        extra = self._extra.get(row)
+        if extra is not None and key in extra:
+            del extra[key]
+            if not extra:
+                del self._extra[row]
+            return
+        if key == "quality" and self._quality_state[row] != QUALITY_ABSENT:
+            self._quality_state[row] = QUALITY_ABSENT
+            return
+        if key in ENTRY_KEYS:
+            raise KeyError(f"{key} is a fixed metadata field and cannot be deleted")
+        raise KeyError(key)
+
+    def _clear_row(self, row):
+        """Reset a row to defaults"""
+        for key, (_, default) in NUMERIC_COLUMNS.items():
+            self._numeric[key][row] = default
+        for key in TIME_COLUMNS:
+            self._times[key][row] = NO_TIME
+        self._quality_state[row] = QUALITY_ABSENT
+        for table in self._sparse.values():
+            table.pop(row, None)
+        self._extra.pop(row, None)
+
+    # ---- mapping interface --------------------------------------------------
+
+    def __getitem__(self, relative_path):
+        row = self.paths.id_of(relative_path)
+        if row is None or row >= self._capacity or not self._live[row]:
+            raise KeyError(relative_path)
+        return EntryView(self, row)
+
+    def __setitem__(self, relative_path, entry):
+        row = self.paths.intern(relative_path)
+        self._grow(row + 1)
+
+        # Copy values out first: entry may be a view of a row that is being replaced
+        values = dict(entry)
+
+        if not self._live[row]:
+            self._live[row] = True
+            self._count += 1
+        self._clear_row(row)
+        self._dirty[row] = True
+        for key, value in values.items():
+            self._set_field(row, key, value)
+
+    def __delitem__(self, relative_path):
+        row = self.paths.id_of(relative_path)
+        if row is None or row >= self._capacity or not self._live[row]:
+            raise KeyError(relative_path)
+        # Row data is left in place until the path is re-added, so views taken
+        # before a rename (metadata[new] = metadata[old]; del metadata[old]) stay valid
+        self._live[row] = False
+        self._dirty[row] = True
+        self._count -= 1
+
+    def __contains__(self, relative_path):
+        row = self.paths.id_of(relative_path)
+        return row is not None and row < self._capacity and bool(self._live[row])
+
+    def __iter__(self):
+        for row in np.flatnonzero(self._live).tolist():
+            yield self.paths.path_of(row)
+
+    def __len__(self):
+        return self._count
+
+    # ---- bulk access --------------------------------------------------------
+
+    def live_rows(self):
+        """Row (photo) IDs of every entry, as an int array"""
+        return np.flatnonzero(self._live)
+
+    def column(self, key):
+        """The full numeric column for key (index it with live_rows())"""
+        return self._numeric[key]
+
+    def take_dirty_rows(self):
+        """Return the rows changed (or deleted) since the last call, and clear them"""
+        rows = np.flatnonzero(self._dirty)
+        self._dirty[:] = False
+        return rows
+
+    def mark_dirty(self, rows=None):
+        """Flag rows (every live row if None) as changed"""
+        if rows is None:
+            self._dirty |= self._live
+        else:
+            self._dirty[rows] = True
+
+    def update_from(self, other):
+        """Copy every entry of another store into this one (column-wise)"""
+        source_rows = other.live_rows()
+        if not len(source_rows):
+            return
+        target_rows = np.array(
+            [self.paths.intern(path) for path in other.paths.paths_of(source_rows)],
+            dtype=np.int64,
+        )
+        self._grow(int(target_rows.max()) + 1)
+
+        self._count += int(np.count_nonzero(~self._live[target_rows]))
+        self._live[target_rows] = True
+        for key in NUMERIC_COLUMNS:
+            self._numeric[key][target_rows] = other._numeric[key][source_rows]
+        for key in TIME_COLUMNS:
+            self._times[key][target_rows] = other._times[key][source_rows]
+        for key in QUALITY_COLUMNS:
+            self._quality[key][target_rows] = other._quality[key][source_rows]
+        self._quality_state[target_rows] = other._quality_state[source_rows]
+
+        mapping = dict(zip(source_rows.tolist(), target_rows.tolist()))
+        for key, table in self._sparse.items():
+            for target in target_rows.tolist():
+                table.pop(target, None)
+            for row, value in other._sparse[key].items():
+                if row in mapping:
+                    table[mapping[row]] = value
+        for target in target_rows.tolist():
+            self._extra.pop(target, None)
+        for row, extra in other._extra.items():
+            if row in mapping:
+                self._extra[mapping[row]] = dict(extra)
+
+    def rename_many(self, renames):
+        """Move entries to new paths in one column-wise pass. renames is
+        [(old, new)]; old paths that have no entry are skipped, and swaps and
+        chains work because every source row is read before any target is written.
+        Returns the number of entries moved."""
+        pairs = [(old, new) for old, new in renames if old in self]
+        if not pairs:
+            return 0
+        source_rows = np.array(
+            [self.paths.id_of(old) for old, _ in pairs], dtype=np.int64
+        )
+        target_rows = np.array(
+            [self.paths.intern(new) for _, new in pairs], dtype=np.int64
+        )
+        self._grow(int(target_rows.max()) + 1)
+
+        # Fancy indexing copies the source values before anything is overwritten
+        for key in NUMERIC_COLUMNS:
+            self._numeric[key][target_rows] = self._numeric[key][source_rows]
+        for key in TIME_COLUMNS:
+            self._times[key][target_rows] = self._times[key][source_rows]
+        for key in QUALITY_COLUMNS:
+            self._quality[key][target_rows] = self._quality[key][source_rows]
+        self._quality_state[target_rows] = self._quality_state[source_rows]
+
+        sources = source_rows.tolist()
+        targets = target_rows.tolist()
+        for table in list(self._sparse.values()) + [self._extra]:
+            values = [table.pop(row, None) for row in sources]
+            for row in targets:
+                table.pop(row, None)
+            for row, value in zip(targets, values):
+                if value is not None:
+                    table[row] = value
+
+        self._live[source_rows] = False
+        self._count -= len(sources)
+        self._count += int(np.count_nonzero(~self._live[target_rows]))
+        self._live[target_rows] = True
+        self._dirty[source_rows] = True
+        self._dirty[target_rows] = True
+        return len(pairs)
+
+    def delete_many(self, relative_paths):
+        """Drop many entries in one pass (paths without an entry are skipped).
+        Like del, the row data stays in place. Returns the number removed."""
+        ids = [self.paths.id_of(path) for path in relative_paths]
+        rows = np.array(
+            [row for row in ids if row is not None and row < self._capacity],
+            dtype=np.int64,
+        )
+        rows = np.unique(rows)
+        rows = rows[self._live[rows]]
+        self._live[rows] = False
+        self._dirty[rows] = True
+        self._count -= len(rows)
+        return len(rows)
+
+    # ---- conversion ---------------------------------------------------------
+
+    def _export_rows(self, rows):
+        """Live rows to export, in row order (all of them if rows is None)"""
+        if rows is None:
+            return np.flatnonzero(self._live)
+        rows = np.unique(np.asarray(rows, dtype=np.int64))
+        rows = rows[rows < self._capacity]
+        return rows[self._live[rows]]
+
+    def to_records(self, rows=None):
+        """Export live rows as (paths, RECORD_DTYPE array, sparse tables).
+        Rows are renumbered 0..n-1; sparse tables are keyed by the new row number."""
+        rows = self._export_rows(rows)
+        records = np.empty(len(rows), dtype=RECORD_DTYPE)
+        for key in NUMERIC_COLUMNS:
+            records[key] = self._numeric[key][rows]
+        for key in TIME_COLUMNS:
+            records[key] = self._times[key][rows]
+        for key in QUALITY_COLUMNS:
+            records["quality_" + key] = self._quality[key][rows]
+        records["quality_state"] = self._quality_state[rows]
+
+        # Sparse tables are small: renumber them with a binary search into rows
+        sparse = {}
+        for key, table in list(self._sparse.items()) + [("extra", self._extra)]:
+            old_rows = np.fromiter(table.keys(), dtype=np.int64, count=len(table))
+            new_rows = np.searchsorted(rows, old_rows)
+            sparse[key] = {
+                int(new): value
+                for old, new, value in zip(old_rows, new_rows, table.values())
+                if new < len(rows) and rows[new] == old and value != []
+            }
+
+        return self.paths.paths_of(rows.tolist()), records, sparse
+
+    @classmethod
+    def from_records(cls, paths, records, sparse):
+        """Build a store over a RECORD_DTYPE array without copying it.
+        `paths` must be a PathTable whose IDs 0..n-1 match the records. With a
+        copy-on-write memmap, rows are only paged in from disk when touched."""
+        store = cls(paths, capacity=0)
+        count = len(records)
+        store._capacity = count
+        store._count = count
+        store._live = np.ones(count, dtype=bool)
+        for key in NUMERIC_COLUMNS:
+            store._numeric[key] = records[key]
+        for key in TIME_COLUMNS:
+            store._times[key] = records[key]
+        for key in QUALITY_COLUMNS:
+            store._quality[key] = records["quality_" + key]
+        store._quality_state = records["quality_state"]
+        store._dirty = np.zeros(count, dtype=bool)
+        for key in SPARSE_FIELDS:
+            store._sparse[key] = dict(sparse.get(key, {}))
+        store._extra = dict(sparse.get("extra", {}))
+        return store
+
+    def materialize(self):
+        """Copy any file-backed columns into memory (releases a snapshot mapping)"""
+        for columns in (self._numeric, self._times, self._quality):
+            for key, column in columns.items():
+                columns[key] = np.array(column)
+        self._quality_state = np.array(self._quality_state)
+
+    @classmethod
+    def from_dict(cls, paths, metadata):
+        """Build a store from the JSON dict layout"""
+        store = cls(paths, capacity=len(metadata) + len(paths))
+        for relative_path, entry in metadata.items():
+            store[relative_path] = entry
+        return store
+
+    def to_dict(self, rows=None):
+        """Export to the JSON dict layout (defaults of optional columns omitted)"""
+        result = {}
+        for row in self._export_rows(rows).tolist():
+            entry = {}
+            for key in ENTRY_KEYS:
+                value = self._get_field(row, key)
+                if key in OMIT_WHEN_DEFAULT and value == NUMERIC_COLUMNS[key][1]:
+                    continue
+                entry[key] = list(value) if key == "tags" else value
+            if self._quality_state[row] != QUALITY_ABSENT:
+                entry["quality"] = self._get_field(row, "quality")
+            extra = self._extra.get(row)
+            if extra:
+                for key, value in extra.items():
+                    if key not in entry:
+                        entry[key] = value
+            result[self.paths.path_of(row)] = entry
+        return result
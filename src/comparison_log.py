@@ -0,0 +1,113 @@
+"""
+Append-only comparison log for Photo Manager
+Every vote is written as one JSON line together with the skill/comparison values
+it replaced, so the most recent votes can be undone exactly without touching
+any other photo. Each device writes its own log in .photo_comparisons/ and
+tags every record with a unique "<device>:<sequence>" ID, so logs from several
+machines sharing a synced library can be merged (see comparison_merge.py).
+"""
+
+import json
+import os
+import uuid
+
+import config
+
+LOG_FOLDER = ".photo_comparisons"
+LEGACY_LOG_FILE = ".photo_comparisons.jsonl"  # Single log used before device logs
+DEVICE_ID_FILE = os.path.join(os.path.expanduser("~"), ".photo_manager_device_id")
+
+
+def device_id():
+    """This machine's ID: config.DEVICE_ID, or a random one kept in the home folder"""
+    if config.DEVICE_ID:
+        return config.DEVICE_ID
+    try:
+        with open(DEVICE_ID_FILE, "r") as f:
+            stored = f.read().strip()
+        if stored:
+            return stored
+    except OSError:
+        pass
+
+    new_id = uuid.uuid4().hex[:12]
+    with open(DEVICE_ID_FILE, "w") as f:
+        f.write(new_id)
+    return new_id
+
+
+def record_sequence(record_id):
+    """(device, sequence number) of a record ID"""
+    device, sequence = record_id.rsplit(":", 1)
+    return device, int(sequence)
+
+
+class ComparisonLog:
+    def __init__(self, photo_folder, device=None):
+        self.device = device or device_id()
+        self.log_file = os.path.join(photo_folder, LOG_FOLDER, f"{self.device}.jsonl")
+        self._offsets = None  # Byte offset of each record, loaded on first undo
+        self._next_sequence = None  # Loaded from the last record on first append
+
+    def append(self, record):
+        """Append one record to the end of the log, assigning its ID"""
+        if self._next_sequence is None:
+            last = self.peek_last()
+            self._next_sequence = record_sequence(last["id"])[1] + 1 if last else 0
+        record["id"] = f"{self.device}:{self._next_sequence}"
+        self._next_sequence += 1
+
+        line = (json.dumps(record) + "\n").encode("utf-8")
+        os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
+        with open(self.log_file, "ab") as f:
+            f.seek(0, os.SEEK_END)
+            offset = f.tell()
+            f.write(line)
+
+        if self._offsets is not None:
+            self._offsets.append(offset)
+
+    def _load_offsets(self):
+        """Index the start of every record in the log file"""
+        self._offsets = []
+        if not os.path.exists(self.log_file):
+            return
+
+        offset = 0
+        with open(self.log_file, "rb") as f:
+            for line in f:
+                if line.strip():
+                    self._offsets.append(offset)
+                offset += len(line)
+
+    def peek_last(self):
+        """Return the most recent record without removing it (None if empty)"""
+        if self._offsets is None:
+            self._load_offsets()
+        if not self._offsets:
+            return None
+
+        with open(self.log_file, "rb") as f:
+            f.seek(self._offsets[-1])
+            return json.loads(f.readline())
+
+    def pop_last(self):
+        """Remove and return the most recent record (None if empty)"""
+        record = self.peek_last()
+        if record is None:
+            return None
+
+        # Truncating at the record start drops it without rewriting the log
+        with open(self.log_file, "r+b") as f:
+            f.truncate(self._offsets.pop())
+        return record
+
+    def iter_records(self):
+        """Yield every record in this device's log, oldest first"""
+        if not os.path.exists(self.log_file):
+            return
+
+        with open(self.log_file, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
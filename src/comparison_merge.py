@@ -0,0 +1,347 @@
+"""
+Merging comparison logs from several devices for Photo Manager
+Every device appends its votes to its own log, so synced logs never conflict.
+Merging replays the records of all logs in one deterministic order (record
+time, then record ID), so every machine arrives at the same skills. Records
+are deduplicated by ID, which also covers "conflicted copy" files made by sync
+tools.
+
+Merges are incremental. The merge state remembers how far each log was read,
+the highest sequence merged per device, and the skills as of the last merged
+record. New records that sort after that point are applied on top of the
+checkpoint. A record that sorts earlier, a rewritten log tail (an undo) or a
+new rating epoch triggers a full recompute instead.
+"""
+
+import json
+import os
+
+import config
+from app_logging import get_logger
+from comparison_log import LEGACY_LOG_FILE, LOG_FOLDER, record_sequence
+from persistence import atomic_write
+from skill_model import implied_win_update, vote_update
+
+log = get_logger(__name__)
+
+LEGACY_DEVICE = "legacy"
+
+
+def record_key(record):
+    """Deterministic merge order: record time, then record ID"""
+    return (record.get("time") or "", record["id"])
+
+
+def log_sources(photo_folder):
+    """(source name, file path) of every comparison log in the library"""
+    sources = []
+    legacy = os.path.join(photo_folder, LEGACY_LOG_FILE)
+    if os.path.exists(legacy):
+        sources.append((LEGACY_DEVICE, legacy))
+
+    folder = os.path.join(photo_folder, LOG_FOLDER)
+    if os.path.isdir(folder):
+        for name in sorted(os.listdir(folder)):
+            if name.endswith(".jsonl"):
+                sources.append((name[: -len(".jsonl")], os.path.join(folder, name)))
+    return sources
+
+
+def read_log(path, source, offset=0):
+    """Read complete records from offset. Returns [(line start, line end, record)];
+    a final line still being written (no newline yet) is left for the next read."""
+    records = []
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            if line.strip():
+                record = json.loads(line)
+                # Legacy records have no IDs; the line's byte offset is stable
+                if "id" not in record:
+                    record["id"] = f"{source}:{offset}"
+                records.append((offset, offset + len(line), record))
+            offset += len(line)
+    return records
+
+
+def _still_aligned(path, source, position):
+    """Whether a log still has the last record read at the same place, so reading
+    can continue after it (an undo followed by new votes rewrites the tail)"""
+    end, last_start, last_id = position
+    if os.path.getsize(path) < end:
+        return False
+    with open(path, "rb") as f:
+        f.seek(last_start)
+        line = f.read(end - last_start)
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return False
+    return (
+        line.endswith(b"\n") and record.get("id", f"{source}:{last_start}") == last_id
+    )
+
+
+def read_all_records(photo_folder, epoch=None):
+    """Every record of every log (optionally of one epoch), deduplicated and in
+    merge order"""
+    by_id = {}
+    for source, path in log_sources(photo_folder):
+        for _, _, record in read_log(path, source):
+            if epoch is None or record["epoch"] == epoch:
+                by_id[record["id"]] = record
+    return sorted(by_id.values(), key=record_key)
+
+
+def with_final_paths(records):
+    """Rating records (votes and implied wins) rewritten to the paths their photos
+    have after every later rename in records. Path records are dropped."""
+    final = {}  # path at some point in time -> path after the last rename
+    resolved = []
+    for record in reversed(records):
+        if record["kind"] == "paths":
+            # A rename maps the old path to wherever the new path ends up
+            updates = {old: final.get(new, new) for old, new in record["moved"].items()}
+            final.update(updates)
+            continue
+
+        record = dict(record)
+        if record["kind"] == "vote":
+            record["a"] = final.get(record["a"], record["a"])
+            record["b"] = final.get(record["b"], record["b"])
+        else:
+            record["winner"] = final.get(record["winner"], record["winner"])
+            record["beaten"] = [final.get(path, path) for path in record["beaten"]]
+        resolved.append(record)
+
+    resolved.reverse()
+    return resolved
+
+
+def snapshot_priors(manager):
+    """{relative_path: (prior_skill, prior_weight)} of every photo with a prior,
+    copied on the UI thread so a merge prepared on a worker thread never reads
+    metadata the UI thread may be changing"""
+    metadata = manager.metadata
+    rows = metadata.live_rows()
+    skills = metadata.column("prior_skill")[rows]
+    weights = metadata.column("prior_weight")[rows]
+    has_prior = (skills != 0) | (weights != 0)
+    paths = manager.paths.paths_of(rows[has_prior].tolist())
+    return dict(
+        zip(paths, zip(skills[has_prior].tolist(), weights[has_prior].tolist()))
+    )
+
+
+class LogMerger:
+    """Merges all devices' comparison logs into a MetadataManager's skills.
+    Each record is applied with the k it was recorded with (k_0 for older
+    records that don't store one). priors (see snapshot_priors) replaces
+    metadata lookups, so prepare() can run off the UI thread."""
+
+    def __init__(self, manager, k_0=config.DEFAULT_K_VALUE, priors=None):
+        self.manager = manager
+        self.k_0 = k_0
+        self.priors = priors
+        self.state_file = os.path.join(
+            manager.photo_folder,
+            LOG_FOLDER,
+            f"{manager.comparison_log.device}.merge.json",
+        )
+
+    def _fresh_state(self):
+        return {
+            "epoch": self.manager.rating_epoch,
+            "positions": {},  # source -> [bytes read, last record start, its ID]
+            "merged": {},  # device -> highest merged sequence number
+            "watermark": None,  # record_key() of the last merged record
+            "checkpoint": {},  # relative_path -> [skill, comparisons]
+        }
+
+    def _load_state(self):
+        try:
+            with open(self.state_file, "r") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return self._fresh_state()
+        if state.get("epoch") != self.manager.rating_epoch:
+            return self._fresh_state()  # Scores were reset since the last merge
+        return state
+
+    def _collect(self, state):
+        """New records of the current epoch from every log.
+        Returns None if a log was rewritten (an undo), which needs a full recompute."""
+        new_records = {}
+        for source, path in log_sources(self.manager.photo_folder):
+            position = state["positions"].get(source)
+            if position and not _still_aligned(path, source, position):
+                return None
+            records = read_log(path, source, position[0] if position else 0)
+            if records:
+                last_start, end, last_record = records[-1]
+                state["positions"][source] = [end, last_start, last_record["id"]]
+
+            for _, _, record in records:
+                device, sequence = record_sequence(record["id"])
+                if record["epoch"] == state["epoch"] and sequence > state["merged"].get(
+                    device, -1
+                ):
+                    new_records[record["id"]] = record
+        return sorted(new_records.values(), key=record_key)
+
+    def _start_value(self, checkpoint, relative_path, final_path, before):
+        """[skill, comparisons] of a photo before its first merged record: the
+        values the record replaced (which carry any history from before the logs
+        existed), or the photo's prior for records that didn't store them"""
+        if relative_path not in checkpoint:
+            if relative_path in before:
+                checkpoint[relative_path] = list(before[relative_path])
+            else:
+                checkpoint[relative_path] = [self._prior(final_path)[0], 0]
+        return checkpoint[relative_path]
+
+    def _prior(self, final_path):
+        """(prior_skill, prior_weight) of a photo, (0, 0) if it has none"""
+        if self.priors is not None:
+            return self.priors.get(final_path, (0, 0))
+        if final_path in self.manager.metadata:
+            data = self.manager.metadata[final_path]
+            return data.get("prior_skill", 0), data.get("prior_weight", 0)
+        return 0, 0
+
+    def _prior_weight(self, final_path):
+        return self._prior(final_path)[1]
+
+    def _apply(self, checkpoint, record, final):
+        """Apply one vote, implied-win or path-change record to the checkpoint.
+        Values are kept under the paths the record names; priors are looked up
+        under the photos' current paths (final, from with_final_paths)."""
+        if record["kind"] == "paths":
+            # Pop every moved value first so swapped names don't overwrite each other
+            values = {
+                old: checkpoint.pop(old) for old in record["moved"] if old in checkpoint
+            }
+            for old, value in values.items():
+                checkpoint[record["moved"][old]] = value
+            for new, source in record["copied"].items():
+                if source in checkpoint:
+                    checkpoint[new] = list(checkpoint[source])
+        elif record["kind"] == "vote":
+            before = record.get("before", {})
+            a = self._start_value(checkpoint, record["a"], final["a"], before)
+            b = self._start_value(checkpoint, record["b"], final["b"], before)
+            a[0], b[0] = vote_update(
+                a[0],
+                a[1],
+                self._prior_weight(final["a"]),
+                b[0],
+                b[1],
+                self._prior_weight(final["b"]),
+                record["outcome"],
+                record.get("k", self.k_0),
+            )
+            a[1] += 1
+            b[1] += 1
+        else:
+            before = record.get("before", {})
+            w = self._start_value(checkpoint, record["winner"], final["winner"], before)
+            for loser, final_loser in zip(record["beaten"], final["beaten"]):
+                l = self._start_value(checkpoint, loser, final_loser, before)
+                w[0], l[0] = implied_win_update(
+                    w[0],
+                    w[1],
+                    self._prior_weight(final["winner"]),
+                    l[0],
+                    l[1],
+                    self._prior_weight(final_loser),
+                    record.get("k", self.k_0),
+                )
+
+    def _advance(self, state):
+        """Apply the records added to the logs since state to it, recomputing from
+        scratch when they can't simply be appended. Returns (state, applied)."""
+        new_records = self._collect(state)
+        if new_records is None or (
+            new_records
+            and state["watermark"] is not None
+            and record_key(new_records[0]) < tuple(state["watermark"])
+        ):
+            log.info("Comparison logs changed out of order, recomputing all ratings")
+            state = self._fresh_state()
+            new_records = self._collect(state)
+
+        if new_records:
+            checkpoint = state["checkpoint"]
+            resolved = iter(with_final_paths(new_records))
+            for record in new_records:
+                final = None if record["kind"] == "paths" else next(resolved)
+                self._apply(checkpoint, record, final)
+                device, sequence = record_sequence(record["id"])
+                state["merged"][device] = max(state["merged"].get(device, -1), sequence)
+            state["watermark"] = list(record_key(new_records[-1]))
+        return state, len(new_records)
+
+    def prepare(self):
+        """First half of merge(): read the logs and apply their new records to the
+        merge state without writing the metadata, so it can run on a worker
+        thread when the merger was given priors (a full recompute replays every
+        record). Returns what finish() takes."""
+        state = self._load_state()
+        saved_positions = dict(state["positions"])
+        state, applied = self._advance(state)
+        return state, saved_positions, applied
+
+    def finish(self, prepared):
+        """Second half of merge() (UI thread): catch up with records appended since
+        prepare(), such as votes cast during a background scan, then copy the
+        merged values into the metadata. Returns the number of records applied."""
+        state, saved_positions, applied = prepared
+        if state["epoch"] != self.manager.rating_epoch:  # Reset in the meantime
+            state, saved_positions, applied = self._fresh_state(), {}, 0
+        state, caught_up = self._advance(state)
+        applied += caught_up
+
+        # Metadata is written before the merge state, so a crash in between only
+        # repeats work; checking every value also repairs metadata synced over
+        # from another device, so the result never depends on which file won
+        if self._write_checkpoint(state["checkpoint"]):
+            self.manager.flush()
+        if applied or state["positions"] != saved_positions:
+            self._save_state(state)
+
+        if applied:
+            log.info("Merged %d comparison record(s) from device logs", applied)
+        return applied
+
+    def merge(self):
+        """Merge new records from all logs. Returns the number of records applied
+        (0 means the ratings were already up to date)."""
+        return self.finish(self.prepare())
+
+    def _write_checkpoint(self, checkpoint):
+        """Copy merged values into metadata. Returns the number of photos changed."""
+        epoch = self.manager.rating_epoch
+        changed = 0
+        for relative_path, (skill, comparisons) in checkpoint.items():
+            if relative_path not in self.manager.metadata:
+                continue
+            data = self.manager.metadata[relative_path]
+            if (
+                data.get("skill") != skill
+                or data.get("comparisons") != comparisons
+                or data.get("epoch") != epoch
+            ):
+                data["skill"] = skill
+                data["comparisons"] = comparisons
+                data["epoch"] = epoch
+                changed += 1
+        if changed:
+            self.manager.save_metadata()
+        return changed
+
+    def _save_state(self, state):
+        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+        with atomic_write(self.state_file) as f:
+            json.dump(state, f)
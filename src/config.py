@@ -5,7 +5,10 @@ Modify these values to customize behavior without touching main code
 
 # File traversal settings
 MAX_FOLDER_DEPTH = 4  # Maximum depth for recursive folder traversal
-SKIP_FOLDERS = {"delete", "keep"}  # Folders to skip during traversal
+DELETE_FOLDER = "delete"  # Culled photos are moved here, keeping their subfolders
+KEEP_FOLDER = "keep"  # Confidently top-rated photos are moved here
+EXPORT_FOLDER = "ranked"  # Link-farm view of the library sorted by quantile
+SKIP_FOLDERS = {DELETE_FOLDER, KEEP_FOLDER, ".photo_thumbnails", EXPORT_FOLDER}
 
 # Supported file extensions
 IMAGE_EXTENSIONS = [".jpg", ".jpeg", ".png", ".bmp", ".gif", ".tiff"]
@@ -19,6 +22,7 @@ QUANTILE_THRESHOLD_FOR_MASKING = 10  # Minimum quantile to show in image list
 # UI settings
 THUMBNAIL_SIZE = (600, 400)  # Size for comparison view thumbnails
 SUMMARY_THUMBNAIL_SIZE = (280, 280)  # Size for summary view thumbnails
+THUMBNAIL_CACHE_FOLDER = ".photo_thumbnails"  # Summary thumbnails cached on disk
 # Window settings
 WINDOW_WIDTH = 1300
 WINDOW_HEIGHT = 900
@@ -27,7 +31,36 @@ REMEMBER_WINDOW_SIZE = True
 
 # Caching settings (for performance optimization)
 MAX_IMAGE_CACHE = 10  # Maximum number of images to keep in memory cache
-GARBAGE_COLLECTION_INTERVAL = 10  # Force GC every N comparisons
+
+# Metadata storage settings
+METADATA_FORMAT = "json"  # "json" or "binary" (memory-mapped snapshot, faster startup)
+METADATA_SHARD_DEPTH = 0  # 0 = one file; 1 or 2 = one shard per top/second-level folder
+
+# Persistence settings
+SAVE_DELAY_SECONDS = (
+    5  # Write pending metadata changes at most this long after the first
+)
+SAVE_EVERY_N_CHANGES = 50  # ...or as soon as this many changes are pending
+
+# Content fingerprint settings (ratings follow moved/copied files)
+ENABLE_CONTENT_FINGERPRINTS = True  # Fingerprint files by size + sampled content
+FINGERPRINT_WORKERS = 8  # Threads for reading files (hashing releases the GIL)
+VERIFY_EXACT_DUPLICATES = False  # Hash whole files before reporting exact copies
+
+# Near-duplicate detection settings
+ENABLE_PERCEPTUAL_HASHING = True  # Compute perceptual hashes during the scan
+DUPLICATE_HASH_DISTANCE = 4  # Max differing bits (of 64) to count as near-duplicates
+
+# Burst session settings
+BURST_TIME_WINDOW_SECONDS = (
+    2  # Photos in one folder taken this close together form a burst
+)
+CLUSTER_PRIOR_WEIGHT = 0.5  # Strength of implied wins propagated after a burst (0-1)
+
+# Quality prior settings
+ENABLE_QUALITY_PRIOR = True  # Seed new photos' skill from sharpness/exposure/resolution
+QUALITY_ANALYSIS_WORKERS = None  # Process pool size (None = one per CPU)
+QUALITY_ANALYSIS_BATCH_SIZE = 200  # Photos per batch applied to the metadata
 
 # Skill calculation settings
 DEFAULT_K_VALUE = 2  # K value for Elo-style skill updates
@@ -39,6 +72,17 @@ SUMMARY_GRID_COLUMNS = 4  # Number of columns in summary grid
 
 # File naming settings
 QUANTILE_PREFIX_FORMAT = "Q{:03d}_"  # Format for quantile prefixes (Q567_)
+PREFIX_BUCKET_SIZE = 0.1  # Quantile points per prefix (5 = Q000, Q050, ... Q950)
+PREFIX_HYSTERESIS = 1.0  # Keep a prefix until the quantile leaves its bucket by this
+RENAME_BATCH_SIZE = 200  # Files renamed between progress updates
+RENAME_WORKERS = 1  # Parallel renames per batch (4-8 helps on network shares)
+EXPORT_LINK_MODE = "hardlink"  # "hardlink" or "symlink" for the ranked export
+
+# Bulk culling settings
+CULL_DELETE_QUANTILE = 10  # Move to delete/ when even the upper bound is below this
+CULL_KEEP_QUANTILE = 90  # Move to keep/ when even the lower bound is above this
+CULL_CONFIDENCE_Z = 1.64  # Bound width in standard errors (1.64 = one-sided 95%)
+CULL_MIN_COMPARISONS = 3  # Never cull on the automatic quality prior alone
 
 # Video player settings (Windows)
 VLC_PATHS = [
@@ -48,9 +92,27 @@ VLC_PATHS = [
 WMP_PATH = r"C:\Program Files\Windows Media Player\wmplayer.exe"
 VLC_ARGS = ["--play-and-exit"]  # Arguments for VLC autoplay
 
+# Comparison log settings (several devices rating one synced library)
+DEVICE_ID = None  # None = random ID generated once, kept in ~/.photo_manager_device_id
+MERGE_LOGS_ON_LOAD = True  # Merge other devices' votes into the ratings at startup
+
+# Rating server settings (python cli.py serve <folder>)
+SERVER_HOST = "127.0.0.1"  # Use "0.0.0.0" to accept raters from other machines
+SERVER_PORT = 8765
+SERVER_PAIR_LEASE_SECONDS = 120  # A served pair is reserved for its rater this long
+
 # Test mode settings
 TEST_FOLDER_PATH = r"C:\Users\Admin\Desktop\Photos and Videos\test"
 
 # Debug settings
-DEBUG_MODE = False  # Set to True for extra debug output
-VERBOSE_FOLDER_EXPLORATION = True  # Show folder traversal details
+DEBUG_MODE = False  # Set to True for extra debug output (DEBUG log level)
+SHOW_STARTUP_TIMING = False  # Print the time of each startup phase to the console
+ENABLE_VOTE_TIMING = False  # Time each vote's phases and write a CSV trace per session
+SHOW_VOTE_TIMING_OVERLAY = False  # p50/p95 overlay in comparison mode (F12 toggles)
+VOTE_TIMING_WINDOW = 200  # Recent samples per phase behind the overlay percentiles
+VOTE_TRACE_BATCH = 100  # Trace rows buffered between writes
+ENABLE_MEMORY_DIAGNOSTICS = False  # Count live images, cache sizes and RSS per phase
+MEMORY_SNAPSHOT_EVERY = 0  # Log tracemalloc growth every N votes (0 = off)
+MEMORY_SNAPSHOT_FRAMES = 5  # Traceback depth recorded by tracemalloc
+VERBOSE_FOLDER_EXPLORATION = False  # Log every file added/removed/moved, not counts
+LOG_RATE_LIMIT_SECONDS = 5  # Repeated per-file warnings: at most one per interval
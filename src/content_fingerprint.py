@@ -0,0 +1,183 @@
+"""
+Content fingerprints for Photo Manager
+Identifies files by what they contain rather than where they are, so ratings
+can follow files that were moved, copied or re-imported, and byte-identical
+copies can be reported without opening the images. Fingerprints are cached by
+(size, mtime, inode) and computed in a thread pool (hashlib releases the GIL).
+"""
+
+import hashlib
+import json
+import mmap
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from app_logging import RateLimited, get_logger
+from persistence import atomic_write
+
+log = get_logger(__name__)
+_read_errors = RateLimited(log)
+
+SAMPLE_SIZE = 16 * 1024  # Bytes hashed from the start, middle and end of a file
+DIGEST_SIZE = 16
+
+
+def fast_fingerprint(full_path, size):
+    """blake2b of the file size plus three sampled chunks (whole file if small)"""
+    digest = hashlib.blake2b(size.to_bytes(8, "little"), digest_size=DIGEST_SIZE)
+    with open(full_path, "rb", buffering=0) as f:
+        if size <= 3 * SAMPLE_SIZE:
+            digest.update(f.read())
+        else:
+            for offset in (0, (size - SAMPLE_SIZE) // 2, size - SAMPLE_SIZE):
+                f.seek(offset)
+                digest.update(f.read(SAMPLE_SIZE))
+    return digest.hexdigest()
+
+
+def full_fingerprint(full_path):
+    """blake2b of the whole file, read through mmap instead of buffered copies"""
+    digest = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    with open(full_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                digest.update(mapped)
+    return digest.hexdigest()
+
+
+class FingerprintCache:
+    """Per-file content fingerprints cached in a JSON side file"""
+
+    def __init__(self, photo_folder, workers=8):
+        self.photo_folder = photo_folder
+        self.workers = workers
+        self.cache_file = os.path.join(photo_folder, ".photo_fingerprints.json")
+        self.entries = {}  # relative_path -> {size, mtime, inode, fast[, full]}
+        self.loaded = False
+        self.changed = False
+
+    def load(self):
+        """Load cached fingerprints from disk"""
+        if os.path.exists(self.cache_file):
+            try:
+                with open(self.cache_file, "r") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                log.warning("Could not read fingerprint cache, rebuilding: %s", e)
+                self.entries = {}
+        self.loaded = True
+
+    def save(self):
+        """Save cached fingerprints to disk if anything changed"""
+        if self.changed:
+            with atomic_write(self.cache_file) as f:
+                json.dump(self.entries, f)
+            self.changed = False
+
+    def _fingerprint_one(self, relative_path):
+        """Worker: return a fresh or still-valid cache entry (None if unreadable)"""
+        full_path = os.path.join(self.photo_folder, relative_path)
+        try:
+            stat = os.stat(full_path)
+            cached = self.entries.get(relative_path)
+            if (
+                cached
+                and cached["size"] == stat.st_size
+                and cached["mtime"] == stat.st_mtime
+                and cached["inode"] == stat.st_ino
+            ):
+                return cached
+            return {
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "inode": stat.st_ino,
+                "fast": fast_fingerprint(full_path, stat.st_size),
+            }
+        except OSError as e:
+            _read_errors.warning("Could not fingerprint %s: %s", relative_path, e)
+            return None
+
+    def update(self, relative_paths):
+        """Fingerprint files that are new or changed. Entries for other files are
+        kept (see prune) so a missing file can still be matched to its new path.
+        Returns the number of files that had to be read."""
+        if not self.loaded:
+            self.load()
+
+        relative_paths = list(relative_paths)
+        computed = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = executor.map(self._fingerprint_one, relative_paths)
+            for relative_path, entry in zip(relative_paths, results):
+                if entry is None or entry is self.entries.get(relative_path):
+                    continue
+                self.entries[relative_path] = entry
+                computed += 1
+
+        if computed:
+            self.changed = True
+        return computed
+
+    def prune(self, keep_paths):
+        """Forget fingerprints of files that are no longer in the library"""
+        keep_paths = set(keep_paths)
+        stale = [path for path in self.entries if path not in keep_paths]
+        for relative_path in stale:
+            del self.entries[relative_path]
+        if stale:
+            self.changed = True
+
+    def get(self, relative_path):
+        """Fast fingerprint of a file (None if it was never fingerprinted)"""
+        entry = self.entries.get(relative_path)
+        return entry["fast"] if entry else None
+
+    def index(self, relative_paths):
+        """Map fingerprint -> [relative paths] for the given files"""
+        by_fingerprint = {}
+        for relative_path in relative_paths:
+            fingerprint = self.get(relative_path)
+            if fingerprint is not None:
+                by_fingerprint.setdefault(fingerprint, []).append(relative_path)
+        return by_fingerprint
+
+    def _full_one(self, relative_path):
+        """Worker: whole-file fingerprint (None if unreadable)"""
+        try:
+            return full_fingerprint(os.path.join(self.photo_folder, relative_path))
+        except OSError as e:
+            _read_errors.warning("Could not hash %s: %s", relative_path, e)
+            return None
+
+    def find_exact_duplicates(self, relative_paths, verify=False):
+        """Groups of byte-identical files, largest first. Files are grouped by fast
+        fingerprint; with verify, groups are confirmed by hashing whole files."""
+        groups = [
+            sorted(paths)
+            for paths in self.index(relative_paths).values()
+            if len(paths) > 1
+        ]
+
+        if verify and groups:
+            candidates = [path for group in groups for path in group]
+            missing = [p for p in candidates if "full" not in self.entries[p]]
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for relative_path, value in zip(
+                    missing, executor.map(self._full_one, missing)
+                ):
+                    if value is not None:
+                        self.entries[relative_path]["full"] = value
+                        self.changed = True
+
+            confirmed = []
+            for group in groups:
+                by_full = {}
+                for relative_path in group:
+                    full = self.entries[relative_path].get("full")
+                    if full is not None:
+                        by_full.setdefault(full, []).append(relative_path)
+                confirmed.extend(paths for paths in by_full.values() if len(paths) > 1)
+            groups = confirmed
+
+        groups.sort(key=len, reverse=True)
+        return groups
@@ -0,0 +1,92 @@
+"""
+Bulk culling for Photo Manager
+Moves photos whose rating is settled out of the active library: a photo goes to
+delete/ when even the upper end of its confidence interval is in the bottom
+band, and to keep/ when even the lower end is in the top band. Both folders are
+skipped by every scan, so the comparison pool shrinks with each cull. The moves
+run as one journaled RenameJob (see rename_journal.py) and the metadata of the
+moved photos is dropped in a single batched update.
+"""
+
+import os
+
+import numpy as np
+
+import config
+from app_logging import get_logger
+from rename_journal import RenameJob
+from skill_model import skill_standard_error
+
+log = get_logger(__name__)
+
+
+def quantile_bounds(manager, rows, z=config.CULL_CONFIDENCE_Z):
+    """(lower, upper, comparisons) arrays for the given rows: quantile (0-100)
+    bounds z standard errors either side of each skill, and the comparison counts
+    they rest on (older-epoch entries read as reset)"""
+    metadata = manager.metadata
+    current = metadata.column("epoch")[rows] == manager.rating_epoch
+    comparisons = np.where(current, metadata.column("comparisons")[rows], 0)
+    error = z * skill_standard_error(comparisons, metadata.column("prior_weight")[rows])
+    skills = manager.effective_skills(rows)
+    lower = 100 / (1 + np.exp(-(skills - error)))
+    upper = 100 / (1 + np.exp(-(skills + error)))
+    return lower, upper, comparisons
+
+
+def plan_cull(
+    manager,
+    delete_below=config.CULL_DELETE_QUANTILE,
+    keep_above=config.CULL_KEEP_QUANTILE,
+    z=config.CULL_CONFIDENCE_Z,
+    min_comparisons=config.CULL_MIN_COMPARISONS,
+):
+    """Photos to move, as {"delete": [relative paths], "keep": [relative paths]}
+    (worst first and best first respectively)"""
+    rows = manager.metadata.live_rows()
+    lower, upper, comparisons = quantile_bounds(manager, rows, z)
+    compared = comparisons >= min_comparisons
+
+    to_delete = np.flatnonzero(compared & (upper < delete_below))
+    to_keep = np.flatnonzero(compared & (lower > keep_above))
+    to_delete = to_delete[np.argsort(upper[to_delete], kind="stable")]
+    to_keep = to_keep[np.argsort(-lower[to_keep], kind="stable")]
+    paths = manager.paths
+    return {
+        "delete": paths.paths_of(rows[to_delete].tolist()),
+        "keep": paths.paths_of(rows[to_keep].tolist()),
+    }
+
+
+def apply_cull(manager, plan, progress=None, workers=config.RENAME_WORKERS):
+    """Move planned photos into delete/ and keep/ (subfolders preserved) and drop
+    them from the metadata. progress(index, total, relative_path) is called after
+    each batch. Returns (moved, failed): moved is {"delete": n, "keep": n} and
+    failed is [(relative_path, error)], including moves rejected as collisions."""
+    renames = [(path, config.DELETE_FOLDER + "/" + path) for path in plan["delete"]]
+    renames += [(path, config.KEEP_FOLDER + "/" + path) for path in plan["keep"]]
+    for folder in sorted({os.path.dirname(new) for _, new in renames}):
+        os.makedirs(os.path.join(manager.photo_folder, folder), exist_ok=True)
+
+    job, failed = RenameJob.plan(manager.photo_folder, renames)
+    for relative_path, reason in failed:
+        log.warning("Not moving %s: %s", relative_path, reason)
+    moved, run_failed = job.run(workers, progress)
+
+    if moved:
+        # An interrupted job resumed later re-keys instead; those entries then
+        # disappear with the next sync because the folders are never scanned
+        removed = manager.metadata.delete_many(moved)
+        log.info("Culled %d photos from the active library", removed)
+        manager.log_path_changes(moved=moved)
+        manager.save_metadata()
+        manager.flush()
+        manager.update_perceptual_hashes(compute=False)
+        manager.update_fingerprints(compute=False)
+    job.mark_metadata_updated()
+    job.finish()
+
+    deleted = sum(
+        1 for new in moved.values() if new.startswith(config.DELETE_FOLDER + "/")
+    )
+    return {"delete": deleted, "keep": len(moved) - deleted}, failed + run_failed
@@ -0,0 +1,217 @@
+"""
+Perceptual hashing and near-duplicate clustering for Photo Manager
+Hashes are cached per file by size + mtime so each file is only decoded once
+"""
+
+import json
+import os
+
+import config
+import lazy_modules
+from app_logging import RateLimited, get_logger
+from persistence import atomic_write
+
+log = get_logger(__name__)
+_hash_errors = RateLimited(log)
+
+VIDEO_EXTENSIONS = set(config.VIDEO_EXTENSIONS)
+HASH_BITS = 64
+
+
+def dhash(file_path, hash_size=8):
+    """Compute a 64-bit difference hash for an image (or first frame of a video)"""
+    cv2 = lazy_modules.cv2()
+    Image = lazy_modules.pil_image()
+    file_ext = os.path.splitext(file_path)[1].lower()
+
+    if file_ext in VIDEO_EXTENSIONS:
+        cap = cv2.VideoCapture(file_path)
+        try:
+            ret, frame = cap.read()
+        finally:
+            cap.release()
+        if not ret:
+            return None
+        img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+    else:
+        img = Image.open(file_path)
+        # Let the JPEG decoder downscale while decoding - much faster than a full decode
+        img.draft("L", (hash_size * 8, hash_size * 8))
+        img = img.convert("L")
+
+    # One extra column so each row yields hash_size left/right differences
+    img = img.resize((hash_size + 1, hash_size), Image.Resampling.BILINEAR)
+    pixels = img.tobytes()
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming_distance(hash_a, hash_b):
+    """Number of differing bits between two hashes"""
+    return (hash_a ^ hash_b).bit_count()
+
+
+class MultiIndexHash:
+    """Multi-index hash table for Hamming-radius lookups over 64-bit hashes.
+    The hash is split into max_distance + 1 blocks; by the pigeonhole principle
+    any hash within max_distance matches at least one block exactly, so only
+    hashes sharing a block bucket have to be compared bit by bit."""
+
+    def __init__(self, max_distance, hash_bits=HASH_BITS):
+        block_count = max_distance + 1
+        # Spread the bits as evenly as possible over the blocks
+        base, extra = divmod(hash_bits, block_count)
+        self.blocks = []  # (shift, mask) per block
+        shift = 0
+        for i in range(block_count):
+            width = base + (1 if i < extra else 0)
+            self.blocks.append((shift, (1 << width) - 1))
+            shift += width
+        self.tables = [{} for _ in self.blocks]
+
+    def add(self, value):
+        """Insert a hash into every block table"""
+        for (shift, mask), table in zip(self.blocks, self.tables):
+            table.setdefault((value >> shift) & mask, []).append(value)
+
+    def candidate_pairs(self):
+        """Yield every pair of stored hashes that share at least one block.
+        Each bucket is scanned once, so no per-hash query is needed."""
+        for table in self.tables:
+            for bucket in table.values():
+                for i, value in enumerate(bucket):
+                    for other in bucket[i + 1 :]:
+                        yield value, other
+
+
+def find_clusters(hashes, max_distance):
+    """Group paths whose hashes are within max_distance of each other.
+    hashes: {relative_path: hash}. Returns a list of clusters (lists of paths),
+    largest first. Only clusters with 2+ members are returned."""
+    # Identical hashes collapse to one index entry (exact duplicates are common)
+    paths_by_hash = {}
+    for relative_path, value in hashes.items():
+        paths_by_hash.setdefault(value, []).append(relative_path)
+
+    index = MultiIndexHash(max_distance)
+    for value in paths_by_hash:
+        index.add(value)
+
+    # Union-find over unique hashes
+    parent = {value: value for value in paths_by_hash}
+
+    def find(value):
+        while parent[value] != value:
+            parent[value] = parent[parent[value]]
+            value = parent[value]
+        return value
+
+    if max_distance > 0:
+        for value, other in index.candidate_pairs():
+            if (value ^ other).bit_count() <= max_distance:  # Inlined hamming_distance
+                root_a, root_b = find(value), find(other)
+                if root_a != root_b:
+                    parent[root_b] = root_a
+
+    groups = {}
+    for value, paths in paths_by_hash.items():
+        groups.setdefault(find(value), []).extend(paths)
+
+    clusters = [sorted(paths) for paths in groups.values() if len(paths) > 1]
+    clusters.sort(key=len, reverse=True)
+    return clusters
+
+
+class PerceptualHashCache:
+    """Per-file perceptual hashes cached by (size, mtime) in a JSON side file"""
+
+    def __init__(self, photo_folder):
+        self.photo_folder = photo_folder
+        self.cache_file = os.path.join(photo_folder, ".photo_hashes.json")
+        self.entries = {}  # relative_path -> {"size", "mtime", "hash"}
+        self.loaded = False
+        self.changed = False
+
+    def load(self):
+        """Load cached hashes from disk"""
+        if os.path.exists(self.cache_file):
+            try:
+                with open(self.cache_file, "r") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                log.warning("Could not read hash cache, rebuilding: %s", e)
+                self.entries = {}
+        self.loaded = True
+
+    def save(self):
+        """Save cached hashes to disk if anything changed"""
+        if self.changed:
+            with atomic_write(self.cache_file) as f:
+                json.dump(self.entries, f)
+            self.changed = False
+
+    def update(self, relative_paths):
+        """Hash any files that are new or changed since they were cached. Entries
+        for other files are kept (see prune), so a partial shard load leaves the
+        other shards' hashes alone. Returns the number of files that had to be
+        decoded."""
+        if not self.loaded:
+            self.load()
+
+        wanted = set(relative_paths)
+        hashed_count = 0
+
+        for relative_path in wanted:
+            full_path = os.path.join(self.photo_folder, relative_path)
+            try:
+                stat = os.stat(full_path)
+            except OSError:
+                continue
+
+            cached = self.entries.get(relative_path)
+            if (
+                cached
+                and cached["size"] == stat.st_size
+                and cached["mtime"] == stat.st_mtime
+            ):
+                continue
+
+            try:
+                value = dhash(full_path)
+            except Exception as e:
+                _hash_errors.warning("Could not hash %s: %s", relative_path, e)
+                value = None
+
+            self.entries[relative_path] = {
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "hash": None if value is None else f"{value:016x}",
+            }
+            hashed_count += 1
+
+        if hashed_count:
+            self.changed = True
+            self.save()
+        return hashed_count
+
+    def prune(self, keep_paths):
+        """Forget hashes of files that are no longer in the library"""
+        keep_paths = set(keep_paths)
+        stale = [path for path in self.entries if path not in keep_paths]
+        for relative_path in stale:
+            del self.entries[relative_path]
+        if stale:
+            self.changed = True
+
+    def get_hashes(self):
+        """Return {relative_path: int hash} for all successfully hashed files"""
+        return {
+            relative_path: int(entry["hash"], 16)
+            for relative_path, entry in self.entries.items()
+            if entry["hash"] is not None
+        }
@@ -0,0 +1,35 @@
+"""
+Deferred imports for Photo Manager
+OpenCV and Pillow take a noticeable part of startup and are only needed once a
+photo or video is decoded, so modules reach them through these accessors
+instead of importing them at the top. After the first call an accessor is a
+plain sys.modules lookup.
+"""
+
+
+def cv2():
+    """OpenCV (video frames, grayscale decoding, image statistics)"""
+    import cv2
+
+    return cv2
+
+
+def pil_image():
+    """PIL.Image"""
+    from PIL import Image
+
+    return Image
+
+
+def pil_draw():
+    """(PIL.ImageDraw, PIL.ImageFont) for drawing placeholder images"""
+    from PIL import ImageDraw, ImageFont
+
+    return ImageDraw, ImageFont
+
+
+def image_tk():
+    """PIL.ImageTk (needs a Tk root window before creating images)"""
+    from PIL import ImageTk
+
+    return ImageTk
@@ -0,0 +1,68 @@
+"""
+Library scanning for Photo Manager
+Walks the photo folder with the configured depth limit and skip folders and
+returns "/"-separated relative paths without a relpath() call per file
+"""
+
+import os
+
+import config
+
+SUPPORTED_EXTENSIONS = frozenset(config.ALL_EXTENSIONS)
+SKIP_FOLDERS = frozenset(folder.lower() for folder in config.SKIP_FOLDERS)
+
+
+def _walk_roots(photo_folder, folders):
+    """Absolute folders to walk for the given relative folders (nested ones dropped)"""
+    if folders is None:
+        return [photo_folder]
+
+    roots = []
+    for folder in sorted(set(folders)):
+        if folder == "":
+            return [photo_folder]  # The whole library
+        if any(folder.startswith(parent + "/") for parent in roots):
+            continue  # Already covered by a parent folder
+        roots.append(folder)
+    return [os.path.join(photo_folder, folder.replace("/", os.sep)) for folder in roots]
+
+
+def scan_library(photo_folder, folders=None, progress=None):
+    """Return the relative paths of all supported files in the library,
+    or only under the given "/"-separated relative folders.
+    progress(files_found) is called after each folder."""
+    relative_paths = []
+
+    for walk_root in _walk_roots(photo_folder, folders):
+        _scan_tree(photo_folder, walk_root, relative_paths, progress)
+
+    return relative_paths
+
+
+def _scan_tree(photo_folder, walk_root, relative_paths, progress=None):
+    """Append the supported files under walk_root to relative_paths"""
+    for root, dirs, files in os.walk(walk_root):
+        # Calculate current depth
+        current_depth = root[len(photo_folder) :].count(os.sep)
+
+        # Skip if we're too deep (allow 4 levels: year/month/type/files)
+        if current_depth >= config.MAX_FOLDER_DEPTH:
+            dirs[:] = []  # Don't descend further
+            continue
+
+        # Remove skip folders from dirs list to prevent os.walk from entering them
+        dirs[:] = [d for d in dirs if d.lower() not in SKIP_FOLDERS]
+
+        # Build the relative folder prefix once per directory instead of per file
+        relative_root = os.path.relpath(root, photo_folder)
+        if relative_root == ".":
+            prefix = ""
+        else:
+            prefix = relative_root.replace(os.sep, "/") + "/"
+
+        for file in files:
+            if os.path.splitext(file)[1].lower() in SUPPORTED_EXTENSIONS:
+                relative_paths.append(prefix + file)
+
+        if progress:
+            progress(len(relative_paths))
@@ -0,0 +1,188 @@
+"""
+Metadata/file synchronization for Photo Manager
+Brings the metadata in line with the files on disk: follows moved and renamed
+files, drops entries left behind by prefix renames, and adds or removes the rest
+"""
+
+import os
+
+import config
+from app_logging import FileSummary, get_logger
+from rename_planner import get_base_filename
+
+log = get_logger(__name__)
+
+
+def _base_key(relative_path):
+    """(folder, filename without quantile prefix) for matching renamed files"""
+    return (
+        os.path.dirname(relative_path),
+        get_base_filename(os.path.basename(relative_path)),
+    )
+
+
+def sync_library(manager, relative_paths=None, compute_caches=True):
+    """Synchronize metadata with the files present in the folder.
+    relative_paths and compute_caches=False let a background scan hand over the
+    files it found after refreshing the hash and fingerprint caches itself.
+    Returns a dict with the added/removed paths and the number of entries
+    reattached by content, transferred after renames and removed as duplicates."""
+    if relative_paths is None:
+        relative_paths = manager.scan_files()
+    actual_relative_paths = set(relative_paths)
+    metadata_filenames = set(manager.metadata.keys())
+
+    log.info(
+        "Files found: %d, metadata entries: %d",
+        len(actual_relative_paths),
+        len(metadata_filenames),
+    )
+
+    # Files that exist but aren't in metadata (need to be added)
+    missing_from_metadata = actual_relative_paths - metadata_filenames
+
+    # Files in metadata but don't exist (need to be removed)
+    missing_files = metadata_filenames - actual_relative_paths
+
+    result = {
+        "added": [],
+        "removed": [],
+        "reattached": 0,
+        "transferred": 0,
+        "duplicates_removed": 0,
+    }
+
+    # Files that were moved or copied keep their ratings (matched by content)
+    if config.ENABLE_CONTENT_FINGERPRINTS:
+        moved, copied = manager.reattach_by_content(
+            missing_from_metadata, missing_files
+        )
+        if moved or copied:
+            result["reattached"] = moved + copied
+            metadata_filenames = set(manager.metadata.keys())
+            missing_from_metadata = actual_relative_paths - metadata_filenames
+            missing_files = metadata_filenames - actual_relative_paths
+
+    # DUPLICATE CLEANUP: a missing entry whose base name matches an actual file
+    # in the same folder was left behind by a prefix rename
+    actual_by_base = {}
+    for actual_file in actual_relative_paths:
+        actual_by_base.setdefault(_base_key(actual_file), actual_file)
+
+    base_to_missing = {}
+    for missing_entry in missing_files:
+        base_to_missing.setdefault(_base_key(missing_entry), []).append(missing_entry)
+
+    duplicates_to_remove = []
+    transferred = {}  # old path -> new path
+    transfers = FileSummary(log, "Transferred metadata of", "renamed files")
+    for base_key, missing_entries in base_to_missing.items():
+        corresponding_actual = actual_by_base.get(base_key)
+        if corresponding_actual is None:
+            continue
+
+        # If the actual file doesn't have metadata, transfer from the missing entry
+        if corresponding_actual not in metadata_filenames:
+            # Find the missing entry with the most comparisons (most valuable data)
+            best_missing = max(missing_entries, key=manager.get_comparisons)
+            manager.metadata[corresponding_actual] = manager.metadata[best_missing]
+            missing_from_metadata.discard(corresponding_actual)
+            transfers.add(best_missing, corresponding_actual)
+            transferred[best_missing] = corresponding_actual
+
+        duplicates_to_remove.extend(missing_entries)
+
+    transfers.done()
+    if transferred:
+        manager.log_path_changes(moved=transferred)
+        result["transferred"] = len(transferred)
+
+    duplicates = FileSummary(log, "Removed", "duplicate metadata entries")
+    for duplicate in duplicates_to_remove:
+        if duplicate in manager.metadata:
+            del manager.metadata[duplicate]
+            duplicates.add(duplicate)
+    result["duplicates_removed"] = duplicates.done()
+
+    # Remove remaining metadata entries for files that no longer exist
+    missing_files -= set(duplicates_to_remove)
+    removed = FileSummary(log, "Removed", "missing files from metadata")
+    for relative_path in sorted(missing_files):
+        removed.add(relative_path)
+        del manager.metadata[relative_path]
+        result["removed"].append(relative_path)
+    removed.done()
+
+    # Add metadata entries for new files found
+    added = FileSummary(log, "Added", "new files to metadata")
+    for relative_path in sorted(missing_from_metadata):
+        if relative_path not in manager.metadata:
+            added.add(relative_path)
+            manager.metadata[relative_path] = manager.new_entry()
+            result["added"].append(relative_path)
+    added.done()
+
+    if sync_changes(result):
+        manager.save_metadata()
+
+        # Hash any newly added files for near-duplicate detection
+        if config.ENABLE_PERCEPTUAL_HASHING:
+            manager.update_perceptual_hashes(compute_caches)
+        if config.ENABLE_CONTENT_FINGERPRINTS:
+            manager.update_fingerprints(compute_caches)
+
+    return result
+
+
+def sync_changes(result):
+    """Total number of metadata changes in a sync_library() result"""
+    return (
+        len(result["added"])
+        + len(result["removed"])
+        + result["reattached"]
+        + result["transferred"]
+        + result["duplicates_removed"]
+    )
+
+
+def remove_duplicate_entries(manager):
+    """Remove metadata entries left behind when a file was renamed (prefixed and
+    unprefixed versions of one photo). Returns the removed relative paths."""
+    actual_files = set(manager.scan_files())
+    orphaned_entries = set(manager.metadata.keys()) - actual_files
+
+    actual_by_base = {}
+    for actual_file in actual_files:
+        actual_by_base.setdefault(_base_key(actual_file), actual_file)
+
+    # Group orphaned entries by (folder, base filename)
+    base_to_entries = {}
+    for entry in orphaned_entries:
+        base_to_entries.setdefault(_base_key(entry), []).append(entry)
+
+    entries_to_remove = []
+    for (folder_part, base_filename), entries in base_to_entries.items():
+        if len(entries) < 2:
+            continue
+        log.debug(
+            "Found duplicate entries for %s/%s: %s", folder_part, base_filename, entries
+        )
+
+        if (folder_part, base_filename) in actual_by_base:
+            # The actual file has its own entry; every orphaned version goes
+            entries_to_remove.extend(entries)
+        else:
+            # Keep the entry with the most comparisons as it's likely more valuable
+            entries.sort(key=manager.get_comparisons, reverse=True)
+            entries_to_remove.extend(entries[1:])
+            log.debug("  Keeping entry with most comparisons: %s", entries[0])
+
+    removed = FileSummary(log, "Removed", "duplicate metadata entries")
+    for entry in entries_to_remove:
+        removed.add(entry)
+        del manager.metadata[entry]
+    removed.done()
+
+    if entries_to_remove:
+        manager.save_metadata()
+    return entries_to_remove
@@ -0,0 +1,196 @@
+"""
+Ranked link-farm export for Photo Manager
+Builds a parallel view of the library sorted by quality, e.g.
+ranked/Q012_2023__05__IMG_001.jpg, out of hardlinks (or symlinks) instead of
+renaming the originals, so metadata keys, caches and sync heuristics never see a
+change. The previous export is recorded in a manifest and each run only removes
+and creates the links that differ from it. Links are named with the same
+quantile buckets and hysteresis as prefix renames (see rename_planner.py).
+"""
+
+import errno
+import json
+import os
+
+import numpy as np
+
+import config
+from app_logging import get_logger
+from persistence import atomic_write
+from rename_planner import (
+    get_base_filename,
+    get_quantile_from_filename,
+    prefix_is_current,
+    quantile_prefix,
+)
+
+log = get_logger(__name__)
+
+MANIFEST_FILE = ".photo_link_manifest.json"
+LINK_MODES = ("hardlink", "symlink")
+
+
+def link_name(relative_path, quantile, bucket_size=config.PREFIX_BUCKET_SIZE):
+    """Flat link name for a photo: quantile prefix plus its folders joined by __
+    (any prefix already in the original filename is dropped)"""
+    folder, filename = os.path.split(relative_path)
+    flat = get_base_filename(filename)
+    if folder:
+        flat = folder.replace("/", "__") + "__" + flat
+    return quantile_prefix(quantile, bucket_size) + flat
+
+
+def _read_manifest(export_folder):
+    """{link name: relative path} and mode of the previous export ({} if none)"""
+    try:
+        with open(
+            os.path.join(export_folder, MANIFEST_FILE), "r", encoding="utf-8"
+        ) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}, None
+    return manifest.get("links", {}), manifest.get("mode")
+
+
+def _write_manifest(export_folder, links, mode):
+    with atomic_write(os.path.join(export_folder, MANIFEST_FILE)) as f:
+        json.dump({"mode": mode, "links": links}, f)
+
+
+def plan_link_export(
+    manager,
+    previous=None,
+    bucket_size=config.PREFIX_BUCKET_SIZE,
+    hysteresis=config.PREFIX_HYSTERESIS,
+):
+    """{link name: relative path} for every photo in the metadata.
+    A photo keeps its link from the previous export ({name: relative path})
+    while its quantile stays within the hysteresis margin of that link's bucket."""
+    previous_names = {}
+    for name, relative_path in (previous or {}).items():
+        previous_names[relative_path] = name
+
+    rows = manager.metadata.live_rows()
+    quantiles = 100 / (1 + np.exp(-manager.effective_skills(rows)))
+    links = {}
+    renamed = []  # (relative path, quantile) of photos that need a new link name
+    for relative_path, quantile in zip(
+        manager.paths.paths_of(rows.tolist()), quantiles.tolist()
+    ):
+        name = previous_names.get(relative_path)
+        if name is not None and prefix_is_current(
+            get_quantile_from_filename(name), quantile, bucket_size, hysteresis
+        ):
+            links[name] = relative_path
+        else:
+            renamed.append((relative_path, quantile))
+
+    # Kept names go first so they never move; flattening can give two photos the
+    # same name (a/b__c.jpg and a__b/c.jpg), so later ones get a ~2, ~3 suffix
+    for relative_path, quantile in renamed:
+        name = _unique_name(link_name(relative_path, quantile, bucket_size), links)
+        links[name] = relative_path
+    return links
+
+
+def _unique_name(name, taken):
+    """name, or name with the first free ~N suffix before its extension"""
+    if name not in taken:
+        return name
+    stem, extension = os.path.splitext(name)
+    number = 2
+    while f"{stem}~{number}{extension}" in taken:
+        number += 1
+    return f"{stem}~{number}{extension}"
+
+
+def _make_link(source, target, mode):
+    """Create one link. Returns the mode used: a hardlink falls back to a
+    symlink when the export folder is on another file system (or the file system
+    has no hardlinks)."""
+    if mode == "hardlink":
+        try:
+            os.link(source, target)
+            return "hardlink"
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.EOPNOTSUPP):
+                raise
+    os.symlink(source, target)
+    return "symlink"
+
+
+def export_links(
+    manager,
+    export_folder=None,
+    mode=config.EXPORT_LINK_MODE,
+    bucket_size=config.PREFIX_BUCKET_SIZE,
+    hysteresis=config.PREFIX_HYSTERESIS,
+    progress=None,
+):
+    """Bring the ranked link folder up to date with the current ratings.
+    progress(index, total, link_name) is called per created link.
+    Returns a dict with the created/removed/kept counts, the symlink fallbacks
+    and [(link name, error)] of links that could not be created."""
+    if mode not in LINK_MODES:
+        raise ValueError(f"Unknown link mode: {mode}")
+    if export_folder is None:
+        export_folder = os.path.join(manager.photo_folder, config.EXPORT_FOLDER)
+    os.makedirs(export_folder, exist_ok=True)
+
+    previous, previous_mode = _read_manifest(export_folder)
+    links = plan_link_export(manager, previous, bucket_size, hysteresis)
+
+    # Only the difference to the previous export touches the file system (all of
+    # it when the link mode changed)
+    relink = previous_mode != mode
+    stale = [
+        name
+        for name, relative_path in previous.items()
+        if relink or links.get(name) != relative_path
+    ]
+    to_create = [
+        name
+        for name, relative_path in links.items()
+        if relink or previous.get(name) != relative_path
+    ]
+
+    result = {
+        "created": 0,
+        "removed": 0,
+        "kept": len(links) - len(to_create),
+        "symlinks": 0,
+        "failed": [],
+    }
+    for name in stale:
+        try:
+            os.remove(os.path.join(export_folder, name))
+            result["removed"] += 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            log.warning("Failed to remove link %s: %s", name, e)
+
+    for i, name in enumerate(to_create):
+        target = os.path.join(export_folder, name)
+        source = os.path.abspath(os.path.join(manager.photo_folder, links[name]))
+        try:
+            if os.path.lexists(target):
+                os.remove(target)  # Left over from an interrupted export
+            if _make_link(source, target, mode) != mode:
+                result["symlinks"] += 1
+            result["created"] += 1
+        except OSError as e:
+            log.warning("Failed to link %s: %s", name, e)
+            result["failed"].append((name, str(e)))
+            del links[name]
+        if progress:
+            progress(i, len(to_create), name)
+
+    _write_manifest(export_folder, links, mode)
+    log.info(
+        "Link export: %d created, %d removed, %d unchanged",
+        result["created"],
+        result["removed"],
+        result["kept"],
+    )
+    return result
@@ -1,26 +1,49 @@
-import gc
-import glob
-import math
+import startup_timing  # First: records the process start time
+
 import os
 import platform
-import random
+import queue
 import subprocess
+import threading
 import tkinter as tk
 import tkinter.ttk as ttk
-from datetime import datetime
 from tkinter import filedialog, messagebox
 
-import cv2
-import pythoncom
-import win32api
-import win32com.shell.shell as shell
-import win32con
-from mutagen import File
-from PIL import Image, ImageDraw, ImageFont, ImageTk
-from win32com.shell import shellcon
-
 import config
+import lazy_modules
+import memory_diagnostics
+import vote_timing
+from app_logging import get_logger, setup_logging
+from background_scan import LibraryScan
+from culling import apply_cull, plan_cull
+from library_sync import remove_duplicate_entries, sync_changes
+from link_export import export_links
 from metadata_manager import MetadataManager
+from pair_selection import (
+    ClusterSession,
+    comparison_pool,
+    outcome_from_scores,
+    sample_pair,
+)
+from quality_prior import iter_quality_features
+from rename_planner import (
+    apply_renames,
+    estimate_rename_cost,
+    pending_renames,
+    plan_prefix_renames,
+    resume_renames,
+    rollback_renames,
+)
+from thumbnails import (
+    cached_thumbnail,
+    error_thumbnail,
+    extract_video_frame,
+    load_thumbnail,
+)
+
+startup_timing.mark("imports")
+
+log = get_logger(__name__)
 
 
 class PhotoManager:
@@ -52,23 +75,44 @@ class PhotoManager:
         self.test_mode = test_mode
 
         self.photo_folder = None
-        self.image_files = []
+        self.image_ids = []  # Photo IDs available for comparison
+
+        # Burst session (clusters compared before random pairs)
+        self.cluster_session = None
+
+        # Background quality analysis (results are applied on the Tk thread)
+        self.quality_queue = None
+
+        # Background scan/sync of the folder (also applied on the Tk thread)
+        self.library_scan = None
+        self.scan_report = False  # Show the sync result in a dialog when done
+        self.scan_status_label = None
+        self.summary_visible = False
+
+        # Per-vote latency overlay (see vote_timing)
+        self.timing_overlay = None
+        self.show_timing_overlay = config.SHOW_VOTE_TIMING_OVERLAY
 
         # Initialize the toggle state EARLY - this was missing/in wrong place
         self.show_worst = config.DEFAULT_SHOW_WORST  # Use config value
 
         self.setup_ui()
+        startup_timing.mark("window")
+
+        # Flush pending metadata on close and periodically while running
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.bind("<F12>", self.toggle_timing_overlay)
+        self.root.after(1000, self.flush_metadata_if_due)
 
         # Auto-load test folder if in test mode
         if self.test_mode:
             self.auto_load_test_folder()
 
-    def _rename_files_with_progress(self, files_to_rename, add_prefix=True):
-        """Helper method to rename files with progress dialog"""
-        # Create progress window
+    def _progress_window(self, title, total, action_text):
+        """Modal progress dialog for a batch file job. Returns (window, callback)
+        where callback(index, total, relative_path) is called once per batch."""
         progress_window = tk.Toplevel(self.root)
-        action = "Adding" if add_prefix else "Removing"
-        progress_window.title(f"{action} Prefixes")
+        progress_window.title(title)
         progress_window.geometry("500x150")
         progress_window.grab_set()
 
@@ -83,122 +127,39 @@ class PhotoManager:
 
         progress_bar = ttk.Progressbar(progress_window, mode="determinate")
         progress_bar.pack(pady=10, padx=20, fill="x")
-        progress_bar["maximum"] = len(files_to_rename)
+        progress_bar["maximum"] = total
 
         status_label = tk.Label(progress_window, text="", font=("Arial", 8))
         status_label.pack(pady=5)
 
-        success_count = 0
-        failed_renames = []
-        new_metadata = {}
-
-        for i, (file_path, old_relative_path) in enumerate(files_to_rename):
-            action_text = "Adding prefix to" if add_prefix else "Removing prefix from"
-            progress_label.config(text=f"{action_text}: {old_relative_path}")
+        # Called once per batch, not per file
+        def show_progress(i, total, relative_path):
+            progress_label.config(text=f"{action_text}: {relative_path}")
             progress_bar["value"] = i + 1
-            status_label.config(text=f"{i+1}/{len(files_to_rename)} files processed")
+            status_label.config(text=f"{i+1}/{total} files processed")
             progress_window.update()
 
-            try:
-                # Get the folder part and filename part
-                folder_part = os.path.dirname(old_relative_path)
-                old_filename = os.path.basename(old_relative_path)
-
-                if add_prefix:
-                    # Calculate new filename with prefix
-                    quantile = self.metadata_manager.get_quantile(old_relative_path)
-                    quantile_int = int(quantile * 10)
-                    quantile_prefix = f"Q{quantile_int:03d}_"
-
-                    # Remove old quantile prefix if it exists
-                    if old_filename.startswith("Q") and "_" in old_filename[:5]:
-                        underscore_pos = old_filename.find("_")
-                        base_filename = old_filename[underscore_pos + 1 :]
-                    else:
-                        base_filename = old_filename
-
-                    new_filename = quantile_prefix + base_filename
-                else:
-                    # Remove prefix to get base filename
-                    if old_filename.startswith("Q") and "_" in old_filename[:5]:
-                        underscore_pos = old_filename.find("_")
-                        new_filename = old_filename[underscore_pos + 1 :]
-                    else:
-                        # No prefix to remove, skip
-                        continue
-
-                # Construct new relative path (preserve folder structure)
-                if folder_part:
-                    new_relative_path = folder_part + "/" + new_filename
-                else:
-                    new_relative_path = new_filename
-
-                # Construct new full path
-                new_file_path = os.path.join(self.photo_folder, new_relative_path)
-
-                # Check if new filename already exists
-                if os.path.exists(new_file_path) and new_file_path != file_path:
-                    print(
-                        f"Warning: {new_relative_path} already exists, skipping {old_relative_path}"
-                    )
-                    failed_renames.append((old_relative_path, "File already exists"))
-                    continue
-
-                # Rename the file
-                os.rename(file_path, new_file_path)
-
-                # Update metadata with new relative path
-                old_data = self.metadata_manager.metadata[old_relative_path]
-                new_metadata[new_relative_path] = old_data
+        return progress_window, show_progress
 
-                print(f"Renamed: {old_relative_path} -> {new_relative_path}")
-                success_count += 1
-
-            except Exception as e:
-                print(f"Failed to rename {old_relative_path}: {e}")
-                failed_renames.append((old_relative_path, str(e)))
-
-        # Update metadata with new relative paths
-        if new_metadata:
-            # Remove old entries and add new ones
-            for old_relative_path, _ in files_to_rename:
-                if old_relative_path in self.metadata_manager.metadata:
-                    # Check if we successfully renamed this file
-                    folder_part = os.path.dirname(old_relative_path)
-                    old_filename = os.path.basename(old_relative_path)
-
-                    if add_prefix:
-                        quantile = self.metadata_manager.get_quantile(old_relative_path)
-                        quantile_int = int(quantile * 10)
-                        quantile_prefix = f"Q{quantile_int:03d}_"
-
-                        if old_filename.startswith("Q") and "_" in old_filename[:5]:
-                            underscore_pos = old_filename.find("_")
-                            base_filename = old_filename[underscore_pos + 1 :]
-                        else:
-                            base_filename = old_filename
-
-                        new_filename = quantile_prefix + base_filename
-                    else:
-                        if old_filename.startswith("Q") and "_" in old_filename[:5]:
-                            underscore_pos = old_filename.find("_")
-                            new_filename = old_filename[underscore_pos + 1 :]
-                        else:
-                            continue
-
-                    # Construct expected new relative path
-                    if folder_part:
-                        expected_new_relative = folder_part + "/" + new_filename
-                    else:
-                        expected_new_relative = new_filename
-
-                    if expected_new_relative in new_metadata:
-                        # Successfully renamed, remove old entry
-                        del self.metadata_manager.metadata[old_relative_path]
+    def _rename_files_with_progress(self, files_to_rename, add_prefix=True):
+        """Helper method to rename files with progress dialog.
+        files_to_rename is a list of (old, new) relative paths from plan_prefix_renames
+        """
+        action = "Adding" if add_prefix else "Removing"
+        progress_window, show_progress = self._progress_window(
+            f"{action} Prefixes",
+            len(files_to_rename),
+            "Adding prefix to" if add_prefix else "Removing prefix from",
+        )
 
-            # Add new entries
-            self.metadata_manager.metadata.update(new_metadata)
-            self.metadata_manager.save_metadata()
+        try:
+            success_count, failed_renames = apply_renames(
+                self.metadata_manager, files_to_rename, progress=show_progress
+            )
+        except RuntimeError as e:  # An interrupted rename job is still pending
+            progress_window.destroy()
+            messagebox.showerror("Rename Blocked", str(e))
+            return 0
 
         progress_window.destroy()
 
@@ -220,36 +181,13 @@ class PhotoManager:
             messagebox.showwarning("No Folder", "Please select a photo folder first")
             return
 
-        # Collect files that need prefix added/updated
-        files_to_rename = []
-        already_prefixed = []
-
-        for relative_path, data in self.metadata_manager.metadata.items():
-            # Convert relative path to full path
-            file_path = os.path.join(self.photo_folder, relative_path)
-
-            if not os.path.exists(file_path):
-                continue
-
-            # Get just the filename (without folder path) to check for prefix
-            filename = os.path.basename(relative_path)
-
-            # Check if file already has correct quantile prefix
-            if filename.startswith("Q") and "_" in filename[:5]:
-                # Check if it matches current quantile
-                current_quantile = self.metadata_manager.get_quantile(relative_path)
-                quantile_int = int(current_quantile * 10)
-                expected_prefix = f"Q{quantile_int:03d}_"
+        if self.library_scan_running():
+            return
 
-                if filename.startswith(expected_prefix):
-                    already_prefixed.append(relative_path)
-                    continue
-                else:
-                    # File has old/wrong quantile prefix, needs updating
-                    files_to_rename.append((file_path, relative_path))
-            else:
-                # File has no quantile prefix
-                files_to_rename.append((file_path, relative_path))
+        # Collect files that need prefix added/updated
+        files_to_rename, already_prefixed = plan_prefix_renames(
+            self.metadata_manager, add_prefix=True
+        )
 
         if not files_to_rename:
             messagebox.showinfo(
@@ -258,11 +196,18 @@ class PhotoManager:
             )
             return
 
-        # Show confirmation dialog
+        # Show confirmation dialog with the dry-run cost
+        cost = estimate_rename_cost(
+            self.metadata_manager, files_to_rename, already_prefixed
+        )
         if not messagebox.askyesno(
             "Add Prefixes",
-            f"This will add/update quantile prefixes on {len(files_to_rename)} files.\n"
-            f"{len(already_prefixed)} files already have correct prefixes.\n\n"
+            f"This will add/update quantile prefixes on {cost['renames']} files "
+            f"in {cost['folders']} folders.\n"
+            f"{cost['unchanged']} files keep their prefixes "
+            f"(exact prefixes would rename {cost['renames_at_exact_prefixes']}).\n"
+            f"Cached thumbnails to rebuild: {cost['thumbnails_invalidated']}, "
+            f"estimated time: {cost['estimated_seconds']}s\n\n"
             "Do you want to continue?",
         ):
             return
@@ -280,6 +225,39 @@ class PhotoManager:
         # Refresh the summary page
         self.show_summary_page()
 
+    def open_metadata_manager(self, folder):
+        """Switch to a new folder's metadata, saving the previous folder's first"""
+        if self.metadata_manager:
+            self.metadata_manager.flush()
+        self.metadata_manager = MetadataManager(folder)
+        self.register_memory_caches()
+
+    def register_memory_caches(self):
+        """Report the in-memory caches of the current library to the memory
+        diagnostics (looked up on each report, so they follow a new library)"""
+        caches = {
+            "metadata": lambda: len(self.metadata_manager.metadata),
+            "path table": lambda: len(self.metadata_manager.paths),
+            "hashes": lambda: len(self.metadata_manager.hash_cache.entries),
+            "fingerprints": lambda: len(self.metadata_manager.fingerprints.entries),
+            "comparable": lambda: len(self.image_ids),
+        }
+        for name, size in caches.items():
+            memory_diagnostics.register_cache(name, size)
+
+    def flush_metadata_if_due(self):
+        """Periodic tick that writes metadata changes once the save delay passes"""
+        if self.metadata_manager:
+            self.metadata_manager.flush_if_due()
+        self.root.after(1000, self.flush_metadata_if_due)
+
+    def on_close(self):
+        """Write pending metadata before the window closes"""
+        if self.metadata_manager:
+            self.metadata_manager.flush()
+        vote_timing.flush_trace()
+        self.root.destroy()
+
     def auto_load_test_folder(self):
 
         # Use config value instead of hardcoded path
@@ -287,43 +265,52 @@ class PhotoManager:
 
         if os.path.exists(test_folder):
             self.photo_folder = test_folder
-            self.metadata_manager = MetadataManager(test_folder)
-            self.metadata_manager.load_metadata()
-            self.load_images()
-            self.show_summary_page()  # Show summary in test mode too
+            self.open_library(test_folder)
         else:
-            print(f"Test folder not found: {test_folder}")
+            log.warning("Test folder not found: %s", test_folder)
         # Set your test folder path here
 
-    def clear_image_references(self):
-        """Clear all image references to free memory"""
-        if hasattr(self, "img1_label"):
-            self.img1_label.image = None
-        if hasattr(self, "img2_label"):
-            self.img2_label.image = None
+    def display_cluster_pair(self):
+        """Show the current burst champion (left) against the next challenger (right)"""
+        self.current_ids = self.cluster_session.next_pair()
+
+        cluster_number, frame_number, frames = self.cluster_session.progress()
+        self.root.title(
+            f"Photo Manager - Burst {cluster_number}/{self.cluster_session.total} "
+            f"(frame {frame_number} of {frames})"
+        )
+
+        self.show_image(self.current_ids[0], self.img1_label)
+        self.show_image(self.current_ids[1], self.img2_label)
+
+    def advance_cluster_session(self, outcome):
+        """Record a burst vote: the winner stays on as champion for the next challenger"""
+        self.cluster_session.record(outcome)
+
+        if not self.cluster_session.active():
+            self.cluster_session = None
+            self.root.title("Photo Manager")
+            messagebox.showinfo(
+                "Bursts Done", "All bursts compared. Continuing with random pairs."
+            )
 
     def display_random_pair(self):
         # Clear previous images first
         self.clear_image_references()
 
-        # Filter out images below 5th quantile before each comparison
-        available_images = []
-        for file_path in self.image_files:
-            # Convert to relative path to match metadata keys
-            relative_path = os.path.relpath(file_path, self.photo_folder)
-            relative_path = relative_path.replace(os.sep, "/")  # Normalize separators
-
-            quantile = self.metadata_manager.get_quantile(relative_path)
-            if quantile >= 5:  # quantile is 0-100
-                available_images.append(file_path)
-                # print(f"Quantile for {relative_path}: {quantile}")
-
-        print(f"Available images: {len(available_images)}")  # Debug line
+        # Burst session: finish queued clusters before picking random pairs
+        if self.cluster_session is not None:
+            self.display_cluster_pair()
+            return
 
-        if len(available_images) < 2:
-            print("Not enough images above 5th percentile for comparison!")
-            from tkinter import messagebox
+        # Photos below the 5th quantile are skipped; sampling is by rejection,
+        # so a vote doesn't scan the whole library
+        paths = self.metadata_manager.paths
+        with vote_timing.phase("selection"):
+            self.current_ids = sample_pair(self.metadata_manager, self.image_ids)
 
+        if len(self.current_ids) < 2:
+            log.info("Not enough images above 5th percentile for comparison")
             messagebox.showinfo(
                 "No More Comparisons",
                 "All remaining photos are below 5th percentile. Returning to summary.",
@@ -331,34 +318,25 @@ class PhotoManager:
             self.show_summary_page()
             return
 
-        self.current_images = self.get_weighted_selection_from_list(available_images, 2)
-
-        # Additional safety check
-        if len(self.current_images) < 2:
-            print("Not enough images returned from selection!")
-            self.show_summary_page()
-            return
-
         # Debug check for duplicates
-        if (
-            len(self.current_images) == 2
-            and self.current_images[0] == self.current_images[1]
-        ):
-            print(f"DUPLICATE DETECTED: {self.current_images}")
+        if len(self.current_ids) == 2 and self.current_ids[0] == self.current_ids[1]:
+            log.warning("Duplicate pair selected: %s", self.current_ids)
             return
 
         # Load and display images with better error handling
+        left_path = paths.full_path(self.current_ids[0])
+        right_path = paths.full_path(self.current_ids[1])
         try:
-            self.show_image(self.current_images[0], self.img1_label)
+            self.show_image(self.current_ids[0], self.img1_label)
         except Exception as e:
-            print(f"Error loading left image {self.current_images[0]}: {e}")
-            self.show_error_image(self.img1_label, self.current_images[0], str(e))
+            log.warning("Error loading left image %s: %s", left_path, e)
+            self.show_error_image(self.img1_label, left_path, str(e))
 
         try:
-            self.show_image(self.current_images[1], self.img2_label)
+            self.show_image(self.current_ids[1], self.img2_label)
         except Exception as e:
-            print(f"Error loading right image {self.current_images[1]}: {e}")
-            self.show_error_image(self.img2_label, self.current_images[1], str(e))
+            log.warning("Error loading right image %s: %s", right_path, e)
+            self.show_error_image(self.img2_label, right_path, str(e))
 
     def cleanup_duplicate_metadata(self):
         """Remove duplicate metadata entries where both prefixed and non-prefixed versions exist"""
@@ -366,115 +344,12 @@ class PhotoManager:
             messagebox.showwarning("No Folder", "Please select a photo folder first")
             return
 
-        # Get all actual files that exist
-        extensions = [
-            ".jpg",
-            ".jpeg",
-            ".png",
-            ".bmp",
-            ".gif",
-            ".tiff",
-            ".mp4",
-            ".mov",
-            ".mkv",
-            ".wmv",
-            ".flv",
-        ]
-
-        skip_folders = {"delete", "keep"}
-        actual_files = set()
-
-        # Walk through subfolders to find actual files
-        for root, dirs, files in os.walk(self.photo_folder):
-            current_depth = root[len(self.photo_folder) :].count(os.sep)
-
-            if current_depth >= config.MAX_FOLDER_DEPTH:
-                dirs[:] = []
-                continue
-
-            dirs[:] = [d for d in dirs if d.lower() not in skip_folders]
-
-            for file in files:
-                file_ext = os.path.splitext(file)[1].lower()
-                if file_ext in extensions:
-                    full_path = os.path.join(root, file)
-                    relative_path = os.path.relpath(full_path, self.photo_folder)
-                    relative_path = relative_path.replace(os.sep, "/")
-                    actual_files.add(relative_path)
-
-        # Find metadata entries that don't correspond to actual files
-        metadata_keys = set(self.metadata_manager.metadata.keys())
-        orphaned_entries = metadata_keys - actual_files
-
-        # Group orphaned entries by base filename
-        base_to_entries = {}
-        for entry in orphaned_entries:
-            base_filename = self.get_base_filename(os.path.basename(entry))
-            folder_part = os.path.dirname(entry)
-            base_key = (folder_part, base_filename)  # (folder, base_filename)
-
-            if base_key not in base_to_entries:
-                base_to_entries[base_key] = []
-            base_to_entries[base_key].append(entry)
-
-        # Find duplicates: cases where we have both prefixed and non-prefixed versions
-        # but only one actually exists
-        entries_to_remove = []
-
-        for (folder_part, base_filename), entries in base_to_entries.items():
-            if len(entries) > 1:
-                print(
-                    f"Found duplicate entries for {folder_part}/{base_filename}: {entries}"
-                )
-
-                # Look for the corresponding actual file
-                corresponding_actual = None
-                for actual_file in actual_files:
-                    if (
-                        os.path.dirname(actual_file) == folder_part
-                        and self.get_base_filename(os.path.basename(actual_file))
-                        == base_filename
-                    ):
-                        corresponding_actual = actual_file
-                        break
+        if self.library_scan_running():
+            return
 
-                if corresponding_actual:
-                    # Keep the metadata entry that matches the actual file, remove others
-                    for entry in entries:
-                        if entry != corresponding_actual:
-                            entries_to_remove.append(entry)
-                            print(f"  - Will remove orphaned entry: {entry}")
-                            print(
-                                f"  - Keeping actual file entry: {corresponding_actual}"
-                            )
-                else:
-                    # No corresponding actual file, remove all but the most recent
-                    # (keep the one with the most comparisons as it's likely more valuable)
-                    entries_with_comparisons = [
-                        (
-                            entry,
-                            self.metadata_manager.metadata[entry].get("comparisons", 0),
-                        )
-                        for entry in entries
-                    ]
-                    entries_with_comparisons.sort(key=lambda x: x[1], reverse=True)
-
-                    # Keep the first (most comparisons), remove the rest
-                    for entry, _ in entries_with_comparisons[1:]:
-                        entries_to_remove.append(entry)
-                        print(f"  - Will remove duplicate entry: {entry}")
-                    print(
-                        f"  - Keeping entry with most comparisons: {entries_with_comparisons[0][0]}"
-                    )
+        entries_to_remove = remove_duplicate_entries(self.metadata_manager)
 
-        # Remove the orphaned entries
         if entries_to_remove:
-            for entry in entries_to_remove:
-                if entry in self.metadata_manager.metadata:
-                    del self.metadata_manager.metadata[entry]
-
-            self.metadata_manager.save_metadata()
-
             messagebox.showinfo(
                 "Cleanup Complete",
                 f"Removed {len(entries_to_remove)} duplicate metadata entries.\n\n"
@@ -487,49 +362,47 @@ class PhotoManager:
             messagebox.showinfo("No Duplicates", "No duplicate metadata entries found.")
 
     def clear_image_references(self):
-        """Clear all image references to free memory and prevent display issues"""
-        if hasattr(self, "img1_label"):
-            self.img1_label.configure(image="", text="")
-            self.img1_label.image = None
-            self.img1_label.unbind("<Button-1>")  # Remove any click events
-            self.img1_label.configure(cursor="")  # Reset cursor
-        if hasattr(self, "img2_label"):
-            self.img2_label.configure(image="", text="")
-            self.img2_label.image = None
-            self.img2_label.unbind("<Button-1>")  # Remove any click events
-            self.img2_label.configure(cursor="")  # Reset cursor
+        """Release both comparison images: the label's Tk image and our reference
+        to its PhotoImage, so the PIL and Tk copies are freed right away"""
+        for label in (
+            getattr(self, "img1_label", None),
+            getattr(self, "img2_label", None),
+        ):
+            if label is None:
+                continue
+            label.configure(image="", text="", cursor="")
+            label.image = None
+            label.unbind("<Button-1>")  # Remove any click events
 
     def create_photo_display(self):
         """Create the photo display area (extracted from show_summary_page)"""
-        # Get photos sorted by skill
-        photos_data = []
-        for relative_path, data in self.metadata_manager.metadata.items():
-            # Convert relative path to full path for file existence check
-            full_path = os.path.join(self.photo_folder, relative_path)
-
-            if os.path.exists(full_path):
-                quantile = self.metadata_manager.get_quantile(relative_path)
-                photos_data.append(
-                    (relative_path, data["skill"], quantile, data["comparisons"])
-                )
-            else:
-                print(f"File not found: {full_path}")
-
         # Sort based on toggle state
         if self.show_worst:
-            photos_data.sort(key=lambda x: x[1])  # Sort by skill (lowest first) - WORST
             display_title = "Worst Photos (Lowest Skill)"
             title_color = "red"
         else:
-            photos_data.sort(
-                key=lambda x: x[1], reverse=True
-            )  # Sort by skill (highest first) - BEST
             display_title = "Best Photos (Highest Skill)"
             title_color = "green"
 
-        # Show up to 20 photos (5 rows × 4 columns)
-        display_count = min(len(photos_data), 20)
-        photos_to_show = photos_data[:display_count]
+        # Show up to 20 photos (5 rows × 4 columns); the ranking is sorted over
+        # the skill column, so only the photos shown need a file existence check
+        photos_to_show = []
+        for relative_path in self.metadata_manager.iter_ranked_photos(self.show_worst):
+            full_path = os.path.join(self.photo_folder, relative_path)
+
+            if os.path.exists(full_path):
+                photos_to_show.append(
+                    (
+                        relative_path,
+                        self.metadata_manager.get_skill(relative_path),
+                        self.metadata_manager.get_quantile(relative_path),
+                        self.metadata_manager.get_comparisons(relative_path),
+                    )
+                )
+                if len(photos_to_show) >= 20:
+                    break
+            else:
+                log.warning("File not found: %s", full_path)
 
         # Update header to reflect current view
         for widget in self.root.winfo_children():
@@ -571,26 +444,12 @@ class PhotoManager:
             try:
                 # Convert relative path to full path
                 img_path = os.path.join(self.photo_folder, relative_path)
-                file_ext = os.path.splitext(relative_path)[1].lower()
-                video_extensions = [
-                    ".mp4",
-                    ".mov",
-                    ".mkv",
-                    ".wmv",
-                    ".flv",
-                ]
-
-                if file_ext in video_extensions:
-                    # Extract first frame from video
-                    img = self.extract_video_frame(img_path)
-                    is_video = True
-                else:
-                    # Regular image
-                    img = Image.open(img_path)
-                    is_video = False
-
-                img.thumbnail((280, 280), Image.Resampling.LANCZOS)
-                photo = ImageTk.PhotoImage(img)
+                img, is_video = cached_thumbnail(
+                    self.photo_folder, relative_path, config.SUMMARY_THUMBNAIL_SIZE
+                )
+                photo = memory_diagnostics.track(
+                    lazy_modules.image_tk().PhotoImage(img), "PhotoImage"
+                )
 
                 # Set border color based on file type
                 border_color = "red" if is_video else "blue"
@@ -616,7 +475,7 @@ class PhotoManager:
 
                         def create_video_handler(video_path):
                             def handler(event):
-                                print(f"Summary video clicked: {video_path}")
+                                log.debug("Summary video clicked: %s", video_path)
                                 self.open_video(video_path)
 
                             return handler
@@ -643,7 +502,7 @@ class PhotoManager:
                 info_label.pack(pady=2)
 
             except Exception as e:
-                print(f"Error loading {relative_path} in summary: {e}")
+                log.warning("Error loading %s in summary: %s", relative_path, e)
                 # Create error frame
                 photo_frame = tk.Frame(
                     scrollable_frame,
@@ -671,129 +530,15 @@ class PhotoManager:
                 return
 
         # Continue with existing keypress handling for comparison mode
-        if not hasattr(self, "current_images") or len(self.current_images) != 2:
+        if not hasattr(self, "current_ids") or len(self.current_ids) != 2:
             return
 
     def extract_video_frame(self, video_path):
         """Extract first frame from video file"""
-        try:
-            print(f"Opening video: {video_path}")  # Debug line
-
-            # Open video
-            cap = cv2.VideoCapture(video_path)
-
-            if not cap.isOpened():
-                print(f"Failed to open video: {video_path}")
-                return Image.new("RGB", (400, 300), color="red")
-
-            # Read first frame
-            ret, frame = cap.read()
-            cap.release()
-
-            if ret:
-                print("Successfully extracted frame")  # Debug line
-                # Convert BGR to RGB
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                # Convert to PIL Image
-                img = Image.fromarray(frame_rgb)
-                return img
-            else:
-                print("Failed to read frame from video")
-                # Fallback: create a placeholder image
-                return Image.new("RGB", (400, 300), color="gray")
-
-        except ImportError:
-            print("OpenCV not installed. Install with: pip install opencv-python")
-            return Image.new("RGB", (400, 300), color="red")
-        except Exception as e:
-            print(f"Error extracting frame: {e}")
-            return Image.new("RGB", (400, 300), color="gray")
-        finally:
-            # Always release the video capture
-            if cap is not None:
-                cap.release()
-
-    def get_base_filename(self, filename):
-        """Get the base filename without quantile prefix"""
-        if filename.startswith("Q") and "_" in filename[:5]:
-            underscore_pos = filename.find("_")
-            return filename[underscore_pos + 1 :]
-        return filename
-
-    def get_weighted_selection_from_list(self, image_list, k=2):
-        """Select images from provided list with weighting based on distance from quantile 30"""
-
-        # Remove any duplicate paths first
-        unique_images = list(set(image_list))
-        # print(f"Original list: {len(image_list)}, Unique: {len(unique_images)}")
-
-        if len(unique_images) < k:
-            print(f"Warning: Only {len(unique_images)} unique images available")
-            return unique_images
-
-        # Calculate weights based on distance from quantile 30
-        weights = []
-        valid_images = []  # Only images that are in metadata
-
-        for img_path in unique_images:
-            # Convert to relative path to match metadata keys
-            relative_path = os.path.relpath(img_path, self.photo_folder)
-            relative_path = relative_path.replace(os.sep, "/")  # Normalize separators
-
-            # Check if this image is in metadata
-            if relative_path not in self.metadata_manager.metadata:
-                print(f"Warning: {relative_path} not found in metadata, skipping")
-                continue
-
-            quantile = self.metadata_manager.get_quantile(relative_path)
-            # Distance from 30th quantile - images closer to 30 get higher weight
-            distance_from_30 = abs(quantile - 30)
-            # Invert the distance so closer images get higher weight
-            # Add 1 to avoid division by zero when quantile is exactly 30
-            weight = 1 / (distance_from_30 + 1)
-            weights.append(weight)
-            valid_images.append(img_path)
-
-        if len(valid_images) < k:
-            print(f"Warning: Only {len(valid_images)} valid images in metadata")
-            return valid_images
-
-        # Use weighted selection without replacement
-        import random
-
-        selected = []
-        available_images = valid_images.copy()
-        available_weights = weights.copy()
-
-        for _ in range(k):
-            if not available_images:
-                break
-
-            # Select one image based on weights
-            chosen = random.choices(available_images, weights=available_weights, k=1)[0]
-            selected.append(chosen)
-
-            # Remove the selected image and its weight from available options
-            chosen_index = available_images.index(chosen)
-            available_images.pop(chosen_index)
-            available_weights.pop(chosen_index)
-
-        # Convert to relative paths for debug output
-        selected_relative = []
-        selected_quantiles = []
-        for img_path in selected:
-            relative_path = os.path.relpath(img_path, self.photo_folder)
-            relative_path = relative_path.replace(os.sep, "/")
-            selected_relative.append(relative_path)
-            selected_quantiles.append(self.metadata_manager.get_quantile(relative_path))
-
-        print(f"Selected: {selected_relative}")
-        print(f"Quantiles: {selected_quantiles}")
-
-        return selected
+        return extract_video_frame(video_path)
 
     def handle_keypress(self, event):
-        if not hasattr(self, "current_images") or len(self.current_images) != 2:
+        if not hasattr(self, "current_ids") or len(self.current_ids) != 2:
             return
 
         # Arrow keys
@@ -819,155 +564,49 @@ class PhotoManager:
         elif event.keysym == "space":
             self.process_comparison(0.5, 0.5)  # Tie
 
-    def load_images(self):
-        """Load images recursively from subfolders"""
-        extensions = [
-            ".jpg",
-            ".jpeg",
-            ".png",
-            ".bmp",
-            ".gif",
-            ".tiff",
-            ".mp4",
-            ".mov",
-            ".mkv",
-            ".wmv",
-            ".flv",
-        ]
-
-        # Folders to skip (decisions already made)
-        skip_folders = {"delete", "keep"}
-
-        all_image_files = []
-
-        # Walk through subfolders with depth limit (same logic as _add_new_photos)
-        for root, dirs, files in os.walk(self.photo_folder):
-            # Calculate current depth
-            current_depth = root[len(self.photo_folder) :].count(os.sep)
-
-            # Skip if we're too deep (allow 4 levels: year/month/type/files)
-            if current_depth >= config.MAX_FOLDER_DEPTH:
-                dirs[:] = []  # Don't descend further
-                continue
-
-            # Remove skip folders from dirs list to prevent os.walk from entering them
-            dirs[:] = [d for d in dirs if d.lower() not in skip_folders]
+        # Undo the last vote (Backspace or Ctrl+Z)
+        elif event.keysym == "BackSpace" or (
+            event.keysym.lower() == "z" and event.state & 0x4
+        ):
+            self.undo_last_comparison()
 
-            # Process files in current directory
-            for file in files:
-                # Check if file has supported extension
-                file_ext = os.path.splitext(file)[1].lower()
-                if file_ext in extensions:
-                    # Get full path for the file list
-                    full_path = os.path.join(root, file)
-                    all_image_files.append(full_path)
+    def load_images(self):
+        """Load images recursively from subfolders and assign their photo IDs"""
+        if not self.metadata_manager:
+            self.image_ids = []
+            return
 
-        print(f"Found {len(all_image_files)} total image files")  # Debug
+        # The metadata mirrors the folder once a background scan has been applied;
+        # walking the folder here would block the Tk thread
+        all_relative_paths = list(self.metadata_manager.metadata.keys())
+        log.debug("Found %d total image files", len(all_relative_paths))
 
         # Filter out images with quantile below 10 for comparisons
-        self.image_files = []
-        masked_count = 0
-
-        for file_path in all_image_files:
-            # Convert to relative path to match metadata keys
-            relative_path = os.path.relpath(file_path, self.photo_folder)
-            relative_path = relative_path.replace(os.sep, "/")  # Normalize separators
-
-            if (
-                self.metadata_manager
-                and relative_path in self.metadata_manager.metadata
-            ):
-                quantile = self.metadata_manager.get_quantile(relative_path)
-                if quantile < 10:
-                    masked_count += 1
-                    continue  # Skip this image for comparisons
-            else:
-                print(f"Warning: {relative_path} not found in metadata")  # Debug
-
-            self.image_files.append(file_path)
-
-        print(f"Available for comparison: {len(self.image_files)} images")  # Debug
-        if masked_count > 0:
-            print(f"Masked due to low quantile: {masked_count} images")
-
-        if len(self.image_files) < 2:
-            print(
-                f"Warning: Only {len(self.image_files)} images available for comparison"
-            )
-            if masked_count > 0:
-                print(f"({masked_count} images masked due to low quantile)")
-
-    def load_images_with_sync(self):
-        """Load images and auto-sync any filename changes"""
-        # First try the normal load
-        self.load_images_original()
-
-        # Then sync any discrepancies
-        if hasattr(self, "metadata_manager") and self.metadata_manager:
-            self.sync_metadata_with_files()
-            # Reload after sync
-            self.load_images_original()
-
-    def load_images_original(self):
-        """Original load_images method (rename your current one to this)"""
-        extensions = [
-            "*.jpg",
-            "*.jpeg",
-            "*.png",
-            "*.bmp",
-            "*.gif",
-            "*.tiff",
-            "*.mp4",
-            # "*.avi",
-            "*.mov",
-            "*.mkv",
-            "*.wmv",
-            "*.flv",
-        ]
-        all_image_files = []
-
-        for ext in extensions:
-            all_image_files.extend(glob.glob(os.path.join(self.photo_folder, ext)))
-            all_image_files.extend(
-                glob.glob(os.path.join(self.photo_folder, ext.upper()))
-            )
-
-        # Filter out images with quantile below 0.10 for comparisons
-        self.image_files = []
-        masked_count = 0
-
-        for file_path in all_image_files:
-            filename = os.path.basename(file_path)
-            if self.metadata_manager and filename in self.metadata_manager.metadata:
-                quantile = self.metadata_manager.get_quantile(filename)
-                if quantile < 10:
-                    masked_count += 1
-                    continue  # Skip this image for comparisons
-
-            self.image_files.append(file_path)
+        self.image_ids, masked_count = comparison_pool(
+            self.metadata_manager, all_relative_paths
+        )
 
-        if len(self.image_files) < 2:
-            print(
-                f"Warning: Only {len(self.image_files)} images available for comparison"
-            )
-            if masked_count > 0:
-                print(f"({masked_count} images masked due to low quantile)")
+        log.info(
+            "Available for comparison: %d images (%d masked due to low quantile)",
+            len(self.image_ids),
+            masked_count,
+        )
+        if len(self.image_ids) < 2:
+            log.warning("Only %d images available for comparison", len(self.image_ids))
 
     def open_video(self, video_path):
         """Open video file with preferred video player"""
 
-        # Debug output
-        print(f"Attempting to open video: {video_path}")
-        print(f"File exists: {os.path.exists(video_path)}")
+        log.debug("Attempting to open video: %s", video_path)
 
         try:
             # Ensure we have an absolute path
             if not os.path.isabs(video_path):
                 video_path = os.path.abspath(video_path)
-                print(f"Converted to absolute path: {video_path}")
+                log.debug("Converted to absolute path: %s", video_path)
 
             if not os.path.exists(video_path):
-                print(f"Error: Video file does not exist: {video_path}")
+                log.warning("Video file does not exist: %s", video_path)
                 from tkinter import messagebox
 
                 messagebox.showerror(
@@ -997,17 +636,21 @@ class PhotoManager:
                     if os.path.exists(player_path):
                         # Build command with arguments
                         cmd = [player_path] + args + [video_path]
-                        print(f"Executing command: {cmd}")  # Debug
+                        log.debug("Executing command: %s", cmd)
                         subprocess.Popen(cmd)
-                        print(
-                            f"Opening video with {os.path.basename(player_path)}: {os.path.basename(video_path)}"
+                        log.info(
+                            "Opening video with %s: %s",
+                            os.path.basename(player_path),
+                            os.path.basename(video_path),
                         )
                         return
 
                 # Fallback to default association
-                print("No specific player found, using default association")
+                log.debug("No specific player found, using default association")
                 os.startfile(video_path)
-                print(f"Opening video with default app: {os.path.basename(video_path)}")
+                log.info(
+                    "Opening video with default app: %s", os.path.basename(video_path)
+                )
 
             elif platform.system() == "Darwin":  # macOS
                 subprocess.Popen(["open", video_path])
@@ -1015,7 +658,7 @@ class PhotoManager:
                 subprocess.Popen(["xdg-open", video_path])
 
         except Exception as e:
-            print(f"Error opening video {video_path}: {e}")
+            log.error("Error opening video %s: %s", video_path, e)
             from tkinter import messagebox
 
             messagebox.showerror("Error", f"Could not open video: {e}")
@@ -1024,46 +667,66 @@ class PhotoManager:
         if not self.metadata_manager:
             return
 
-        # Convert full paths to relative paths for metadata lookup
-        left_relative = os.path.relpath(self.current_images[0], self.photo_folder)
-        left_relative = left_relative.replace(os.sep, "/")  # Normalize separators
+        # Look up the interned relative paths (metadata keys) for the photo IDs
+        left_relative = self.metadata_manager.paths.path_of(self.current_ids[0])
+        right_relative = self.metadata_manager.paths.path_of(self.current_ids[1])
 
-        right_relative = os.path.relpath(self.current_images[1], self.photo_folder)
-        right_relative = right_relative.replace(os.sep, "/")  # Normalize separators
-
-        # Debug lines
-        print(f"Left image: {self.current_images[0]}")
-        print(f"Right image: {self.current_images[1]}")
-        print(f"Left relative: {left_relative}")
-        print(f"Right relative: {right_relative}")
-        print(f"Left in metadata: {left_relative in self.metadata_manager.metadata}")
-        print(f"Right in metadata: {right_relative in self.metadata_manager.metadata}")
+        log.debug("Vote: %s vs %s", left_relative, right_relative)
 
         # Convert scores to outcome for Elo system
-        if left_score == 1 and right_score == 0:  # Left wins
-            outcome = "left"
-        elif left_score == 0 and right_score == 1:  # Right wins
-            outcome = "right"
-        elif left_score == 1 and right_score == 1:  # Both win
-            outcome = "both"
-        elif left_score == 0 and right_score == 0:  # Both lose
-            outcome = "neither"
-        else:  # Tie
-            outcome = "tie"
-
-        # Update Elo ratings using relative paths
-        self.metadata_manager.update_skills(left_relative, right_relative, outcome)
-
-        # Show next pair
-        self.display_random_pair()
+        outcome = outcome_from_scores(left_score, right_score)
+
+        vote_timing.begin_vote()
+        with vote_timing.phase("vote"):
+            # Update Elo ratings using relative paths
+            with vote_timing.phase("update_skills"):
+                self.metadata_manager.update_skills(
+                    left_relative, right_relative, outcome
+                )
 
-        # Force garbage collection every 10 comparisons
-        if not hasattr(self, "comparison_count"):
-            self.comparison_count = 0
-        self.comparison_count += 1
+            # In a burst session the winner stays on for the next frame
+            if self.cluster_session is not None:
+                self.advance_cluster_session(outcome)
+
+            # Show next pair
+            with vote_timing.phase("display_pair"):
+                self.display_random_pair()
+        memory_diagnostics.vote_done()
+        self.update_timing_overlay()
+
+    def update_timing_overlay(self):
+        """Show the rolling per-phase p50/p95 in a corner of the window"""
+        diagnostics = vote_timing.enabled or memory_diagnostics.enabled
+        if not (self.show_timing_overlay and diagnostics):
+            if self.timing_overlay is not None:
+                self.timing_overlay.destroy()
+                self.timing_overlay = None
+            return
 
-        if self.comparison_count % 10 == 0:
-            gc.collect()
+        if self.timing_overlay is None or not self.timing_overlay.winfo_exists():
+            self.timing_overlay = tk.Label(
+                self.root,
+                font=("Courier", 9),
+                justify="left",
+                bg="black",
+                fg="lightgreen",
+            )
+        text = vote_timing.overlay_text()
+        if memory_diagnostics.enabled:
+            text += "\n" + "\n".join(memory_diagnostics.report_lines())
+        self.timing_overlay.config(text=text)
+        self.timing_overlay.place(relx=1.0, rely=1.0, anchor="se")
+        self.timing_overlay.lift()
+
+    def toggle_timing_overlay(self, event=None):
+        """F12: show or hide the latency overlay (turning timing on if needed)"""
+        self.show_timing_overlay = not self.show_timing_overlay
+        if self.show_timing_overlay and not vote_timing.enabled:
+            if self.photo_folder:
+                vote_timing.start_session(self.photo_folder)
+            else:
+                vote_timing.enabled = True
+        self.update_timing_overlay()
 
     def refresh_summary_display(self):
         """Refresh just the photo display part without rebuilding entire UI"""
@@ -1092,12 +755,8 @@ class PhotoManager:
             "Reset Scores",
             "Are you sure you want to reset all photo scores? This cannot be undone.",
         ):
-            for filename in self.metadata_manager.metadata:
-                self.metadata_manager.metadata[filename]["skill"] = 0
-                self.metadata_manager.metadata[filename]["comparisons"] = 0
-
-            self.metadata_manager.save_metadata()
-            print("All scores reset to default")
+            # Starts a new rating epoch - no per-photo rewrite needed
+            self.metadata_manager.reset_all_scores()
 
             # Refresh the summary page
             self.show_summary_page()
@@ -1106,10 +765,51 @@ class PhotoManager:
         folder = filedialog.askdirectory()
         if folder:
             self.photo_folder = folder
-            self.metadata_manager = MetadataManager(folder)
-            self.metadata_manager.load_metadata()
-            self.load_images()
-            self.show_summary_page()  # Show summary instead of going directly to comparison
+            self.open_library(folder)
+
+    def open_library(self, folder):
+        """Show a folder's summary from its stored metadata right away; the folder
+        is scanned in the background and the summary updated when that finishes"""
+        self.open_metadata_manager(folder)
+        self.metadata_manager.load_metadata(scan=False)
+        startup_timing.mark("metadata load")
+        if vote_timing.enabled:
+            vote_timing.start_session(folder)
+        # Before the scan, which would otherwise see half-renamed files
+        self.recover_interrupted_renames()
+        self.load_images()
+        self.start_library_scan(initial=True)
+        # Show summary instead of going directly to comparison
+        self.show_summary_page()
+        startup_timing.mark("summary page")
+
+    def recover_interrupted_renames(self):
+        """Offer to finish or undo a rename job that was interrupted (crash, power
+        loss) so files and metadata agree again"""
+        pending = pending_renames(self.photo_folder)
+        if not pending:
+            return
+
+        answer = messagebox.askyesnocancel(
+            "Interrupted Rename",
+            f"A rename of {pending} files did not finish.\n\n"
+            "Yes: finish renaming\nNo: restore the old names\nCancel: decide later",
+        )
+        if answer is None:
+            return
+        if answer:
+            count, failed = resume_renames(self.metadata_manager)
+            action = "Renamed"
+        else:
+            count, failed = rollback_renames(self.metadata_manager)
+            action = "Restored"
+
+        message = f"{action} {count} files."
+        if failed:
+            message += f"\n\n{len(failed)} files failed:\n" + "\n".join(
+                f"• {name}: {error}" for name, error in failed[:10]
+            )
+        messagebox.showinfo("Interrupted Rename", message)
 
     def setup_ui(self):
         # Top button frame
@@ -1139,7 +839,7 @@ class PhotoManager:
         # Add instructions
         instructions = tk.Label(
             self.root,
-            text="← Left Wins | → Right Wins | ↑ Both Win | ↓ Both Lose | Space = Tie",
+            text="← Left Wins | → Right Wins | ↑ Both Win | ↓ Both Lose | Space = Tie | Backspace = Undo",
             font=("Arial", 10),
         )
         instructions.pack(pady=5)
@@ -1162,31 +862,12 @@ class PhotoManager:
     def show_error_image(self, label, path, error_msg):
         """Display an error placeholder when image loading fails"""
         try:
-            # Create a simple error image
-
-            error_img = Image.new("RGB", (400, 300), color="red")
-            draw = ImageDraw.Draw(error_img)
-
-            # Add error text
             filename = os.path.basename(path)
-            error_text = f"ERROR\n{filename}\n{error_msg[:50]}..."
-
-            # Try to use a font, fall back to default if not available
-            try:
-                font = ImageFont.truetype("arial.ttf", 16)
-            except:
-                font = ImageFont.load_default()
-
-            # Get text size and center it
-            bbox = draw.textbbox((0, 0), error_text, font=font)
-            text_width = bbox[2] - bbox[0]
-            text_height = bbox[3] - bbox[1]
-            x = (400 - text_width) // 2
-            y = (300 - text_height) // 2
-
-            draw.text((x, y), error_text, fill="white", font=font, align="center")
+            error_img = error_thumbnail(path, error_msg)
 
-            photo = ImageTk.PhotoImage(error_img)
+            photo = memory_diagnostics.track(
+                lazy_modules.image_tk().PhotoImage(error_img), "PhotoImage"
+            )
             label.configure(
                 image=photo,
                 text=f"Error loading: {filename}",
@@ -1202,7 +883,7 @@ class PhotoManager:
 
         except Exception as fallback_error:
             # Ultimate fallback - just show text
-            print(f"Error creating error image: {fallback_error}")
+            log.error("Error creating error image: %s", fallback_error)
             label.configure(
                 image="",
                 text=f"ERROR: Could not load\n{os.path.basename(path)}\n{error_msg}",
@@ -1215,41 +896,29 @@ class PhotoManager:
             )
             label.image = None
 
-    def show_image(self, path, label):
+    def show_image(self, photo_id, label):
         """Show image with improved error handling and cleanup"""
+        # Strings are only built here, for file I/O and display
+        relative_path = self.metadata_manager.paths.path_of(photo_id)
+        path = self.metadata_manager.paths.full_path(photo_id)
         try:
-            # Convert to relative path for metadata lookup
-            relative_path = os.path.relpath(path, self.photo_folder)
-            relative_path = relative_path.replace(os.sep, "/")  # Normalize separators
-
             filename = os.path.basename(path)  # For display purposes
-            file_ext = os.path.splitext(path)[1].lower()
-
-            # Check if it's a video file
-            video_extensions = [".mp4", ".mov", ".mkv", ".wmv", ".flv"]
-
-            if file_ext in video_extensions:
-                # Extract first frame from video
-                img = self.extract_video_frame(path)
-                is_video = True
-            else:
-                # Regular image
-                img = Image.open(path)
-                is_video = False
 
             # Resize to fit in half the window
-            img.thumbnail((580, 400), Image.Resampling.LANCZOS)
-            photo = ImageTk.PhotoImage(img)
+            with vote_timing.phase("decode"):
+                img, is_video = load_thumbnail(path, (580, 400))
+            with vote_timing.phase("photoimage"):
+                photo = memory_diagnostics.track(
+                    lazy_modules.image_tk().PhotoImage(img), "PhotoImage"
+                )
 
             # Get metadata safely using relative path
             if relative_path in self.metadata_manager.metadata:
-                skill = self.metadata_manager.metadata[relative_path]["skill"]
-                comparisons = self.metadata_manager.metadata[relative_path][
-                    "comparisons"
-                ]
+                skill = self.metadata_manager.get_skill(relative_path)
+                comparisons = self.metadata_manager.get_comparisons(relative_path)
                 quantile = self.metadata_manager.get_quantile(relative_path)
             else:
-                print(f"Warning: {relative_path} not found in metadata")
+                log.warning("%s not found in metadata", relative_path)
                 skill = 0
                 comparisons = 0
                 quantile = 50
@@ -1292,29 +961,30 @@ class PhotoManager:
                 if os.path.exists(abs_path):
                     # Create a closure that captures the absolute path
                     def video_click_handler(event, video_path=abs_path):
-                        print(f"Video clicked: {video_path}")  # Debug
+                        log.debug("Video clicked: %s", video_path)
                         self.open_video(video_path)
 
                     label.bind("<Button-1>", video_click_handler)
-                    print(f"Bound video click handler for: {abs_path}")  # Debug
                 else:
-                    print(f"Warning: Video file not found: {abs_path}")
+                    log.warning("Video file not found: %s", abs_path)
             else:
                 label.configure(cursor="")
 
         except Exception as e:
-            print(f"Exception in show_image for {path}: {e}")
+            log.warning("Exception in show_image for %s: %s", path, e)
             # Don't let the exception propagate - show error image instead
             self.show_error_image(label, path, str(e))
 
     def show_summary_page(self):
-        """Enhanced summary page with best/worst toggle"""
+        """Enhanced summary page with best/worst toggle.
+        Shown from the current metadata; the library is only scanned when it is
+        opened and on Sync Files."""
         # Clear existing widgets
         for widget in self.root.winfo_children():
             widget.destroy()
 
+        self.summary_visible = True
         self.load_images()
-        self.sync_files(silent=True)
 
         # Only resize if config allows it AND user hasn't manually resized
         if not config.REMEMBER_WINDOW_SIZE:
@@ -1346,6 +1016,16 @@ class PhotoManager:
         )
         compare_btn.pack(side="left", padx=10)
 
+        # Button to compare within bursts / near-duplicate groups first
+        burst_btn = tk.Button(
+            button_frame,
+            text="Compare Bursts First",
+            command=lambda: self.start_comparison_mode(cluster_first=True),
+            font=("Arial", 12),
+            bg="plum",
+        )
+        burst_btn.pack(side="left", padx=10)
+
         # NEW: Best/Worst Toggle Button
         toggle_text = "Show BEST Photos" if self.show_worst else "Show WORST Photos"
         toggle_color = "lightgreen" if self.show_worst else "lightcoral"
@@ -1389,6 +1069,26 @@ class PhotoManager:
         )
         remove_prefix_btn.pack(side="left", padx=5)
 
+        # Button to move confidently rated photos to delete/ and keep/
+        cull_btn = tk.Button(
+            button_frame,
+            text="Cull",
+            command=self.cull_confident_photos,
+            font=("Arial", 12),
+            bg="lightcoral",
+        )
+        cull_btn.pack(side="left", padx=5)
+
+        # Button to export a ranked view of links instead of renaming
+        ranked_view_btn = tk.Button(
+            button_frame,
+            text="Ranked View",
+            command=self.export_ranked_view,
+            font=("Arial", 12),
+            bg="lightgreen",
+        )
+        ranked_view_btn.pack(side="left", padx=5)
+
         # Button to sync metadata with manually renamed files
         sync_btn = tk.Button(
             button_frame,
@@ -1442,9 +1142,7 @@ class PhotoManager:
             total_photos = (
                 len(self.metadata_manager.metadata) if self.metadata_manager else 0
             )
-            available_photos = (
-                len(self.image_files) if hasattr(self, "image_files") else 0
-            )
+            available_photos = len(self.image_ids) if hasattr(self, "image_ids") else 0
             count_info = tk.Label(
                 header_frame,
                 text=f"Photos: {available_photos} available / {total_photos} total",
@@ -1452,6 +1150,39 @@ class PhotoManager:
                 fg="darkgreen",
             )
             count_info.pack(pady=2)
+
+            # Progress of the background scan (cleared when it finishes)
+            self.scan_status_label = tk.Label(
+                header_frame,
+                text=self.library_scan.status if self.library_scan else "",
+                font=("Arial", 9),
+                fg="gray",
+            )
+            self.scan_status_label.pack(pady=1)
+
+            # Near-duplicate groups found by perceptual hashing
+            if self.metadata_manager and config.ENABLE_PERCEPTUAL_HASHING:
+                clusters = self.metadata_manager.get_duplicate_clusters()
+                duplicate_photos = sum(len(cluster) for cluster in clusters)
+                duplicate_info = tk.Label(
+                    header_frame,
+                    text=f"Near-duplicate groups: {len(clusters)} ({duplicate_photos} photos)",
+                    font=("Arial", 10),
+                    fg="purple",
+                )
+                duplicate_info.pack(pady=2)
+
+            # Byte-identical copies found by content fingerprints
+            if self.metadata_manager and config.ENABLE_CONTENT_FINGERPRINTS:
+                exact_groups = self.metadata_manager.get_exact_duplicates()
+                extra_copies = sum(len(group) - 1 for group in exact_groups)
+                exact_info = tk.Label(
+                    header_frame,
+                    text=f"Exact copies: {extra_copies} redundant files in {len(exact_groups)} groups",
+                    font=("Arial", 10),
+                    fg="purple",
+                )
+                exact_info.pack(pady=2)
         else:
             no_folder = tk.Label(
                 header_frame,
@@ -1502,8 +1233,8 @@ class PhotoManager:
         for widget in self.root.winfo_children():
             widget.destroy()
 
+        self.summary_visible = True
         self.load_images()
-        self.sync_files(silent=True)
 
         # Button frame
         button_frame = tk.Frame(self.root)
@@ -1591,9 +1322,7 @@ class PhotoManager:
             total_photos = (
                 len(self.metadata_manager.metadata) if self.metadata_manager else 0
             )
-            available_photos = (
-                len(self.image_files) if hasattr(self, "image_files") else 0
-            )
+            available_photos = len(self.image_ids) if hasattr(self, "image_ids") else 0
             count_info = tk.Label(
                 header_frame,
                 text=f"Photos: {available_photos} available / {total_photos} total",
@@ -1635,14 +1364,93 @@ class PhotoManager:
         # Create the photo display
         self.create_photo_display()
 
-    def start_comparison_mode(self):
-        """Switch to comparison mode"""
+    def start_quality_analysis(self):
+        """Analyze unrated photos in the background and seed their skill from quality features"""
+        if not config.ENABLE_QUALITY_PRIOR or not self.metadata_manager:
+            return
+        if self.quality_queue is not None:
+            return  # Analysis already running
+
+        pending = self.metadata_manager.get_unanalyzed_photos()
+        if not pending:
+            return
+
+        log.info("Starting quality analysis of %d photos", len(pending))
+        results_queue = queue.Queue()
+        photo_folder = self.photo_folder
+
+        def worker():
+            try:
+                for batch in iter_quality_features(
+                    photo_folder,
+                    pending,
+                    workers=config.QUALITY_ANALYSIS_WORKERS,
+                    batch_size=config.QUALITY_ANALYSIS_BATCH_SIZE,
+                ):
+                    results_queue.put(batch)
+            except Exception as e:
+                log.error("Quality analysis failed: %s", e)
+            results_queue.put(None)  # Done
+
+        self.quality_queue = results_queue
+        threading.Thread(target=worker, daemon=True).start()
+        self.root.after(500, self.poll_quality_analysis)
+
+    def poll_quality_analysis(self):
+        """Apply finished quality analysis batches (runs on the Tk thread)"""
+        if self.quality_queue is None:
+            return
+
+        finished = False
+        applied = 0
+        while True:
+            try:
+                batch = self.quality_queue.get_nowait()
+            except queue.Empty:
+                break
+            if batch is None:
+                finished = True
+                break
+            # The folder may have changed while the worker was running
+            if self.metadata_manager:
+                applied += self.metadata_manager.apply_quality_priors(batch)
+
+        if applied:
+            log.info("Quality prior applied to %d photos", applied)
+
+        if finished:
+            self.quality_queue = None
+            log.info("Quality analysis complete")
+        else:
+            self.root.after(500, self.poll_quality_analysis)
+
+    def start_cluster_session(self):
+        """Queue bursts / near-duplicate groups so they are compared before random pairs"""
+        self.cluster_session = ClusterSession.from_photo_ids(
+            self.metadata_manager, self.image_ids
+        )
+        log.info("Burst session: %d clusters queued", self.cluster_session.total)
+
+        if not self.cluster_session.active():
+            self.cluster_session = None
+            messagebox.showinfo(
+                "No Bursts Found",
+                "No bursts or near-duplicate groups found. Comparing random pairs.",
+            )
+
+    def start_comparison_mode(self, cluster_first=False):
+        """Switch to comparison mode (optionally comparing within bursts first)"""
         # Unbind mousewheel events before clearing widgets
         self.root.unbind("<MouseWheel>")
 
         # Clear and rebuild UI
         for widget in self.root.winfo_children():
             widget.destroy()
+        self.summary_visible = False
+
+        self.cluster_session = None
+        if cluster_first:
+            self.start_cluster_session()
 
         self.setup_ui()
         self.display_random_pair()
@@ -1650,179 +1458,42 @@ class PhotoManager:
     def toggle_best_worst(self):
         """Toggle between showing best and worst photos"""
         self.show_worst = not self.show_worst
-        print(f"Now showing: {'WORST' if self.show_worst else 'BEST'} photos")
+        log.debug("Now showing: %s photos", "WORST" if self.show_worst else "BEST")
 
         # Rebuild the entire summary page to update button text and headers
         self.show_summary_page()
 
-    def update_file_names(self):
-        """Update all file names to include quantile prefix (QXXX_)"""
+    def undo_last_comparison(self):
+        """Undo the most recent vote and show that pair again"""
         if not self.metadata_manager:
-            messagebox.showwarning("No Folder", "Please select a photo folder first")
             return
 
-        # Collect files that need renaming
-        files_to_rename = []
-        already_renamed = []
-
-        for filename, data in self.metadata_manager.metadata.items():
-            file_path = os.path.join(self.photo_folder, filename)
-
-            if not os.path.exists(file_path):
-                continue
-
-            # Check if file already has quantile prefix
-            if filename.startswith("Q") and "_" in filename[:5]:
-                # Check if it matches current quantile
-                current_quantile = self.metadata_manager.get_quantile(filename)
-                # Convert to 3 digits including first decimal place: 50.6 -> 506
-                quantile_int = int(current_quantile * 10)
-                expected_prefix = f"Q{quantile_int:03d}_"
-
-                if filename.startswith(expected_prefix):
-                    already_renamed.append(filename)
-                    continue
-                else:
-                    # File has old quantile prefix, needs updating
-                    files_to_rename.append((file_path, filename))
-            else:
-                # File has no quantile prefix
-                files_to_rename.append((file_path, filename))
-
-        if not files_to_rename:
-            messagebox.showinfo(
-                "Already Updated",
-                f"All {len(already_renamed)} files already have correct quantile prefixes",
-            )
+        undone = self.metadata_manager.undo_last_comparisons(1)
+        if not undone:
+            log.info("Nothing to undo")
             return
 
-        # Show confirmation dialog
-        if not messagebox.askyesno(
-            "Rename Files",
-            f"This will rename {len(files_to_rename)} files with quantile prefixes.\n"
-            f"{len(already_renamed)} files already have correct prefixes.\n\n"
-            "Do you want to continue?",
-        ):
+        # A burst in progress can't be rewound vote by vote - restart it instead
+        if self.cluster_session is not None and self.cluster_session.current:
+            self.cluster_session.restart_current()
+            self.display_random_pair()
             return
 
-        # Create progress window
-        progress_window = tk.Toplevel(self.root)
-        progress_window.title("Renaming Files")
-        progress_window.geometry("500x150")
-        progress_window.grab_set()
-
-        # Center the window
-        progress_window.transient(self.root)
-        progress_window.geometry(
-            "+%d+%d" % (self.root.winfo_rootx() + 50, self.root.winfo_rooty() + 50)
-        )
-
-        progress_label = tk.Label(progress_window, text="Starting...", wraplength=450)
-        progress_label.pack(pady=10)
-
-        progress_bar = ttk.Progressbar(progress_window, mode="determinate")
-        progress_bar.pack(pady=10, padx=20, fill="x")
-        progress_bar["maximum"] = len(files_to_rename)
-
-        status_label = tk.Label(progress_window, text="", font=("Arial", 8))
-        status_label.pack(pady=5)
-
-        success_count = 0
-        failed_renames = []
-        new_metadata = {}
-
-        for i, (file_path, old_filename) in enumerate(files_to_rename):
-            progress_label.config(text=f"Renaming: {old_filename}")
-            progress_bar["value"] = i + 1
-            status_label.config(text=f"{i+1}/{len(files_to_rename)} files processed")
-            progress_window.update()
-
-            try:
-                # Calculate new filename
-                quantile = self.metadata_manager.get_quantile(old_filename)
-                # Convert to 3 digits including first decimal place: 50.6 -> 506
-                quantile_int = int(quantile * 10)
-                quantile_prefix = f"Q{quantile_int:03d}_"
-
-                # Remove old quantile prefix if it exists
-                if old_filename.startswith("Q") and "_" in old_filename[:5]:
-                    # Find the first underscore and take everything after it
-                    underscore_pos = old_filename.find("_")
-                    base_filename = old_filename[underscore_pos + 1 :]
-                else:
-                    base_filename = old_filename
-
-                new_filename = quantile_prefix + base_filename
-                new_file_path = os.path.join(self.photo_folder, new_filename)
-
-                # Check if new filename already exists
-                if os.path.exists(new_file_path) and new_file_path != file_path:
-                    print(
-                        f"Warning: {new_filename} already exists, skipping {old_filename}"
-                    )
-                    failed_renames.append((old_filename, "File already exists"))
-                    continue
-
-                # Rename the file
-                os.rename(file_path, new_file_path)
-
-                # Update metadata with new filename
-                old_data = self.metadata_manager.metadata[old_filename]
-                new_metadata[new_filename] = old_data
-
-                print(f"Renamed: {old_filename} -> {new_filename}")
-                success_count += 1
-
-            except Exception as e:
-                print(f"Failed to rename {old_filename}: {e}")
-                failed_renames.append((old_filename, str(e)))
-
-        # Update metadata with new filenames
-        if new_metadata:
-            # Remove old entries and add new ones
-            for old_filename, _ in files_to_rename:
-                if old_filename in self.metadata_manager.metadata:
-                    # Check if we successfully renamed this file
-                    quantile = self.metadata_manager.get_quantile(old_filename)
-                    # Convert to 3 digits including first decimal place: 50.6 -> 506
-                    quantile_int = int(quantile * 10)
-                    quantile_prefix = f"Q{quantile_int:03d}_"
-
-                    if old_filename.startswith("Q") and "_" in old_filename[:5]:
-                        underscore_pos = old_filename.find("_")
-                        base_filename = old_filename[underscore_pos + 1 :]
-                    else:
-                        base_filename = old_filename
-
-                    new_filename = quantile_prefix + base_filename
-
-                    if new_filename in new_metadata:
-                        # Successfully renamed, remove old entry
-                        del self.metadata_manager.metadata[old_filename]
-
-            # Add new entries
-            self.metadata_manager.metadata.update(new_metadata)
-            self.metadata_manager.save_metadata()
-
-        progress_window.destroy()
+        record = undone[0]
+        paths = self.metadata_manager.paths
+        pair = [paths.intern(record["a"]), paths.intern(record["b"])]
+        if not all(os.path.exists(paths.full_path(photo_id)) for photo_id in pair):
+            self.display_random_pair()
+            return
 
-        # Show results
-        if failed_renames:
-            error_msg = f"Renamed {success_count}/{len(files_to_rename)} files\n\nFailed renames:\n"
-            error_msg += "\n".join(
-                [f"• {name}: {error}" for name, error in failed_renames[:10]]
-            )
-            if len(failed_renames) > 10:
-                error_msg += f"\n... and {len(failed_renames) - 10} more"
-            messagebox.showwarning("Rename Complete with Errors", error_msg)
-        else:
-            messagebox.showinfo(
-                "Rename Complete",
-                f"Successfully renamed {success_count} files with quantile prefixes!",
-            )
+        self.clear_image_references()
+        self.current_ids = pair
+        self.show_image(self.current_ids[0], self.img1_label)
+        self.show_image(self.current_ids[1], self.img2_label)
 
-        # Refresh the summary page to show new names
-        self.show_summary_page()
+    def update_file_names(self):
+        """Update all file names to include quantile prefix (QXXX_)"""
+        self.add_prefix_to_files()
 
     def remove_prefix_from_files(self):
         """Remove quantile prefix from files that have it"""
@@ -1830,25 +1501,13 @@ class PhotoManager:
             messagebox.showwarning("No Folder", "Please select a photo folder first")
             return
 
-        # Collect files that have prefixes to remove
-        files_to_rename = []
-        no_prefix = []
-
-        for relative_path, data in self.metadata_manager.metadata.items():
-            # Convert relative path to full path
-            file_path = os.path.join(self.photo_folder, relative_path)
-
-            if not os.path.exists(file_path):
-                continue
-
-            # Get just the filename (without folder path) to check for prefix
-            filename = os.path.basename(relative_path)
+        if self.library_scan_running():
+            return
 
-            # Check if file has quantile prefix
-            if filename.startswith("Q") and "_" in filename[:5]:
-                files_to_rename.append((file_path, relative_path))
-            else:
-                no_prefix.append(relative_path)
+        # Collect files that have prefixes to remove
+        files_to_rename, no_prefix = plan_prefix_renames(
+            self.metadata_manager, add_prefix=False
+        )
 
         if not files_to_rename:
             messagebox.showinfo(
@@ -1880,102 +1539,86 @@ class PhotoManager:
         # Refresh the summary page
         self.show_summary_page()
 
-    def get_quantile_from_filename(self, filename):
-        """Extract quantile from filename if it has the QXXX_ prefix"""
-        if filename.startswith("Q") and "_" in filename[:5]:
-            try:
-                # Extract the number between Q and _
-                underscore_pos = filename.find("_")
-                quantile_str = filename[1:underscore_pos]
-                # Convert back from 3-digit format: 506 -> 50.6
-                quantile_int = int(quantile_str)
-                return quantile_int / 10.0
-            except (ValueError, IndexError):
-                pass
-        return None
-
-    def sync_metadata_with_files(self):
-        """Sync metadata when files have been manually renamed"""
+    def cull_confident_photos(self):
+        """Move photos whose confidence bound is clearly in the bottom band to
+        delete/ and clearly in the top band to keep/, shrinking the active library"""
         if not self.metadata_manager:
+            messagebox.showwarning("No Folder", "Please select a photo folder first")
             return
 
-        # Get all actual files in the directory
-        extensions = [
-            "*.jpg",
-            "*.jpeg",
-            "*.png",
-            "*.bmp",
-            "*.gif",
-            "*.tiff",
-            "*.mp4",
-            # "*.avi",
-            "*.mov",
-            "*.mkv",
-            "*.wmv",
-            "*.flv",
-        ]
-        actual_files = set()
-
-        for ext in extensions:
-            actual_files.update(glob.glob(os.path.join(self.photo_folder, ext)))
-            actual_files.update(glob.glob(os.path.join(self.photo_folder, ext.upper())))
-
-        actual_filenames = {os.path.basename(f) for f in actual_files}
-        metadata_filenames = set(self.metadata_manager.metadata.keys())
-
-        # Find files that exist but aren't in metadata (manually renamed)
-        missing_from_metadata = actual_filenames - metadata_filenames
-
-        # Find metadata entries that don't have corresponding files
-        missing_files = metadata_filenames - actual_filenames
-
-        updates_made = 0
-
-        # Try to match missing files with existing files
-        for missing_metadata_name in missing_files:
-            # Get the base name without quantile prefix
-            base_name = self.get_base_filename(missing_metadata_name)
-
-            # Look for this base name in the actual files
-            for actual_name in missing_from_metadata:
-                actual_base = self.get_base_filename(actual_name)
-
-                if base_name == actual_base:
-                    # Found a match! Update metadata
-                    old_data = self.metadata_manager.metadata[missing_metadata_name]
-                    self.metadata_manager.metadata[actual_name] = old_data
-                    del self.metadata_manager.metadata[missing_metadata_name]
-
-                    print(f"Synced: {missing_metadata_name} -> {actual_name}")
-                    updates_made += 1
-                    break
+        if self.library_scan_running():
+            return
+
+        plan = plan_cull(self.metadata_manager)
+        total = len(plan["delete"]) + len(plan["keep"])
+        if not total:
+            messagebox.showinfo(
+                "Nothing to Cull",
+                "No photo is rated confidently enough to move yet.",
+            )
+            return
+
+        if not messagebox.askyesno(
+            "Cull Photos",
+            f"Move {len(plan['delete'])} photos below quantile "
+            f"{config.CULL_DELETE_QUANTILE} to '{config.DELETE_FOLDER}' and "
+            f"{len(plan['keep'])} photos above quantile {config.CULL_KEEP_QUANTILE} "
+            f"to '{config.KEEP_FOLDER}'?\n\n"
+            "Subfolders are preserved and the photos leave the comparison pool.",
+        ):
+            return
+
+        progress_window, show_progress = self._progress_window(
+            "Culling Photos", total, "Moving"
+        )
+        try:
+            moved, failed = apply_cull(
+                self.metadata_manager, plan, progress=show_progress
+            )
+        except RuntimeError as e:  # An interrupted rename job is still pending
+            progress_window.destroy()
+            messagebox.showerror("Cull Blocked", str(e))
+            return
+        progress_window.destroy()
+
+        message = (
+            f"Moved {moved['delete']} photos to '{config.DELETE_FOLDER}' and "
+            f"{moved['keep']} to '{config.KEEP_FOLDER}'."
+        )
+        if failed:
+            message += f"\n{len(failed)} photos could not be moved."
+        messagebox.showinfo("Cull Complete", message)
+
+        self.load_images()
+        self.show_summary_page()
+
+    def export_ranked_view(self):
+        """Update the ranked folder of links named by quantile, leaving the
+        original files (and their metadata keys) untouched"""
+        if not self.metadata_manager:
+            messagebox.showwarning("No Folder", "Please select a photo folder first")
+            return
+
+        try:
+            result = export_links(self.metadata_manager)
+        except OSError as e:
+            messagebox.showerror("Export Failed", f"Could not update the view: {e}")
+            return
 
-        # Add any completely new files
-        remaining_new_files = actual_filenames - set(
-            self.metadata_manager.metadata.keys()
+        message = (
+            f"Ranked view updated in '{config.EXPORT_FOLDER}':\n"
+            f"{result['created']} links created, {result['removed']} removed, "
+            f"{result['kept']} unchanged."
         )
-        for new_file in remaining_new_files:
-            self.metadata_manager.metadata[new_file] = {
-                "keep": None,
-                "rating": None,
-                "tags": [],
-                "last_compared": None,
-                "created_date": datetime.now().isoformat(),
-                "skill": 0,
-                "comparisons": 0,
-            }
-            print(f"Added new file: {new_file}")
-            updates_made += 1
-
-        if updates_made > 0:
-            self.metadata_manager.save_metadata()
-            print(f"Synced {updates_made} file changes")
-            return True
-
-        return False
+        if result["symlinks"]:
+            message += f"\n{result['symlinks']} symlinks used (no hardlink support)."
+        if result["failed"]:
+            message += f"\n{len(result['failed'])} files could not be linked."
+        messagebox.showinfo("Ranked View", message)
 
     def sync_files(self, silent=False):
-        """Synchronize metadata file with actual files present in folder (with duplicate cleanup)"""
+        """Synchronize metadata file with actual files present in folder (with duplicate cleanup).
+        Runs in the background; the result is reported when the scan finishes."""
         if not self.metadata_manager:
             if not silent:
                 messagebox.showwarning(
@@ -1983,166 +1626,75 @@ class PhotoManager:
                 )
             return
 
-        # Get all actual files recursively (same logic as _add_new_photos)
-        extensions = [
-            ".jpg",
-            ".jpeg",
-            ".png",
-            ".bmp",
-            ".gif",
-            ".tiff",
-            ".mp4",
-            ".mov",
-            ".mkv",
-            ".wmv",
-            ".flv",
-        ]
-
-        # Folders to skip (decisions already made)
-        skip_folders = {"delete", "keep"}
-
-        actual_files = []
-
-        # Walk through subfolders with depth limit (same logic as _add_new_photos)
-        for root, dirs, files in os.walk(self.photo_folder):
-            # Calculate current depth
-            current_depth = root[len(self.photo_folder) :].count(os.sep)
-
-            # Skip if we're too deep (allow 4 levels: year/month/type/files)
-            if current_depth >= config.MAX_FOLDER_DEPTH:
-                dirs[:] = []  # Don't descend further
-                continue
+        self.start_library_scan(report=not silent)
 
-            # Remove skip folders from dirs list to prevent os.walk from entering them
-            dirs[:] = [d for d in dirs if d.lower() not in skip_folders]
-
-            # Process files in current directory
-            for file in files:
-                # Check if file has supported extension
-                file_ext = os.path.splitext(file)[1].lower()
-                if file_ext in extensions:
-                    # Get full path
-                    full_path = os.path.join(root, file)
-                    actual_files.append(full_path)
-
-        # Convert to relative paths for comparison with metadata keys
-        actual_relative_paths = set()
-        for file_path in actual_files:
-            relative_path = os.path.relpath(file_path, self.photo_folder)
-            relative_path = relative_path.replace(os.sep, "/")  # Normalize separators
-            actual_relative_paths.add(relative_path)
-
-        metadata_filenames = set(self.metadata_manager.metadata.keys())
-
-        print(f"Actual files found: {len(actual_relative_paths)}")
-        print(f"Metadata entries: {len(metadata_filenames)}")
-
-        # Files that exist but aren't in metadata (need to be added)
-        missing_from_metadata = actual_relative_paths - metadata_filenames
-
-        # Files in metadata but don't exist (need to be removed)
-        missing_files = metadata_filenames - actual_relative_paths
-
-        changes_made = 0
-        duplicates_removed = 0
-
-        # DUPLICATE CLEANUP: Before removing missing files, check for duplicates
-        # Group missing files by base filename to find potential duplicates
-        base_to_missing = {}
-        for missing_entry in missing_files:
-            base_filename = self.get_base_filename(os.path.basename(missing_entry))
-            folder_part = os.path.dirname(missing_entry)
-            base_key = (folder_part, base_filename)
-
-            if base_key not in base_to_missing:
-                base_to_missing[base_key] = []
-            base_to_missing[base_key].append(missing_entry)
-
-        # Check for cases where we have both a missing file and an actual file with the same base name
-        duplicates_to_remove = []
-        for (folder_part, base_filename), missing_entries in base_to_missing.items():
-            # Look for corresponding actual file with same base name
-            corresponding_actual = None
-            for actual_file in actual_relative_paths:
-                if (
-                    os.path.dirname(actual_file) == folder_part
-                    and self.get_base_filename(os.path.basename(actual_file))
-                    == base_filename
-                ):
-                    corresponding_actual = actual_file
-                    break
+    def start_library_scan(self, initial=False, report=False):
+        """Scan the folder on a worker thread (initial=True finishes a
+        load_metadata(scan=False)). A scan already running is reused."""
+        if not self.metadata_manager:
+            return
+        self.scan_report = self.scan_report or report
 
-            if corresponding_actual and len(missing_entries) >= 1:
-                # We have actual file and missing metadata entries with same base name
-                # This indicates duplicates from renaming operations
-
-                # If the actual file doesn't have metadata, transfer from the missing entry
-                if corresponding_actual not in metadata_filenames:
-                    # Find the missing entry with the most comparisons (most valuable data)
-                    best_missing = max(
-                        missing_entries,
-                        key=lambda x: self.metadata_manager.metadata[x].get(
-                            "comparisons", 0
-                        ),
-                    )
+        if self.library_scan is not None:
+            if self.library_scan.manager is self.metadata_manager:
+                return
+            log.info("Folder changed, abandoning the previous folder's scan")
 
-                    # Transfer metadata from missing entry to actual file
-                    self.metadata_manager.metadata[corresponding_actual] = (
-                        self.metadata_manager.metadata[best_missing]
-                    )
-                    print(
-                        f"Transferred metadata: {best_missing} -> {corresponding_actual}"
-                    )
-                    changes_made += 1
+        scan = LibraryScan(self.metadata_manager, initial).start()
+        self.library_scan = scan
+        self.root.after(100, self.poll_library_scan, scan)
 
-                    # Mark missing entries for removal
-                    duplicates_to_remove.extend(missing_entries)
-                else:
-                    # Actual file already has metadata, just remove the duplicates
-                    duplicates_to_remove.extend(missing_entries)
-
-        # Remove duplicate entries
-        for duplicate in duplicates_to_remove:
-            if duplicate in self.metadata_manager.metadata:
-                del self.metadata_manager.metadata[duplicate]
-                duplicates_removed += 1
-                print(f"Removed duplicate metadata entry: {duplicate}")
-
-        # Update the missing_files set after removing duplicates
-        missing_files = missing_files - set(duplicates_to_remove)
-
-        # Remove remaining metadata entries for files that no longer exist
-        if missing_files:
-            print(f"Removing {len(missing_files)} missing files from metadata:")
-            for relative_path in missing_files:
-                print(f"  - Removing: {relative_path}")
-                del self.metadata_manager.metadata[relative_path]
-                changes_made += 1
-
-        # Add metadata entries for new files found
-        if missing_from_metadata:
-            print(f"Adding {len(missing_from_metadata)} new files to metadata:")
-            for relative_path in missing_from_metadata:
-                print(f"  - Adding: {relative_path}")
-                self.metadata_manager.metadata[relative_path] = {
-                    "keep": None,
-                    "rating": None,
-                    "tags": [],
-                    "last_compared": None,
-                    "created_date": datetime.now().isoformat(),
-                    "skill": 0,
-                    "comparisons": 0,
-                }
-                changes_made += 1
-
-        # Save changes if any were made
-        total_changes = changes_made + duplicates_removed
-        if total_changes > 0:
-            self.metadata_manager.save_metadata()
+    def library_scan_running(self):
+        """Tell the user to wait if a scan is running (renames would race it)"""
+        if self.library_scan is None:
+            return False
+        messagebox.showinfo(
+            "Scan In Progress",
+            "The folder is still being scanned. Please try again when it finishes.",
+        )
+        return True
+
+    def poll_library_scan(self, scan):
+        """Show scan progress and apply the finished scan (runs on the Tk thread)"""
+        if scan is not self.library_scan:
+            return  # Abandoned after a folder change
+
+        finished = scan.poll()
+        if self.scan_status_label and self.scan_status_label.winfo_exists():
+            self.scan_status_label.config(text="" if finished else scan.status)
+        if not finished:
+            self.root.after(100, self.poll_library_scan, scan)
+            return
 
+        self.library_scan = None
+        report, self.scan_report = self.scan_report, False
+        try:
+            result = scan.apply()
+        except Exception as e:
+            log.error("Library scan failed: %s", e)
+            if report:
+                messagebox.showerror("Scan Failed", f"Could not scan the folder:\n{e}")
+            return
+        if scan.initial:
+            # Usually after first paint: reported on a line of its own
+            startup_timing.mark("library scan ready")
+
+        # Seed a quality prior for newly added files
+        self.start_quality_analysis()
+        self.report_sync_result(result, silent=not report, refresh=scan.initial)
+
+    def report_sync_result(self, result, silent=True, refresh=False):
+        """Reload the image list after a sync and report what changed.
+        The summary page is redrawn if it is showing and anything changed."""
+        duplicates_removed = result["duplicates_removed"]
+        total_changes = sync_changes(result)
+        if total_changes > 0 or refresh:
             # Reload the image list to reflect changes
             self.load_images()
+            if self.summary_visible:
+                self.show_summary_page()
 
+        if total_changes > 0:
             # Show detailed results only if not silent
             if not silent:
                 result_msg = f"Synchronization complete!\n\n"
@@ -2150,23 +1702,22 @@ class PhotoManager:
                     result_msg += (
                         f"• Removed {duplicates_removed} duplicate metadata entries\n"
                     )
-                if missing_files:
+                if result["removed"]:
+                    result_msg += f"• Removed {len(result['removed'])} missing files from metadata\n"
+                if result["added"]:
                     result_msg += (
-                        f"• Removed {len(missing_files)} missing files from metadata\n"
-                    )
-                if missing_from_metadata:
-                    result_msg += (
-                        f"• Added {len(missing_from_metadata)} new files to metadata\n"
+                        f"• Added {len(result['added'])} new files to metadata\n"
                     )
 
                 result_msg += f"\nTotal changes: {total_changes}"
 
                 messagebox.showinfo("Files Synchronized", result_msg)
-                self.show_summary_page()  # Only refresh if not already in summary page
             else:
-                # Silent mode: just print to console for debugging
-                print(
-                    f"Silent sync: {total_changes} changes made ({duplicates_removed} duplicates removed)"
+                # Silent mode: just log it
+                log.info(
+                    "Silent sync: %d changes made (%d duplicates removed)",
+                    total_changes,
+                    duplicates_removed,
                 )
         else:
             if not silent:
@@ -2175,13 +1726,22 @@ class PhotoManager:
                     "Metadata is already synchronized with folder contents",
                 )
             else:
-                print("Silent sync: no changes needed")
+                log.debug("Silent sync: no changes needed")
+
+    def report_startup_timing(self):
+        """Print the startup phases once the first window has been drawn"""
+        self.root.update_idletasks()
+        startup_timing.mark("first paint")
+        if config.SHOW_STARTUP_TIMING:
+            startup_timing.report()
 
     def run(self):
+        self.root.after_idle(self.report_startup_timing)
         self.root.mainloop()
 
 
 if __name__ == "__main__":
+    setup_logging()
     # Set to True for testing, False for normal use
     app = PhotoManager(test_mode=True)
     app.run()
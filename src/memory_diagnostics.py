@@ -0,0 +1,157 @@
+"""
+Memory diagnostics for Photo Manager
+Accounts for where memory goes during a comparison session instead of guessing:
+live PIL Images and Tk PhotoImages (counted through weak references, so tracking
+never keeps an image alive), the sizes of registered in-memory caches, the
+process RSS at the end of each timed phase (see vote_timing) and, optionally,
+tracemalloc snapshot diffs every N votes that name the lines still allocating.
+Everything is off unless config.ENABLE_MEMORY_DIAGNOSTICS is set.
+"""
+
+import os
+import sys
+import weakref
+
+import config
+from app_logging import get_logger
+
+log = get_logger(__name__)
+
+enabled = config.ENABLE_MEMORY_DIAGNOSTICS
+_live = {}  # kind -> number of tracked objects not yet collected
+_caches = {}  # name -> callable returning the cache's current size
+_phase_rss = {}  # phase -> (RSS after the phase, total RSS growth during it)
+_last_rss = None
+_votes = 0
+_snapshot = None
+
+
+def track(obj, kind):
+    """Count obj as a live object of the given kind until it is collected.
+    Returns obj so it can wrap a constructor call."""
+    if enabled:
+        _live[kind] = _live.get(kind, 0) + 1
+        # A finalizer, not a WeakSet: PIL images define __eq__ and can't be hashed
+        weakref.finalize(obj, _collected, kind)
+    return obj
+
+
+def _collected(kind):
+    _live[kind] -= 1
+
+
+def live_counts():
+    """{kind: number of tracked objects still alive}"""
+    return dict(_live)
+
+
+def register_cache(name, size):
+    """Report a cache's size; size() returns its current number of entries"""
+    _caches[name] = size
+
+
+def cache_sizes():
+    """{cache name: entries}"""
+    sizes = {}
+    for name, size in _caches.items():
+        try:
+            sizes[name] = size()
+        except Exception:  # The owner was replaced (e.g. a new library)
+            sizes[name] = None
+    return sizes
+
+
+def rss_bytes():
+    """Current resident set size of this process (None if it can't be read)"""
+    if sys.platform.startswith("linux"):
+        try:
+            with open("/proc/self/statm", "r") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            return None
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(
+            process, ctypes.byref(counters), counters.cb
+        ):
+            return counters.WorkingSetSize
+        return None
+    import resource  # macOS: only the peak is available without psutil
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def phase_ended(name):
+    """Record the RSS after a timed phase and how much it grew since the last
+    sample (called by vote_timing when diagnostics are on)"""
+    global _last_rss
+    rss = rss_bytes()
+    if rss is None:
+        return
+    growth = rss - _last_rss if _last_rss is not None else 0
+    _, total_growth = _phase_rss.get(name, (0, 0))
+    _phase_rss[name] = (rss, total_growth + growth)
+    _last_rss = rss
+
+
+def vote_done():
+    """Count a vote; every MEMORY_SNAPSHOT_EVERY votes log the tracemalloc
+    allocations that grew since the previous snapshot"""
+    global _votes, _snapshot
+    _votes += 1
+    every = config.MEMORY_SNAPSHOT_EVERY
+    if not enabled or not every:
+        return
+
+    import tracemalloc
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(config.MEMORY_SNAPSHOT_FRAMES)
+        _snapshot = tracemalloc.take_snapshot()
+        return
+    if _votes % every:
+        return
+    snapshot = tracemalloc.take_snapshot()
+    log.info(
+        "Memory growth over the last %d votes (vote %d):\n%s",
+        every,
+        _votes,
+        "\n".join(
+            f"  {stat}" for stat in snapshot.compare_to(_snapshot, "lineno")[:10]
+        ),
+    )
+    _snapshot = snapshot
+
+
+def report_lines():
+    """Live objects, cache sizes and per-phase RSS as lines of text"""
+    lines = []
+    rss = rss_bytes()
+    if rss is not None:
+        lines.append(f"RSS {rss / 2**20:.1f} MB after {_votes} votes")
+    for kind, count in sorted(live_counts().items()):
+        lines.append(f"live {kind:<12}{count:>8}")
+    for name, size in sorted(cache_sizes().items()):
+        lines.append(f"cache {name:<11}{'-' if size is None else size:>8}")
+    for name, (_, growth) in sorted(_phase_rss.items()):
+        lines.append(f"grew {name:<12}{growth / 2**20:7.1f}M")
+    return lines
@@ -1,293 +1,497 @@
+import atexit
 import glob
 import json
 import math
 import os
 from datetime import datetime
 
+import numpy as np
+
 import config
+import vote_timing
+from app_logging import FileSummary, file_log, get_logger
+from burst_clusters import find_time_bursts, merge_clusters
+from columnar_metadata import ColumnarMetadata
+from comparison_log import ComparisonLog
+from comparison_merge import LogMerger, read_all_records, with_final_paths
+from content_fingerprint import FingerprintCache
+from image_hash import PerceptualHashCache, find_clusters
+from library_scan import scan_library
+from metadata_shards import ShardedStorage, shard_key
+from metadata_snapshot import read_snapshot, write_snapshot
+from path_table import PathTable
+from persistence import WriteBehind, atomic_write
+from quality_prior import features_to_prior
+from skill_model import implied_win_update, vote_update
+
+log = get_logger(__name__)
 
 
 class MetadataManager:
     def __init__(self, photo_folder):
         self.photo_folder = photo_folder
         self.metadata_file = os.path.join(photo_folder, ".photo_metadata.json")
-        self.metadata = {}
-
-    def _add_new_photos(self):
-        """Add metadata entries for new photos (now searches recursively with limits)"""
-        extensions = [
-            ".jpg",
-            ".jpeg",
-            ".png",
-            ".bmp",
-            ".gif",
-            ".tiff",
-            ".mp4",
-            ".mov",
-            ".mkv",
-            ".wmv",
-            ".flv",
+        self.snapshot_file = os.path.join(photo_folder, ".photo_metadata.bin")
+
+        # Optional per-folder shards; loaded_shards is None when all are loaded
+        self.shards = None
+        if config.METADATA_SHARD_DEPTH:
+            self.shards = ShardedStorage(
+                photo_folder, config.METADATA_SHARD_DEPTH, config.METADATA_FORMAT
+            )
+        self.loaded_shards = None
+        self.paths = PathTable(photo_folder)  # Compact integer IDs for relative paths
+        self.metadata = ColumnarMetadata(self.paths)  # Rows are indexed by photo ID
+        self.hash_cache = PerceptualHashCache(photo_folder)
+        self.fingerprints = FingerprintCache(photo_folder, config.FINGERPRINT_WORKERS)
+        self._exact_duplicates = None  # Cached groups of byte-identical files
+        self._clusters = None  # Cached near-duplicate clusters
+        self._cluster_index = None  # relative_path -> cluster number
+
+        # Rating epochs: entries rated in an older epoch read as unrated,
+        # so a reset is a single counter bump instead of a rewrite of every entry
+        self.rating_state_file = os.path.join(photo_folder, ".photo_rating_state.json")
+        self.rating_epoch = 0
+        self.comparison_log = ComparisonLog(photo_folder)
+
+        # save_metadata() only marks the metadata dirty; writes are coalesced
+        self.persistence = WriteBehind(
+            self._write_metadata,
+            delay_seconds=config.SAVE_DELAY_SECONDS,
+            max_pending=config.SAVE_EVERY_N_CHANGES,
+        )
+        atexit.register(self.flush)
+
+    def new_entry(self):
+        """Create the metadata entry for a newly found photo"""
+        return {
+            "keep": None,
+            "rating": None,
+            "tags": [],
+            "last_compared": None,
+            "created_date": datetime.now().isoformat(),
+            "skill": 0,  # Initial skill (s = 0, quantile = 50) until a quality prior
+            "comparisons": 0,  # Number of comparisons (c)
+            "epoch": self.rating_epoch,  # Rating epoch the skill belongs to
+        }
+
+    def _entry(self, filename):
+        """Get a photo's entry, lazily resetting it if it was rated in an older epoch"""
+        data = self.metadata[filename]
+        if data.get("epoch", 0) != self.rating_epoch:
+            # Back to the automatic quality prior (or the median if there is none)
+            data["skill"] = data.get("prior_skill", 0)
+            data["comparisons"] = 0
+            data["epoch"] = self.rating_epoch
+        return data
+
+    def scan_files(self, progress=None):
+        """Relative paths of all supported files in the loaded part of the library.
+        progress(files_found) is called as the walk goes."""
+        if self.loaded_shards is None:
+            return scan_library(self.photo_folder, progress=progress)
+
+        depth = self.shards.depth
+        return [
+            relative_path
+            for relative_path in scan_library(
+                self.photo_folder, self.loaded_shards, progress
+            )
+            if shard_key(relative_path, depth) in self.loaded_shards
         ]
 
-        # Folders to skip (decisions already made)
-        skip_folders = {"delete", "keep"}
-
-        # Walk through subfolders with depth limit
-        for root, dirs, files in os.walk(self.photo_folder):
-            # Calculate current depth
-            current_depth = root[len(self.photo_folder) :].count(os.sep)
+    def _add_new_photos(self, relative_paths=None):
+        """Add metadata entries for new photos (searches recursively with limits)"""
+        if relative_paths is None:
+            relative_paths = self.scan_files()
+
+        added = FileSummary(log, "Added", "new photos to metadata")
+        for relative_path in relative_paths:
+            # Add to metadata if not already present
+            if relative_path not in self.metadata:
+                self.metadata[relative_path] = self.new_entry()
+                added.add(relative_path)
+        added.done()
+
+    def _remove_missing_photos(self, relative_paths=None):
+        """Remove metadata entries for photos no longer in folder (searches recursively)"""
+        if relative_paths is None:
+            relative_paths = self.scan_files()
+        existing_relative_paths = set(relative_paths)
 
-            if current_depth >= config.MAX_FOLDER_DEPTH:
-                dirs[:] = []  # Don't descend further
-                continue
+        # Find files to remove (in metadata but not in folder)
+        files_to_remove = set(self.metadata.keys()) - existing_relative_paths
 
-            # Remove skip folders from dirs list to prevent os.walk from entering them
-            dirs[:] = [d for d in dirs if d.lower() not in skip_folders]
-
-            # Process files in current directory
-            for file in files:
-                # Check if file has supported extension
-                file_ext = os.path.splitext(file)[1].lower()
-                if file_ext in extensions:
-                    # Get full path
-                    full_path = os.path.join(root, file)
-
-                    # Convert to relative path for use as key
-                    relative_path = os.path.relpath(full_path, self.photo_folder)
-
-                    # Normalize path separators for consistency (Windows vs Unix)
-                    relative_path = relative_path.replace(os.sep, "/")
-
-                    # Add to metadata if not already present
-                    if relative_path not in self.metadata:
-                        self.metadata[relative_path] = {
-                            "keep": None,
-                            "rating": None,
-                            "tags": [],
-                            "last_compared": None,
-                            "created_date": datetime.now().isoformat(),
-                            "skill": 0,  # Initial skill (s = 0, quantile = 50)
-                            "comparisons": 0,  # Number of comparisons (c)
-                        }
-                        print(f"Added new photo: {relative_path}")  # Debug output
-
-            # Debug output for folder exploration
-            if current_depth == 0:
-                print(f"Exploring root folder, found {len(dirs)} subfolders: {dirs}")
-            elif current_depth == 1:
-                folder_name = os.path.basename(root)
-                print(
-                    f"Exploring subfolder '{folder_name}', found {len(dirs)} sub-subfolders: {dirs}"
-                )
-
-    def _remove_missing_photos(self):
-        """Remove metadata entries for photos no longer in folder (now searches recursively)"""
-        extensions = [
-            ".jpg",
-            ".jpeg",
-            ".png",
-            ".bmp",
-            ".gif",
-            ".tiff",
-            ".mp4",
-            ".mov",
-            ".mkv",
-            ".wmv",
-            ".flv",
-        ]
+        # Remove them
+        removed = FileSummary(log, "Removed", "missing photos from metadata")
+        for relative_path in files_to_remove:
+            removed.add(relative_path)
+            del self.metadata[relative_path]
+        removed.done()
 
-        # Folders to skip (decisions already made)
-        skip_folders = {"delete", "keep"}
+    def add_missing_files_to_metadata(self, relative_paths=None):
+        """Add any files that exist in folder but not in metadata (recursive)"""
+        if relative_paths is None:
+            relative_paths = self.scan_files()
 
-        existing_relative_paths = set()
+        added = FileSummary(log, "Added", "missing files to metadata")
+        for relative_path in relative_paths:
+            if relative_path not in self.metadata:
+                self.metadata[relative_path] = self.new_entry()
+                added.add(relative_path)
 
-        # Walk through subfolders with same logic as _add_new_photos
-        for root, dirs, files in os.walk(self.photo_folder):
-            # Calculate current depth
-            current_depth = root[len(self.photo_folder) :].count(os.sep)
+        if added.done():
+            self.save_metadata()
 
-            # Skip if we're too deep (allow 4 levels for year/month/type structure)
-            if current_depth >= config.MAX_FOLDER_DEPTH:
-                dirs[:] = []  # Don't descend further
+    def update_perceptual_hashes(self, compute=True):
+        """Hash new or changed files, forget files that are gone and invalidate
+        the near-duplicate clusters. compute=False skips the hashing (a background scan already did it).
+        """
+        if compute:
+            hashed_count = self.hash_cache.update(self.metadata.keys())
+            if hashed_count:
+                log.info("Computed perceptual hashes for %d files", hashed_count)
+        # Like the fingerprints: other shards' hashes must survive a partial load
+        if self.loaded_shards is None:
+            self.hash_cache.prune(self.metadata.keys())
+        self.hash_cache.save()
+        self._clusters = None
+        self._cluster_index = None
+
+    def update_fingerprints(self, compute=True):
+        """Fingerprint new or changed files and forget files that are gone.
+        compute=False skips the fingerprinting (a background scan already did it)."""
+        if compute:
+            computed = self.fingerprints.update(self.metadata.keys())
+            if computed:
+                log.info("Computed content fingerprints for %d files", computed)
+        # Entries of shards that are not loaded must survive a partial load
+        if self.loaded_shards is None:
+            self.fingerprints.prune(self.metadata.keys())
+        self.fingerprints.save()
+        self._exact_duplicates = None
+
+    def reattach_by_content(self, new_paths, missing_paths):
+        """Give new files the metadata of files with identical content: a missing
+        file's entry moves to its new path, and a copy of a file that still exists
+        inherits its rating. Returns (moved, copied)."""
+        if not new_paths:
+            return 0, 0
+
+        self.fingerprints.update(new_paths)
+        missing_by_fingerprint = self.fingerprints.index(sorted(missing_paths))
+        existing_by_fingerprint = None  # Built only if a copy needs it
+
+        moved = {}  # old path -> new path
+        copied = {}  # new path -> source path
+        reattached = FileSummary(log, "Re-attached", "moved files by content")
+        duplicated = FileSummary(log, "Copied ratings to", "duplicate files")
+        for new_path in sorted(new_paths):
+            fingerprint = self.fingerprints.get(new_path)
+            if fingerprint is None or new_path in self.metadata:
                 continue
 
-            # Remove skip folders from dirs list to prevent os.walk from entering them
-            dirs[:] = [d for d in dirs if d.lower() not in skip_folders]
-
-            # Process files in current directory
-            for file in files:
-                # Check if file has supported extension
-                file_ext = os.path.splitext(file)[1].lower()
-                if file_ext in extensions:
-                    # Get full path
-                    full_path = os.path.join(root, file)
-
-                    # Convert to relative path to match metadata keys
-                    relative_path = os.path.relpath(full_path, self.photo_folder)
-                    relative_path = relative_path.replace(os.sep, "/")
-
-                    existing_relative_paths.add(relative_path)
-
-        # Get list of relative paths in metadata
-        metadata_paths = set(self.metadata.keys())
-
-        # Find files to remove (in metadata but not in folder)
-        files_to_remove = metadata_paths - existing_relative_paths
-
-        # Remove them
-        for relative_path in files_to_remove:
-            print(f"Removing missing photo from metadata: {relative_path}")
-            del self.metadata[relative_path]
+            candidates = missing_by_fingerprint.get(fingerprint)
+            if candidates:
+                old_path = candidates.pop(0)
+                self.metadata[new_path] = self.metadata[old_path]
+                del self.metadata[old_path]
+                moved[old_path] = new_path
+                reattached.add(old_path, new_path)
+                continue
 
-        if files_to_remove:
-            print(f"Removed {len(files_to_remove)} missing photos from metadata")
-
-    def add_missing_files_to_metadata(self):
-        """Add any files that exist in folder but not in metadata (now recursive)"""
-        extensions = [
-            ".jpg",
-            ".jpeg",
-            ".png",
-            ".bmp",
-            ".gif",
-            ".tiff",
-            ".mp4",
-            ".mov",
-            ".mkv",
-            ".wmv",
-            ".flv",
+            if existing_by_fingerprint is None:
+                existing_by_fingerprint = self.fingerprints.index(self.metadata.keys())
+            sources = existing_by_fingerprint.get(fingerprint)
+            if sources:
+                self.metadata[new_path] = self.metadata[sources[0]]
+                copied[new_path] = sources[0]
+                duplicated.add(sources[0], new_path)
+
+        reattached.done()
+        duplicated.done()
+        if moved or copied:
+            self.log_path_changes(moved, copied)
+            self.save_metadata()
+        return len(moved), len(copied)
+
+    def log_path_changes(self, moved=None, copied=None):
+        """Record renamed/moved files (old -> new) and copies (new -> source) in the
+        comparison log, so merged ratings follow files to their new paths"""
+        self.comparison_log.append(
+            {
+                "kind": "paths",
+                "epoch": self.rating_epoch,
+                "time": datetime.now().isoformat(),
+                "moved": moved or {},
+                "copied": copied or {},
+            }
+        )
+
+    def get_exact_duplicates(self):
+        """Groups of byte-identical photos (lists of relative paths), largest first"""
+        if self._exact_duplicates is None:
+            self._exact_duplicates = self.fingerprints.find_exact_duplicates(
+                self.metadata.keys(), verify=config.VERIFY_EXACT_DUPLICATES
+            )
+            self.fingerprints.save()
+        return self._exact_duplicates
+
+    def get_duplicate_clusters(self):
+        """Get groups of near-duplicate photos (lists of relative paths), largest first"""
+        if self._clusters is None:
+            hashes = {
+                relative_path: value
+                for relative_path, value in self.hash_cache.get_hashes().items()
+                if relative_path in self.metadata
+            }
+            self._clusters = find_clusters(hashes, config.DUPLICATE_HASH_DISTANCE)
+            self._cluster_index = {
+                relative_path: i
+                for i, cluster in enumerate(self._clusters)
+                for relative_path in cluster
+            }
+
+        return self._clusters
+
+    def get_cluster_id(self, filename):
+        """Get the near-duplicate cluster number for a photo (None if it has no duplicates)"""
+        if self._cluster_index is None:
+            self.get_duplicate_clusters()
+        return self._cluster_index.get(filename)
+
+    def get_burst_clusters(self, relative_paths=None):
+        """Get clusters for burst-first sessions: photos taken close together in
+        the same folder, merged with near-duplicate clusters. Largest first."""
+        if relative_paths is None:
+            relative_paths = list(self.metadata.keys())
+        wanted = set(relative_paths)
+
+        bursts = find_time_bursts(
+            self.photo_folder, relative_paths, config.BURST_TIME_WINDOW_SECONDS
+        )
+
+        duplicates = []
+        if config.ENABLE_PERCEPTUAL_HASHING:
+            duplicates = [
+                [path for path in cluster if path in wanted]
+                for cluster in self.get_duplicate_clusters()
+            ]
+
+        return merge_clusters(bursts, duplicates)
+
+    def apply_cluster_ranking(self, winner, beaten, k_0=2):
+        """Propagate a burst result into skill priors: treat winner as having beaten
+        each photo in beaten, with updates damped by config.CLUSTER_PRIOR_WEIGHT.
+        Comparison counts are not changed since these votes are only implied."""
+        if winner not in self.metadata:
+            return
+
+        data_w = self._entry(winner)
+        beaten = [
+            loser for loser in beaten if loser in self.metadata and loser != winner
         ]
+        if not beaten:
+            return
+
+        # Log the values being replaced so undoing the last vote also undoes this
+        before = {
+            path: [self._entry(path)["skill"], self._entry(path)["comparisons"]]
+            for path in [winner] + beaten
+        }
+        self.comparison_log.append(
+            {
+                "kind": "implied",
+                "epoch": self.rating_epoch,
+                "time": datetime.now().isoformat(),
+                "winner": winner,
+                "beaten": beaten,
+                "before": before,
+                "k": k_0,  # A replay with another k must merge with the same k
+            }
+        )
+
+        for loser in beaten:
+            data_l = self._entry(loser)
+            data_w["skill"], data_l["skill"] = implied_win_update(
+                data_w["skill"],
+                data_w["comparisons"],
+                data_w.get("prior_weight", 0),
+                data_l["skill"],
+                data_l["comparisons"],
+                data_l.get("prior_weight", 0),
+                k_0,
+            )
 
-        # Folders to skip (decisions already made)
-        skip_folders = {"delete", "keep"}
-
-        added_count = 0
+        self.save_metadata()
 
-        # Walk through subfolders with same logic as _add_new_photos
-        for root, dirs, files in os.walk(self.photo_folder):
-            # Calculate current depth
-            current_depth = root[len(self.photo_folder) :].count(os.sep)
+    def get_unanalyzed_photos(self):
+        """Get photos that have never been compared and have no quality prior yet"""
+        return [
+            relative_path
+            for relative_path, data in self.metadata.items()
+            if "quality" not in data and self.get_comparisons(relative_path) == 0
+        ]
 
-            if current_depth >= config.MAX_FOLDER_DEPTH:
-                dirs[:] = []  # Don't descend further
+    def apply_quality_priors(self, features_by_path):
+        """Seed skill and prior weight from quality features for still-unrated photos.
+        Returns the number of photos updated."""
+        updated = 0
+        for relative_path, features in features_by_path.items():
+            if relative_path not in self.metadata:
+                continue
+            data = self._entry(relative_path)
+            # Human votes always win over the automatic prior
+            if data["comparisons"] > 0:
                 continue
 
-            # Remove skip folders from dirs list to prevent os.walk from entering them
-            dirs[:] = [d for d in dirs if d.lower() not in skip_folders]
-
-            # Process files in current directory
-            for file in files:
-                # Check if file has supported extension
-                file_ext = os.path.splitext(file)[1].lower()
-                if file_ext in extensions:
-                    # Get full path
-                    full_path = os.path.join(root, file)
-
-                    # Convert to relative path for use as key
-                    relative_path = os.path.relpath(full_path, self.photo_folder)
-                    relative_path = relative_path.replace(os.sep, "/")
-
-                    # Add to metadata if not already present
-                    if relative_path not in self.metadata:
-                        self.metadata[relative_path] = {
-                            "keep": None,
-                            "rating": None,
-                            "tags": [],
-                            "last_compared": None,
-                            "created_date": datetime.now().isoformat(),
-                            "skill": 0,
-                            "comparisons": 0,
-                        }
-                        added_count += 1
-                        print(f"Added missing file to metadata: {relative_path}")
-
-        if added_count > 0:
+            skill, weight = features_to_prior(features)
+            data["skill"] = skill
+            data["prior_skill"] = skill
+            data["prior_weight"] = weight
+            data["quality"] = features
+            updated += 1
+
+        if updated:
             self.save_metadata()
-            print(f"Added {added_count} missing files to metadata")
+        return updated
+
+    def iter_ranked_photos(self, worst_first=True):
+        """Yield every photo's relative path ordered by current skill.
+        Sorted as one array operation over the skill column instead of per entry."""
+        rows = self.metadata.live_rows()
+        skills = self.effective_skills(rows)
+        order = np.argsort(skills if worst_first else -skills, kind="stable")
+        for row in rows[order].tolist():
+            yield self.paths.path_of(row)
+
+    def effective_skills(self, rows):
+        """Current skills of the given rows (photo IDs) as an array, reading entries
+        from an older rating epoch as reset, without touching the entries"""
+        return np.where(
+            self.metadata.column("epoch")[rows] == self.rating_epoch,
+            self.metadata.column("skill")[rows],
+            self.metadata.column("prior_skill")[rows],  # Not yet rated this epoch
+        )
 
     def get_photo_data(self, filename):
         """Get metadata for a specific photo"""
         return self.metadata.get(filename, {})
 
+    def get_skill(self, filename):
+        """Get current skill for a photo"""
+        if filename not in self.metadata:
+            return 0
+        return self._entry(filename)["skill"]
+
     def get_quantile(self, filename):
         """Get current quantile rank for a photo"""
         if filename not in self.metadata:
             return 50
-        skill = self.metadata[filename]["skill"]
+        skill = self._entry(filename)["skill"]
         return 100 / (1 + math.exp(-skill))
 
     def get_comparisons(self, filename):
         """Get current comparisons for a photo"""
         if filename not in self.metadata:
             return 0
-        return self.metadata[filename]["comparisons"]
-
-    def load_metadata(self):
-        """Load existing metadata or create new file"""
-        if os.path.exists(self.metadata_file):
-            with open(self.metadata_file, "r") as f:
-                self.metadata = json.load(f)
+        return self._entry(filename)["comparisons"]
+
+    def load_metadata(self, shards=None, scan=True):
+        """Load existing metadata or create new file.
+        With sharding enabled, shards can name the folders to load (default: all).
+        scan=False only reads the stored metadata; call reconcile_files() with the
+        scanned paths later (main.py scans on a worker thread)."""
+        self._load_rating_state()
+
+        self.loaded_shards = None
+        if self.shards and self.shards.exists():
+            # Only the requested folders' shards are read (and later written)
+            self.metadata = ColumnarMetadata(self.paths)
+            self.shards.load(self.metadata, shards, prepare=self._prepare_raw_metadata)
+            self.metadata.take_dirty_rows()
+            if shards is not None:
+                self.loaded_shards = set(shards)
         else:
-            self.metadata = {}
-
+            self._load_single_file()
+            if self.shards:
+                # First sharded load: split the single metadata file into shards
+                self.metadata.mark_dirty()
+                self.save_metadata()
+
+        if scan:
+            # One scan of the (loaded part of the) library feeds every pass
+            self.reconcile_files(self.scan_files())
+
+    def reconcile_files(self, relative_paths, compute_caches=True, prepared_merge=None):
+        """Bring freshly loaded metadata in line with the scanned files: migrate old
+        keys, follow moved files, add new and drop missing ones, refresh the hash
+        and fingerprint caches and merge other devices' votes.
+        compute_caches=False when a background scan already refreshed the caches,
+        and prepared_merge is the log merge it prepared (see LogMerger.prepare)."""
         # MIGRATION: Convert old-format metadata keys to new format FIRST
-        migration_count = self.migrate_old_metadata()
+        migration_count = self.migrate_old_metadata(relative_paths)
+
+        # Moved, copied or re-imported files keep their ratings (matched by content)
+        if config.ENABLE_CONTENT_FINGERPRINTS:
+            metadata_paths = set(self.metadata.keys())
+            scanned_paths = set(relative_paths)
+            self.reattach_by_content(
+                scanned_paths - metadata_paths, metadata_paths - scanned_paths
+            )
 
         # Add any new photos found in folder (but don't overwrite migrated ones)
-        self._add_new_photos()
+        self._add_new_photos(relative_paths)
 
         # Add any missing files (including videos)
-        self.add_missing_files_to_metadata()
+        self.add_missing_files_to_metadata(relative_paths)
 
         # Remove any photos no longer in folder
-        self._remove_missing_photos()
+        self._remove_missing_photos(relative_paths)
+
+        # Hash new/changed files so near-duplicates can be grouped
+        if config.ENABLE_PERCEPTUAL_HASHING:
+            self.update_perceptual_hashes(compute_caches)
+
+        if config.ENABLE_CONTENT_FINGERPRINTS:
+            self.update_fingerprints(compute_caches)
 
         if migration_count > 0:
-            print(f"Metadata migration completed: {migration_count} entries updated")
+            log.info(
+                "Metadata migration completed: %d entries updated", migration_count
+            )
+
+        # Votes cast on other devices sharing this library
+        if config.MERGE_LOGS_ON_LOAD:
+            self.merge_comparison_logs(prepared_merge)
 
         self.save_metadata()
 
-    def migrate_old_metadata(self):
+    def adopt_scan_caches(self, hash_cache, fingerprints):
+        """Use the hash and fingerprint caches a background scan refreshed"""
+        self.hash_cache = hash_cache
+        self.fingerprints = fingerprints
+        self._exact_duplicates = None
+        self._clusters = None
+        self._cluster_index = None
+
+    def merge_comparison_logs(self, prepared=None):
+        """Merge every device's comparison log into the ratings (incremental).
+        prepared is LogMerger.prepare() run ahead of time, e.g. by a background
+        scan. Returns the number of new records applied."""
+        merger = LogMerger(self)
+        return merger.finish(merger.prepare() if prepared is None else prepared)
+
+    def migrate_old_metadata(self, relative_paths=None):
         """Migrate old metadata keys (filenames) to new relative path format"""
-        # Get all actual files with their relative paths
-        extensions = [
-            ".jpg",
-            ".jpeg",
-            ".png",
-            ".bmp",
-            ".gif",
-            ".tiff",
-            ".mp4",
-            ".mov",
-            ".mkv",
-            ".wmv",
-            ".flv",
-        ]
-
-        skip_folders = {"delete", "keep"}
-        actual_files_map = {}  # basename -> [relative_paths]
+        if relative_paths is None:
+            relative_paths = self.scan_files()
 
         # Build map of basename to relative paths for actual files
-        for root, dirs, files in os.walk(self.photo_folder):
-            current_depth = root[len(self.photo_folder) :].count(os.sep)
-
-            # Skip if we're too deep (allow 4 levels for year/month/type structure)
-            if current_depth >= config.MAX_FOLDER_DEPTH:
-                continue
-
-            dirs[:] = [d for d in dirs if d.lower() not in skip_folders]
-
-            for file in files:
-                file_ext = os.path.splitext(file)[1].lower()
-                if file_ext in extensions:
-                    full_path = os.path.join(root, file)
-                    relative_path = os.path.relpath(full_path, self.photo_folder)
-                    relative_path = relative_path.replace(os.sep, "/")
-
-                    basename = os.path.basename(file)
-                    if basename not in actual_files_map:
-                        actual_files_map[basename] = []
-                    actual_files_map[basename].append(relative_path)
+        actual_files_map = {}  # basename -> [relative_paths]
+        for relative_path in relative_paths:
+            basename = relative_path.rsplit("/", 1)[-1]
+            actual_files_map.setdefault(basename, []).append(relative_path)
 
         # Find metadata entries that need migration
         migrated_count = 0
@@ -309,8 +513,10 @@ class MetadataManager:
                         # Only migrate if the new path doesn't already exist in metadata
                         if new_relative_path not in self.metadata:
                             entries_to_migrate[metadata_key] = new_relative_path
-                            print(
-                                f"Will migrate: {metadata_key} -> {new_relative_path}"
+                            file_log.debug(
+                                "Will migrate: %s -> %s",
+                                metadata_key,
+                                new_relative_path,
                             )
                         else:
                             # If new path exists but has 0 comparisons, prefer the old data
@@ -320,41 +526,100 @@ class MetadataManager:
                             old_comparisons = metadata_value.get("comparisons", 0)
 
                             if old_comparisons > existing_comparisons:
-                                print(
-                                    f"Replacing new entry with old data: {metadata_key} -> {new_relative_path}"
+                                file_log.debug(
+                                    "Replacing new entry with old data: %s -> %s",
+                                    metadata_key,
+                                    new_relative_path,
                                 )
                                 entries_to_migrate[metadata_key] = new_relative_path
                             else:
-                                print(
-                                    f"Keeping existing entry, removing old: {metadata_key}"
+                                file_log.debug(
+                                    "Keeping existing entry, removing old: %s",
+                                    metadata_key,
                                 )
 
                     elif len(possible_paths) > 1:
-                        print(
-                            f"Multiple matches for {basename}: {possible_paths}, skipping migration"
+                        file_log.debug(
+                            "Multiple matches for %s: %s, skipping migration",
+                            basename,
+                            possible_paths,
                         )
                 else:
-                    print(f"No actual file found for metadata key: {metadata_key}")
+                    file_log.debug(
+                        "No actual file found for metadata key: %s", metadata_key
+                    )
 
         # Perform the migration
+        migrated = FileSummary(log, "Migrated", "metadata entries to the new format")
         for old_key, new_key in entries_to_migrate.items():
             # Copy metadata to new key (overwrite if necessary)
             self.metadata[new_key] = self.metadata[old_key]
             # Remove old key
             del self.metadata[old_key]
             migrated_count += 1
-            print(f"Migrated: {old_key} -> {new_key}")
+            migrated.add(old_key, new_key)
 
-        if migrated_count > 0:
-            print(f"Migrated {migrated_count} metadata entries to new format")
+        if migrated.done():
             self.save_metadata()
 
         return migrated_count
 
     def save_metadata(self):
-        """Save metadata to JSON file"""
-        with open(self.metadata_file, "w") as f:
-            json.dump(self.metadata, f, indent=2)
+        """Schedule a save (written within SAVE_DELAY_SECONDS or after N changes)"""
+        with vote_timing.phase("save_metadata"):
+            self.persistence.mark_dirty()
+
+    def flush(self):
+        """Write any unsaved metadata now"""
+        self.persistence.flush()
+
+    def flush_if_due(self):
+        """Write unsaved metadata if the save delay has passed"""
+        self.persistence.flush_if_due()
+
+    def _load_single_file(self):
+        """Load the unsharded metadata file in the configured format"""
+        if config.METADATA_FORMAT == "binary" and os.path.exists(self.snapshot_file):
+            # Memory-mapped: ratings are paged in lazily instead of parsed up front
+            self.metadata = read_snapshot(self.snapshot_file, self.photo_folder)
+            self.paths = self.metadata.paths
+        elif os.path.exists(self.metadata_file):
+            # JSON is also the import path when switching to the binary format
+            self.import_json(self.metadata_file)
+        else:
+            self.metadata = ColumnarMetadata(self.paths)
+
+    def _write_metadata(self):
+        """Write metadata in the configured format"""
+        with vote_timing.phase("metadata_write"):
+            if self.shards:
+                written = self.shards.write_dirty(self.metadata, self.rating_epoch)
+                if written:
+                    keys = ", ".join(k or "(root)" for k in written)
+                    log.info("Saved metadata shards: %s", keys)
+            elif config.METADATA_FORMAT == "binary":
+                write_snapshot(self.metadata, self.snapshot_file)
+            else:
+                self.export_json(self.metadata_file)
+
+    def import_json(self, json_file):
+        """Replace the in-memory metadata with the contents of a JSON file"""
+        with open(json_file, "r") as f:
+            raw_metadata = json.load(f)
+        self._prepare_raw_metadata(raw_metadata)
+        self.metadata = ColumnarMetadata.from_dict(self.paths, raw_metadata)
+
+    def _prepare_raw_metadata(self, raw_metadata):
+        """Upgrade JSON entries in place before they are loaded"""
+        # Entries analyzed before prior_skill was stored keep their prior on reset
+        for data in raw_metadata.values():
+            if "quality" in data and "prior_skill" not in data:
+                data["prior_skill"] = features_to_prior(data["quality"])[0]
+
+    def export_json(self, json_file):
+        """Write the metadata as JSON (the interchange format)"""
+        with atomic_write(json_file) as f:
+            json.dump(self.metadata.to_dict(), f, indent=2)
 
     def update_photo(self, filename, **kwargs):
         """Update metadata for a specific photo"""
@@ -366,37 +631,38 @@ class MetadataManager:
         """Update skills and comparison counts.
         Outcome: 1 (A wins), 0 (B wins), 0.5 (tie), 1.5 (both win), -0.5 (both lose)"""
 
-        # Get current data
-        data_a = self.metadata[filename_a]
-        data_b = self.metadata[filename_b]
+        # Get current data (entries from an older epoch start over)
+        data_a = self._entry(filename_a)
+        data_b = self._entry(filename_b)
 
         s_a, c_a = data_a["skill"], data_a["comparisons"]
         s_b, c_b = data_b["skill"], data_b["comparisons"]
 
-        # Calculate dynamic k values
-        k_a = k_0 / math.sqrt(c_a + 1)
-        k_b = k_0 / math.sqrt(c_b + 1)
-
-        # Calculate expected outcomes
-        e_a = 1 / (1 + math.exp(-(s_a - s_b)))
-        e_b = 1 - e_a
-
-        # Handle special cases
-        match outcome:
-            case "both":  # Both win
-                outcome_a, outcome_b = 1, 1
-            case "neither":  # Both lose
-                outcome_a, outcome_b = 0, 0
-            case "tie":  # Tie
-                outcome_a, outcome_b = 0.5, 0.5
-            case "left":  # left wins
-                outcome_a, outcome_b = 1, 0
-            case "right":  # right wins
-                outcome_a, outcome_b = 0, 1
-
-        # Update skills
-        s_a_new = s_a + k_a * (outcome_a - e_a)
-        s_b_new = s_b + k_b * (outcome_b - e_b)
+        # Elo update with dynamic k (a quality prior counts as extra comparisons)
+        s_a_new, s_b_new = vote_update(
+            s_a,
+            c_a,
+            data_a.get("prior_weight", 0),
+            s_b,
+            c_b,
+            data_b.get("prior_weight", 0),
+            outcome,
+            k_0,
+        )
+
+        # Log the vote with the values it replaces so it can be undone exactly
+        self.comparison_log.append(
+            {
+                "kind": "vote",
+                "epoch": self.rating_epoch,
+                "time": datetime.now().isoformat(),
+                "a": filename_a,
+                "b": filename_b,
+                "outcome": outcome,
+                "before": {filename_a: [s_a, c_a], filename_b: [s_b, c_b]},
+                "k": k_0,
+            }
+        )
 
         # Update metadata
         self.metadata[filename_a]["skill"] = s_a_new
@@ -405,3 +671,86 @@ class MetadataManager:
         self.metadata[filename_b]["comparisons"] = c_b + 1
 
         self.save_metadata()
+
+    def undo_last_comparisons(self, count=1):
+        """Undo the last `count` votes of the current epoch (plus any burst results
+        they triggered) by restoring the logged values of only the photos involved.
+        Returns the undone vote records, most recent first."""
+        undone = []
+        while len(undone) < count:
+            record = self.comparison_log.peek_last()
+            # Never undo across a reset or a file rename
+            if (
+                record is None
+                or record["epoch"] != self.rating_epoch
+                or record["kind"] == "paths"
+            ):
+                break
+            self.comparison_log.pop_last()
+
+            for path, (skill, comparisons) in record["before"].items():
+                if path in self.metadata:
+                    self.metadata[path]["skill"] = skill
+                    self.metadata[path]["comparisons"] = comparisons
+                    self.metadata[path]["epoch"] = record["epoch"]
+
+            if record["kind"] == "vote":
+                undone.append(record)
+
+        if undone:
+            self.save_metadata()
+            log.info("Undid %d comparison(s)", len(undone))
+        return undone
+
+    def reset_all_scores(self):
+        """Reset every photo's skill and comparisons by starting a new rating epoch.
+        O(1): entries are reset lazily the next time they are read."""
+        self.rating_epoch += 1
+        self._save_rating_state()
+        log.info("All scores reset (rating epoch %d)", self.rating_epoch)
+
+    def replay_comparisons(self, epoch=None, k_0=2):
+        """Recompute ratings by replaying an epoch's logged votes and burst results
+        (default: the current one) in a fresh epoch, e.g. after changing k_0.
+        Records naming photos that are no longer in the metadata are skipped.
+        Returns (replayed, skipped)."""
+        if epoch is None:
+            epoch = self.rating_epoch
+        records = with_final_paths(read_all_records(self.photo_folder, epoch))
+
+        self.reset_all_scores()
+        replayed = skipped = 0
+        with self.persistence.batch():
+            for record in records:
+                if record["kind"] == "vote":
+                    if record["a"] in self.metadata and record["b"] in self.metadata:
+                        self.update_skills(
+                            record["a"], record["b"], record["outcome"], k_0
+                        )
+                        replayed += 1
+                        continue
+                elif record["winner"] in self.metadata:
+                    self.apply_cluster_ranking(record["winner"], record["beaten"], k_0)
+                    replayed += 1
+                    continue
+                skipped += 1
+
+        log.info(
+            "Replayed %d comparison(s) into rating epoch %d",
+            replayed,
+            self.rating_epoch,
+        )
+        return replayed, skipped
+
+    def _load_rating_state(self):
+        """Load the current rating epoch"""
+        if os.path.exists(self.rating_state_file):
+            with open(self.rating_state_file, "r") as f:
+                self.rating_epoch = json.load(f).get("epoch", 0)
+        else:
+            self.rating_epoch = 0
+
+    def _save_rating_state(self):
+        """Save the current rating epoch"""
+        with atomic_write(self.rating_state_file) as f:
+            json.dump({"epoch": self.rating_epoch}, f)
@@ -0,0 +1,157 @@
+"""
+Sharded metadata storage for Photo Manager
+Splits the metadata into one file per top-level (or second-level) folder plus a
+small root index of per-shard aggregates, so opening, rating or syncing one year
+only reads and writes that year's shard
+"""
+
+import json
+import os
+from urllib.parse import quote
+
+import numpy as np
+
+from app_logging import get_logger
+from metadata_snapshot import read_snapshot, write_snapshot
+from persistence import atomic_write
+
+log = get_logger(__name__)
+
+ROOT_SHARD = ""  # Shard for files shallower than the shard depth
+
+
+def shard_key(relative_path, depth):
+    """Shard a relative path belongs to: its first `depth` folder names"""
+    return "/".join(relative_path.split("/")[:-1][:depth])
+
+
+class ShardedStorage:
+    def __init__(self, photo_folder, depth, file_format="json"):
+        self.photo_folder = photo_folder
+        self.depth = depth
+        self.file_format = file_format
+        self.shard_folder = os.path.join(photo_folder, ".photo_metadata")
+        self.index_file = os.path.join(self.shard_folder, "index.json")
+        self.index = {}  # shard key -> {"file", "count", "rated", "mean_skill"}
+
+        self._keys = []  # shard number -> shard key
+        self._numbers = {}  # shard key -> shard number
+        self._row_shards = np.full(0, -1, dtype=np.int32)  # row -> shard number
+
+    def exists(self):
+        """Whether this library already has a sharded layout"""
+        return os.path.exists(self.index_file)
+
+    def read_index(self):
+        """Load the root index of shards and their aggregates"""
+        if self.exists():
+            with open(self.index_file, "r") as f:
+                self.index = json.load(f)
+        return self.index
+
+    def _shard_file(self, key):
+        """Path of the shard file for key in the configured format"""
+        name = quote(key, safe="") if key else "_root"
+        extension = ".bin" if self.file_format == "binary" else ".json"
+        return os.path.join(self.shard_folder, name + extension)
+
+    def load(self, store, keys=None, prepare=None):
+        """Load the given shards (every indexed shard if None) into store.
+        prepare(raw_dict) is applied to JSON shards before they are added."""
+        self.read_index()
+        if keys is None:
+            keys = list(self.index)
+
+        for key in keys:
+            info = self.index.get(key)
+            if info is None:
+                log.warning("No metadata shard for folder '%s'", key)
+                continue
+
+            shard_file = os.path.join(self.shard_folder, info["file"])
+            if not os.path.exists(shard_file):
+                log.warning("Metadata shard missing: %s", shard_file)
+                continue
+
+            if shard_file.endswith(".bin"):
+                store.update_from(read_snapshot(shard_file, self.photo_folder))
+            else:
+                with open(shard_file, "r") as f:
+                    raw_metadata = json.load(f)
+                if prepare:
+                    prepare(raw_metadata)
+                for relative_path, entry in raw_metadata.items():
+                    store[relative_path] = entry
+
+        return keys
+
+    def _shard_numbers(self, store, rows):
+        """Shard number of each row (computed once per row, then cached)"""
+        if len(self._row_shards) < len(store.paths):
+            grown = np.full(len(store.paths), -1, dtype=np.int32)
+            grown[: len(self._row_shards)] = self._row_shards
+            self._row_shards = grown
+
+        for row in rows[self._row_shards[rows] < 0].tolist():
+            key = shard_key(store.paths.path_of(row), self.depth)
+            number = self._numbers.get(key)
+            if number is None:
+                number = len(self._keys)
+                self._keys.append(key)
+                self._numbers[key] = number
+            self._row_shards[row] = number
+
+        return self._row_shards[rows]
+
+    def write_dirty(self, store, epoch):
+        """Write every shard containing changed rows and refresh the index.
+        Returns the keys of the shards written."""
+        dirty_rows = store.take_dirty_rows()
+        if not len(dirty_rows):
+            return []
+
+        try:
+            live_rows = store.live_rows()
+            live_numbers = self._shard_numbers(store, live_rows)
+            dirty_numbers = np.unique(self._shard_numbers(store, dirty_rows))
+
+            skills = store.column("skill")
+            comparisons = store.column("comparisons")
+            epochs = store.column("epoch")
+
+            os.makedirs(self.shard_folder, exist_ok=True)
+            written = []
+            for number in dirty_numbers.tolist():
+                key = self._keys[number]
+                rows = live_rows[live_numbers == number]
+
+                shard_file = self._shard_file(key)
+                if self.file_format == "binary":
+                    write_snapshot(store, shard_file, rows)
+                else:
+                    with atomic_write(shard_file) as f:
+                        json.dump(store.to_dict(rows), f, indent=2)
+
+                # Drop the old file if the shard was stored in the other format
+                old_file = self.index.get(key, {}).get("file")
+                if old_file and old_file != os.path.basename(shard_file):
+                    old_path = os.path.join(self.shard_folder, old_file)
+                    if os.path.exists(old_path):
+                        os.remove(old_path)
+
+                rated = rows[(comparisons[rows] > 0) & (epochs[rows] == epoch)]
+                self.index[key] = {
+                    "file": os.path.basename(shard_file),
+                    "count": int(len(rows)),
+                    "rated": int(len(rated)),
+                    "mean_skill": float(skills[rated].mean()) if len(rated) else 0.0,
+                }
+                written.append(key)
+
+            with atomic_write(self.index_file) as f:
+                json.dump(self.index, f, indent=2)
+        except BaseException:
+            store.mark_dirty(dirty_rows)  # Retry these rows on the next flush
+            raise
+
+        return written
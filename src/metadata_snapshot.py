@@ -0,0 +1,115 @@
+"""
+Binary metadata snapshot for Photo Manager
+Layout: a fixed header, a NUL-separated UTF-8 path table, fixed-width rating
+records (see columnar_metadata.RECORD_DTYPE) and a small JSON section for the
+sparse fields. Records are opened with a copy-on-write memmap, so loading does
+not parse or copy the ratings; pages are read from disk as rows are touched.
+"""
+
+import json
+import struct
+
+import numpy as np
+
+from columnar_metadata import RECORD_DTYPE, ColumnarMetadata
+from path_table import PathTable
+from persistence import atomic_write
+
+MAGIC = b"PHOTOSNP"
+VERSION = 1
+
+# magic, version, record size, count, then (offset, length) of each section
+HEADER = struct.Struct("<8sIIQQQQQQQ")
+RECORD_ALIGNMENT = 16
+
+
+def write_snapshot(store, snapshot_file, rows=None):
+    """Write a ColumnarMetadata store (or only the given rows) atomically"""
+    paths, records, sparse = store.to_records(rows)
+
+    path_blob = "\0".join(paths).encode("utf-8")
+    sparse_blob = json.dumps(
+        {
+            key: {str(row): value for row, value in table.items()}
+            for key, table in sparse.items()
+        }
+    ).encode("utf-8")
+
+    paths_offset = HEADER.size
+    records_offset = -(-(paths_offset + len(path_blob)) // RECORD_ALIGNMENT)
+    records_offset *= RECORD_ALIGNMENT
+    records_bytes = records.tobytes()
+    sparse_offset = records_offset + len(records_bytes)
+
+    header = HEADER.pack(
+        MAGIC,
+        VERSION,
+        RECORD_DTYPE.itemsize,
+        len(paths),
+        paths_offset,
+        len(path_blob),
+        records_offset,
+        len(records_bytes),
+        sparse_offset,
+        len(sparse_blob),
+    )
+
+    with atomic_write(snapshot_file, "wb") as f:
+        f.write(header)
+        f.write(path_blob)
+        f.write(b"\0" * (records_offset - paths_offset - len(path_blob)))
+        f.write(records_bytes)
+        f.write(sparse_blob)
+
+        # The live snapshot may be mapped by this store; release it before replacing
+        store.materialize()
+
+
+def read_snapshot(snapshot_file, photo_folder):
+    """Open a snapshot as a ColumnarMetadata store (with its own PathTable)"""
+    with open(snapshot_file, "rb") as f:
+        (
+            magic,
+            version,
+            record_size,
+            count,
+            paths_offset,
+            paths_length,
+            records_offset,
+            records_length,
+            sparse_offset,
+            sparse_length,
+        ) = HEADER.unpack(f.read(HEADER.size))
+
+        if magic != MAGIC:
+            raise ValueError(f"{snapshot_file} is not a metadata snapshot")
+        if version != VERSION or record_size != RECORD_DTYPE.itemsize:
+            raise ValueError(
+                f"Unsupported snapshot version {version} (record size {record_size})"
+            )
+
+        f.seek(paths_offset)
+        path_blob = f.read(paths_length)
+        f.seek(sparse_offset)
+        sparse_blob = f.read(sparse_length)
+
+    # One decode and split for the whole path table instead of a parse per entry
+    relative_paths = path_blob.decode("utf-8").split("\0") if count else []
+    paths = PathTable.from_paths(photo_folder, relative_paths)
+
+    if count:
+        records = np.memmap(
+            snapshot_file,
+            dtype=RECORD_DTYPE,
+            mode="c",  # Copy-on-write: edits stay in memory until the next save
+            offset=records_offset,
+            shape=(count,),
+        )
+    else:
+        records = np.empty(0, dtype=RECORD_DTYPE)
+
+    sparse = {
+        key: {int(row): value for row, value in table.items()}
+        for key, table in json.loads(sparse_blob or b"{}").items()
+    }
+    return ColumnarMetadata.from_records(paths, records, sparse)
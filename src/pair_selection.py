@@ -0,0 +1,317 @@
+"""
+Comparison pair selection for Photo Manager
+Chooses which photos are compared next: the comparison pool, weighted random
+pairs, and winner-stays burst sessions. Photos are passed around as PathTable IDs.
+"""
+
+import logging
+import random
+
+import numpy as np
+
+import config
+from app_logging import get_logger
+
+log = get_logger(__name__)
+
+REJECTION_BATCH = 64  # Candidates drawn per round of rejection sampling
+REJECTION_ROUNDS = 8  # Rounds before sample_pair falls back to the full pool
+
+
+def comparison_pool(manager, relative_paths):
+    """Intern the photos eligible for comparison.
+    Returns (photo_ids, masked_count); photos below the masking quantile are left out.
+    """
+    paths = manager.paths
+    photo_ids = []
+    masked_count = 0
+
+    for relative_path in relative_paths:
+        if relative_path in manager.metadata:
+            quantile = manager.get_quantile(relative_path)
+            if quantile < config.QUANTILE_THRESHOLD_FOR_MASKING:
+                masked_count += 1
+                continue  # Skip this image for comparisons
+        else:
+            log.warning("%s not found in metadata", relative_path)
+
+        photo_ids.append(paths.intern(relative_path))
+
+    return photo_ids, masked_count
+
+
+def available_for_comparison(manager, photo_ids):
+    """Photo IDs still above the comparison quantile threshold"""
+    paths = manager.paths
+    return [
+        photo_id
+        for photo_id in photo_ids
+        if manager.get_quantile(paths.path_of(photo_id))
+        >= config.QUANTILE_THRESHOLD_FOR_COMPARISON
+    ]
+
+
+def weighted_selection(manager, photo_ids, k=2):
+    """Select photo IDs with weighting based on distance from quantile 30,
+    never pairing a photo with its own near-duplicates when avoidable"""
+    paths = manager.paths
+
+    # Remove any duplicate IDs first
+    unique_images = list(set(photo_ids))
+
+    if len(unique_images) < k:
+        log.warning("Only %d unique images available", len(unique_images))
+        return unique_images
+
+    # Calculate weights based on distance from quantile 30
+    weights = []
+    valid_images = []  # Only images that are in metadata
+
+    for photo_id in unique_images:
+        relative_path = paths.path_of(photo_id)
+
+        # Check if this image is in metadata
+        if relative_path not in manager.metadata:
+            log.warning("%s not found in metadata, skipping", relative_path)
+            continue
+
+        quantile = manager.get_quantile(relative_path)
+        # Invert the distance from the 30th quantile so closer images get higher
+        # weight (add 1 to avoid division by zero when quantile is exactly 30)
+        weights.append(1 / (abs(quantile - 30) + 1))
+        valid_images.append(photo_id)
+
+    if len(valid_images) < k:
+        log.warning("Only %d valid images in metadata", len(valid_images))
+        return valid_images
+
+    # Use weighted selection without replacement
+    selected = []
+    available_images = valid_images.copy()
+    available_weights = weights.copy()
+
+    for _ in range(k):
+        if not available_images:
+            break
+
+        # Select one image based on weights
+        chosen = random.choices(available_images, weights=available_weights, k=1)[0]
+        selected.append(chosen)
+
+        # Remove the selected image and its weight from available options
+        chosen_index = available_images.index(chosen)
+        available_images.pop(chosen_index)
+        available_weights.pop(chosen_index)
+
+        # Don't pair a photo with its own near-duplicates (burst frames, re-exports)
+        cluster_id = manager.get_cluster_id(paths.path_of(chosen))
+        if cluster_id is not None:
+            remaining = [
+                (photo_id, weight)
+                for photo_id, weight in zip(available_images, available_weights)
+                if manager.get_cluster_id(paths.path_of(photo_id)) != cluster_id
+            ]
+            # Fall back to the full pool if only duplicates are left
+            if remaining:
+                available_images = [photo_id for photo_id, _ in remaining]
+                available_weights = [weight for _, weight in remaining]
+
+    if log.isEnabledFor(logging.DEBUG):  # The quantile lookups aren't free
+        selected_relative = [paths.path_of(photo_id) for photo_id in selected]
+        log.debug(
+            "Selected: %s (quantiles %s)",
+            selected_relative,
+            [round(manager.get_quantile(p), 1) for p in selected_relative],
+        )
+
+    return selected
+
+
+def sample_pair(manager, photo_ids, exclude=(), rng=None, attempts=20):
+    """Vectorized weighted_selection for large pools and many requests: the same
+    quantile-30 weighting and thresholds, computed over the skill column. Photo
+    IDs in exclude are never chosen. Returns [left, right] or [] if no pair.
+    Pairs are drawn by rejection sampling first, so a vote costs the same with
+    a thousand photos as with a million."""
+    rng = rng or np.random.default_rng()
+    pair = _rejection_pair(manager, photo_ids, exclude, rng, attempts)
+    if pair is not None:
+        return pair
+
+    # Full pass over the pool: a mostly ineligible pool, or too few photos
+    ids = np.asarray(photo_ids, dtype=np.int64)
+    ids = ids[ids < len(manager.metadata.column("skill"))]
+    if len(exclude):
+        ids = ids[~np.isin(ids, np.fromiter(exclude, dtype=np.int64))]
+
+    quantiles = 100 / (1 + np.exp(-manager.effective_skills(ids)))
+    eligible = quantiles >= config.QUANTILE_THRESHOLD_FOR_COMPARISON
+    ids, quantiles = ids[eligible], quantiles[eligible]
+    if len(ids) < 2:
+        return []
+
+    weights = 1 / (np.abs(quantiles - 30) + 1)
+    weights /= weights.sum()
+
+    paths = manager.paths
+    first_index = rng.choice(len(ids), p=weights)
+    first = int(ids[first_index])
+    cluster_id = manager.get_cluster_id(paths.path_of(first))
+
+    weights[first_index] = 0
+    weights /= weights.sum()
+    second = None
+    for _ in range(attempts):
+        candidate = int(ids[rng.choice(len(ids), p=weights)])
+        second = candidate
+        # Rejection-sample away from the first photo's near-duplicates
+        if (
+            cluster_id is None
+            or manager.get_cluster_id(paths.path_of(candidate)) != cluster_id
+        ):
+            break
+    return [first, second]
+
+
+def _draw(manager, photo_ids, excluded, rng):
+    """One photo ID with the quantile-30 weighting, in time independent of the
+    pool size: candidates are drawn uniformly and each is kept with probability
+    equal to its weight (at most 1). None if no candidate was kept."""
+    rows = len(manager.metadata.column("skill"))
+    for _ in range(REJECTION_ROUNDS):
+        indices = rng.integers(0, len(photo_ids), REJECTION_BATCH)
+        candidates = np.fromiter(
+            (photo_ids[i] for i in indices), dtype=np.int64, count=REJECTION_BATCH
+        )
+        candidates = candidates[candidates < rows]
+        quantiles = 100 / (1 + np.exp(-manager.effective_skills(candidates)))
+        kept = (quantiles >= config.QUANTILE_THRESHOLD_FOR_COMPARISON) & (
+            rng.random(len(candidates)) < 1 / (np.abs(quantiles - 30) + 1)
+        )
+        for photo_id in candidates[kept].tolist():
+            if photo_id not in excluded:
+                return photo_id
+    return None
+
+
+def _rejection_pair(manager, photo_ids, exclude, rng, attempts):
+    """sample_pair by rejection sampling (None to fall back to the full pool)"""
+    if len(photo_ids) < 2:
+        return None
+    excluded = set(exclude)
+    first = _draw(manager, photo_ids, excluded, rng)
+    if first is None:
+        return None
+    excluded.add(first)
+
+    paths = manager.paths
+    cluster_id = manager.get_cluster_id(paths.path_of(first))
+    second = None
+    for _ in range(attempts):
+        second = _draw(manager, photo_ids, excluded, rng)
+        if second is None:
+            return None
+        if (
+            cluster_id is None
+            or manager.get_cluster_id(paths.path_of(second)) != cluster_id
+        ):
+            break
+    return [first, second]
+
+
+def outcome_from_scores(left_score, right_score):
+    """Convert a (left, right) score pair into an update_skills outcome"""
+    if left_score == 1 and right_score == 0:  # Left wins
+        return "left"
+    if left_score == 0 and right_score == 1:  # Right wins
+        return "right"
+    if left_score == 1 and right_score == 1:  # Both win
+        return "both"
+    if left_score == 0 and right_score == 0:  # Both lose
+        return "neither"
+    return "tie"
+
+
+class ClusterSession:
+    """Winner-stays comparisons within bursts: each cluster's champion faces the
+    next frame until every frame has been seen, then the champion is credited
+    with implied wins over the frames it never faced"""
+
+    def __init__(self, manager, clusters):
+        self.manager = manager
+        self.queue = [list(cluster) for cluster in clusters]  # Lists of photo IDs
+        self.total = len(self.queue)
+        self.current = None
+
+    def active(self):
+        """Whether there are clusters left to compare"""
+        return self.current is not None or bool(self.queue)
+
+    def next_pair(self):
+        """The current champion (left) and next challenger (right)"""
+        if self.current is None:
+            members = self.queue.pop(0)
+            self.current = {
+                "members": members,
+                "champion": members[0],
+                "challengers": members[1:],
+                "faced": {photo_id: set() for photo_id in members},
+            }
+        return [self.current["champion"], self.current["challengers"][0]]
+
+    def progress(self):
+        """(cluster number, frame number, frames in cluster) for the current pair"""
+        cluster = self.current
+        frames = len(cluster["members"])
+        return (
+            self.total - len(self.queue),
+            frames - len(cluster["challengers"]) + 1,
+            frames,
+        )
+
+    def record(self, outcome):
+        """Record a vote on the current pair: the winner stays on as champion.
+        Returns True when this vote resolved the cluster."""
+        cluster = self.current
+        champion = cluster["champion"]
+        challenger = cluster["challengers"].pop(0)
+        cluster["faced"][champion].add(challenger)
+        cluster["faced"][challenger].add(champion)
+
+        if outcome == "right":
+            cluster["champion"] = challenger
+
+        if cluster["challengers"]:
+            return False
+
+        # Burst resolved: the champion transitively beat everyone it never faced
+        paths = self.manager.paths
+        winner = paths.path_of(cluster["champion"])
+        beaten = [
+            paths.path_of(photo_id)
+            for photo_id in cluster["members"]
+            if photo_id != cluster["champion"]
+            and photo_id not in cluster["faced"][cluster["champion"]]
+        ]
+        self.manager.apply_cluster_ranking(winner, beaten)
+        log.info("Burst resolved: %s (+%d implied wins)", winner, len(beaten))
+        self.current = None
+        return True
+
+    def restart_current(self):
+        """Put the cluster in progress back at the front of the queue"""
+        if self.current is not None:
+            self.queue.insert(0, self.current["members"])
+            self.current = None
+
+    @classmethod
+    def from_photo_ids(cls, manager, photo_ids):
+        """Build a session over the bursts / near-duplicate groups among photo_ids"""
+        paths = manager.paths
+        clusters = manager.get_burst_clusters(
+            [paths.path_of(photo_id) for photo_id in photo_ids]
+        )
+        return cls(
+            manager,
+            [[paths.intern(path) for path in cluster] for cluster in clusters],
+        )
@@ -0,0 +1,58 @@
+"""
+Interned path table for Photo Manager
+Assigns each relative path a compact integer ID at scan time so selection,
+caches and the UI can pass small ints around instead of rebuilding strings
+"""
+
+import os
+
+
+class PathTable:
+    def __init__(self, photo_folder):
+        self.photo_folder = photo_folder
+        self._paths = []  # photo_id -> relative path
+        self._ids = {}  # relative path -> photo_id
+
+    @classmethod
+    def from_paths(cls, photo_folder, relative_paths):
+        """Build a table from unique paths in ID order (IDs are 0..n-1)"""
+        table = cls(photo_folder)
+        table._paths = list(relative_paths)
+        table._ids = None  # Reverse index is built on first lookup
+        return table
+
+    def _index(self):
+        """Get the path -> ID index, building it if the table was loaded in bulk"""
+        if self._ids is None:
+            self._ids = dict(zip(self._paths, range(len(self._paths))))
+        return self._ids
+
+    def __len__(self):
+        return len(self._paths)
+
+    def intern(self, relative_path):
+        """Get the ID for a relative path, assigning a new one if needed"""
+        ids = self._index()
+        photo_id = ids.get(relative_path)
+        if photo_id is None:
+            photo_id = len(self._paths)
+            self._paths.append(relative_path)
+            ids[relative_path] = photo_id
+        return photo_id
+
+    def id_of(self, relative_path):
+        """Get the ID for a relative path (None if it was never interned)"""
+        return self._index().get(relative_path)
+
+    def path_of(self, photo_id):
+        """Get the relative path for an ID"""
+        return self._paths[photo_id]
+
+    def paths_of(self, photo_ids):
+        """Get the relative paths for a sequence of IDs"""
+        paths = self._paths
+        return [paths[photo_id] for photo_id in photo_ids]
+
+    def full_path(self, photo_id):
+        """Build the absolute path for an ID (only needed for file I/O)"""
+        return os.path.join(self.photo_folder, self._paths[photo_id])
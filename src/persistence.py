@@ -0,0 +1,76 @@
+"""
+Crash-safe, debounced persistence for Photo Manager
+Files are replaced atomically (temp file + fsync + os.replace), so a crash or
+power loss leaves either the old or the new version, never a truncated one.
+Save requests are coalesced and written on a deadline or after N changes.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_write(path, mode="w"):
+    """Open a temp file next to path for writing; it replaces path on success"""
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, mode) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class WriteBehind:
+    """Coalesces save requests into one write per delay window or per N changes.
+    Not threaded: the owner calls flush_if_due() periodically (e.g. from the
+    Tk event loop) and flush() on exit, so writes never race with edits."""
+
+    def __init__(self, write, delay_seconds=5, max_pending=50):
+        self.write = write
+        self.delay_seconds = delay_seconds
+        self.max_pending = max_pending
+        self.pending = 0  # Changes since the last write
+        self.dirty_since = None  # monotonic time of the first unsaved change
+        self.write_count = 0
+
+    def mark_dirty(self):
+        """Record a change, writing immediately once enough have piled up"""
+        self.pending += 1
+        if self.dirty_since is None:
+            self.dirty_since = time.monotonic()
+        if self.pending >= self.max_pending:
+            self.flush()
+
+    @contextmanager
+    def batch(self):
+        """Suspend the N-changes trigger for a bulk edit, then write once"""
+        max_pending = self.max_pending
+        self.max_pending = float("inf")
+        try:
+            yield
+        finally:
+            self.max_pending = max_pending
+            self.flush()
+
+    def flush_if_due(self):
+        """Write if the oldest unsaved change is older than the delay"""
+        if (
+            self.dirty_since is not None
+            and time.monotonic() - self.dirty_since >= self.delay_seconds
+        ):
+            self.flush()
+
+    def flush(self):
+        """Write now if anything is unsaved"""
+        if self.dirty_since is None:
+            return
+        self.write()
+        self.pending = 0
+        self.dirty_since = None
+        self.write_count += 1
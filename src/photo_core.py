@@ -0,0 +1,65 @@
+"""
+Headless core of Photo Manager
+Everything needed to scan, rate, sync and rename a photo library without tkinter
+or win32, for scripts and alternative front ends. main.py is a client of these
+modules.
+"""
+
+from background_scan import LibraryScan
+from library_scan import scan_library
+from link_export import export_links
+from library_sync import remove_duplicate_entries, sync_changes, sync_library
+from metadata_manager import MetadataManager
+from pair_selection import (
+    ClusterSession,
+    available_for_comparison,
+    comparison_pool,
+    outcome_from_scores,
+    weighted_selection,
+)
+from rename_planner import (
+    apply_renames,
+    get_base_filename,
+    get_quantile_from_filename,
+    plan_prefix_renames,
+)
+from thumbnails import (
+    cached_thumbnail,
+    error_thumbnail,
+    extract_video_frame,
+    is_video,
+    load_thumbnail,
+)
+
+__all__ = [
+    "ClusterSession",
+    "LibraryScan",
+    "MetadataManager",
+    "apply_renames",
+    "available_for_comparison",
+    "cached_thumbnail",
+    "comparison_pool",
+    "error_thumbnail",
+    "export_links",
+    "extract_video_frame",
+    "get_base_filename",
+    "get_quantile_from_filename",
+    "is_video",
+    "load_thumbnail",
+    "open_library",
+    "outcome_from_scores",
+    "plan_prefix_renames",
+    "remove_duplicate_entries",
+    "scan_library",
+    "sync_changes",
+    "sync_library",
+    "weighted_selection",
+]
+
+
+def open_library(photo_folder, shards=None, scan=True):
+    """Create a MetadataManager for photo_folder and load its metadata
+    (scan=False skips matching it against the files, see load_metadata())"""
+    manager = MetadataManager(photo_folder)
+    manager.load_metadata(shards=shards, scan=scan)
+    return manager
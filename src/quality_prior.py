@@ -0,0 +1,127 @@
+"""
+Automatic quality prior for new photos
+Computes cheap image features (sharpness, exposure clipping, resolution) in a
+process pool and turns them into an initial skill and confidence, so obviously
+blurry or black frames start low instead of at the median
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import config
+import lazy_modules
+from app_logging import RateLimited, get_logger
+
+log = get_logger(__name__)
+_analysis_errors = RateLimited(log)
+
+VIDEO_EXTENSIONS = set(config.VIDEO_EXTENSIONS)
+
+ANALYSIS_MAX_SIDE = 512  # Downscale before measuring so cost is resolution-independent
+BLURRY_SHARPNESS = 30.0  # Laplacian variance below this is visibly blurry
+SHARP_SHARPNESS = 300.0  # Laplacian variance above this is crisp
+CLIPPING_LIMIT = 0.5  # Fraction of pure black/white pixels that makes a frame unusable
+LOW_RESOLUTION_PIXELS = 300_000  # Below ~0.3 MP (thumbnails, messenger copies)
+
+
+def compute_quality_features(full_path):
+    """Compute sharpness, clipping and pixel count for one image or video"""
+    cv2 = lazy_modules.cv2()
+    Image = lazy_modules.pil_image()
+    file_ext = os.path.splitext(full_path)[1].lower()
+
+    if file_ext in VIDEO_EXTENSIONS:
+        cap = cv2.VideoCapture(full_path)
+        try:
+            ret, frame = cap.read()
+        finally:
+            cap.release()
+        if not ret:
+            return None
+        pixel_count = frame.shape[0] * frame.shape[1]
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    else:
+        # Read the real resolution from the header, then let libjpeg decode at 1/4 size
+        with Image.open(full_path) as img:
+            width, height = img.size
+        pixel_count = width * height
+        gray = cv2.imread(full_path, cv2.IMREAD_REDUCED_GRAYSCALE_4)
+        if gray is None:
+            gray = cv2.imread(full_path, cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            return None
+
+    scale = ANALYSIS_MAX_SIDE / max(gray.shape[:2])
+    if scale < 1:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    histogram = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+    total = histogram.sum()
+
+    return {
+        "sharpness": float(cv2.Laplacian(gray, cv2.CV_64F).var()),
+        "dark_clip": float(histogram[:6].sum() / total),
+        "bright_clip": float(histogram[250:].sum() / total),
+        "pixels": int(pixel_count),
+    }
+
+
+def features_to_prior(features):
+    """Turn quality features into (initial skill, prior weight).
+    The prior weight acts like that many extra comparisons when computing k,
+    so confidently bad frames move less while unremarkable photos stay uncertain."""
+    if features is None:
+        return 0, 0
+
+    skill = 0.0
+    weight = 0.0
+
+    sharpness = features["sharpness"]
+    if sharpness < BLURRY_SHARPNESS:
+        skill -= 1.5 * (1 - sharpness / BLURRY_SHARPNESS) + 0.5
+        weight += 1
+    elif sharpness > SHARP_SHARPNESS:
+        skill += 0.25
+
+    clipped = max(features["dark_clip"], features["bright_clip"])
+    if clipped > CLIPPING_LIMIT:
+        # Mostly black or blown-out frames (pocket shots, lens cap)
+        skill -= 2.0
+        weight += 2
+    elif clipped > CLIPPING_LIMIT / 2:
+        skill -= 0.5
+
+    if features["pixels"] < LOW_RESOLUTION_PIXELS:
+        skill -= 0.5
+
+    return max(-3.0, min(1.0, skill)), weight
+
+
+def _analyze_one(full_path):
+    """Worker entry point (module level so it can be pickled for the process pool)"""
+    try:
+        return compute_quality_features(full_path)
+    except Exception as e:
+        _analysis_errors.warning("Could not analyze %s: %s", full_path, e)
+        return None
+
+
+def iter_quality_features(photo_folder, relative_paths, workers=None, batch_size=200):
+    """Analyze files in a process pool, yielding {relative_path: features} per batch"""
+    relative_paths = list(relative_paths)
+    if not relative_paths:
+        return
+
+    full_paths = [os.path.join(photo_folder, path) for path in relative_paths]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map() submits everything up front so the pool never idles between batches
+        results = executor.map(_analyze_one, full_paths, chunksize=16)
+        batch = {}
+        for relative_path, features in zip(relative_paths, results):
+            batch[relative_path] = features
+            if len(batch) >= batch_size:
+                yield batch
+                batch = {}
+        if batch:
+            yield batch
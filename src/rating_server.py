@@ -0,0 +1,270 @@
+"""
+Local HTTP rating server for Photo Manager
+Lets several people vote from their browsers at once. Every metadata access goes
+through one lock, so votes are applied one at a time exactly as in the Tk app.
+Each served pair is leased to its rater, and leased photos are not handed out
+again until the vote comes in or the lease expires. Built on the standard
+library's threading HTTP server, so it needs no extra dependencies.
+
+    python cli.py serve /photos --port 8765
+"""
+
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import config
+from app_logging import get_logger
+from pair_selection import comparison_pool, sample_pair
+from thumbnails import cached_thumbnail, thumbnail_cache_path
+
+log = get_logger(__name__)
+
+OUTCOMES = {"left", "right", "both", "neither", "tie"}
+
+PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Photo Manager</title>
+<style>
+body { font-family: Arial, sans-serif; text-align: center; background: #222; color: #eee; }
+#pair { display: flex; justify-content: center; gap: 20px; }
+img { max-width: 45vw; max-height: 70vh; border: 2px solid #48f; cursor: pointer; }
+button { margin: 6px; padding: 8px 16px; }
+</style></head>
+<body>
+<p>Rater: <input id="rater"> &nbsp; <span id="status"></span></p>
+<div id="pair"><div><img id="left"><p id="left-info"></p></div>
+<div><img id="right"><p id="right-info"></p></div></div>
+<p><button onclick="vote('left')">Left (A)</button>
+<button onclick="vote('both')">Both (W)</button>
+<button onclick="vote('tie')">Tie (Space)</button>
+<button onclick="vote('neither')">Neither (S)</button>
+<button onclick="vote('right')">Right (D)</button></p>
+<script>
+let pair = null;
+const rater = document.getElementById("rater");
+rater.value = localStorage.getItem("rater") || "rater-" + Math.floor(Math.random() * 1000);
+rater.onchange = () => localStorage.setItem("rater", rater.value);
+async function next() {
+  const r = await fetch("/api/pair?rater=" + encodeURIComponent(rater.value));
+  if (!r.ok) { document.getElementById("status").textContent = "No pair available"; return; }
+  pair = await r.json();
+  for (const side of ["left", "right"]) {
+    document.getElementById(side).src = "/thumb/" + pair[side].id;
+    document.getElementById(side + "-info").textContent =
+      pair[side].path + " | Q" + pair[side].quantile.toFixed(1);
+  }
+}
+async function vote(outcome) {
+  if (!pair) return;
+  const body = JSON.stringify({pair_id: pair.pair_id, outcome: outcome});
+  pair = null;
+  const r = await fetch("/api/vote", {method: "POST", body: body});
+  document.getElementById("status").textContent = r.ok ? "" : "Vote rejected (expired?)";
+  next();
+}
+document.getElementById("left").onclick = () => vote("left");
+document.getElementById("right").onclick = () => vote("right");
+document.onkeydown = (e) => {
+  if (e.target === rater) return;
+  const keys = {ArrowLeft: "left", a: "left", ArrowRight: "right", d: "right",
+                ArrowUp: "both", w: "both", ArrowDown: "neither", s: "neither", " ": "tie"};
+  if (keys[e.key]) { e.preventDefault(); vote(keys[e.key]); }
+};
+next();
+</script></body></html>
+"""
+
+
+class RatingSession:
+    """Shared state behind the HTTP handlers: the manager, its lock and the leases"""
+
+    def __init__(self, manager, lease_seconds=config.SERVER_PAIR_LEASE_SECONDS):
+        self.manager = manager
+        self.lock = threading.Lock()
+        self.lease_seconds = lease_seconds
+        self.leases = {}  # pair_id -> (photo IDs, rater, expiry time)
+        self.rater_leases = {}  # rater -> pair_id of the pair they are looking at
+        self.votes = 0
+
+        # Time-based saves only: a full write every N votes would stall all raters
+        manager.persistence.max_pending = float("inf")
+
+        self.photo_ids, _ = comparison_pool(manager, manager.scan_files())
+
+    def _expire_leases(self, now):
+        """Drop leases whose rater never voted"""
+        for pair_id, (_, rater, expiry) in list(self.leases.items()):
+            if expiry < now:
+                self._release(pair_id)
+
+    def _release(self, pair_id):
+        """Remove a lease (no-op if it is already gone)"""
+        lease = self.leases.pop(pair_id, None)
+        if lease and self.rater_leases.get(lease[1]) == pair_id:
+            del self.rater_leases[lease[1]]
+        return lease
+
+    def next_pair(self, rater):
+        """Lease a new pair to rater. Returns a JSON-ready dict, or None."""
+        with self.lock:
+            now = time.monotonic()
+            self._expire_leases(now)
+            # A rater only ever holds one pair (a reload skips the old one)
+            if rater in self.rater_leases:
+                self._release(self.rater_leases[rater])
+
+            leased = {
+                photo_id for ids, _, _ in self.leases.values() for photo_id in ids
+            }
+            pair = sample_pair(self.manager, self.photo_ids, exclude=leased)
+            if len(pair) < 2:
+                return None
+
+            pair_id = uuid.uuid4().hex
+            self.leases[pair_id] = (pair, rater, now + self.lease_seconds)
+            self.rater_leases[rater] = pair_id
+
+            result = {"pair_id": pair_id}
+            for side, photo_id in zip(("left", "right"), pair):
+                relative_path = self.manager.paths.path_of(photo_id)
+                result[side] = {
+                    "id": photo_id,
+                    "path": relative_path,
+                    "quantile": self.manager.get_quantile(relative_path),
+                    "comparisons": self.manager.get_comparisons(relative_path),
+                }
+            return result
+
+    def vote(self, pair_id, outcome):
+        """Apply a vote on a leased pair. Returns False if the lease is unknown."""
+        with self.lock:
+            lease = self._release(pair_id)
+            if lease is None:
+                return False
+            left, right = (self.manager.paths.path_of(i) for i in lease[0])
+            self.manager.update_skills(left, right, outcome)
+            self.votes += 1
+            self.manager.flush_if_due()
+            return True
+
+    def stats(self):
+        """Vote and lease counters"""
+        with self.lock:
+            return {
+                "votes": self.votes,
+                "active_raters": len(self.rater_leases),
+                "photos": len(self.photo_ids),
+            }
+
+    def flush(self):
+        """Write unsaved metadata"""
+        with self.lock:
+            self.manager.flush()
+
+
+class RatingHandler(BaseHTTPRequestHandler):
+    """Routes: / (voting page), /api/pair, /api/vote, /api/stats, /thumb/<id>"""
+
+    session = None  # Set on the subclass created by make_server()
+
+    def log_message(self, format, *args):
+        log.debug("%s - " + format, self.address_string(), *args)
+
+    def _send(self, status, body, content_type="application/json"):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/":
+            self._send(200, PAGE.encode("utf-8"), "text/html; charset=utf-8")
+        elif url.path == "/api/pair":
+            rater = parse_qs(url.query).get("rater", ["anonymous"])[0]
+            pair = self.session.next_pair(rater)
+            if pair is None:
+                self._send(404, {"error": "No pair available"})
+            else:
+                self._send(200, pair)
+        elif url.path == "/api/stats":
+            self._send(200, self.session.stats())
+        elif url.path.startswith("/thumb/"):
+            self._send_thumbnail(url.path[len("/thumb/") :])
+        else:
+            self._send(404, {"error": "Not found"})
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/api/vote":
+            self._send(404, {"error": "Not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length))
+            pair_id, outcome = body["pair_id"], body["outcome"]
+        except (ValueError, KeyError, TypeError):
+            self._send(400, {"error": "Expected JSON with pair_id and outcome"})
+            return
+        if outcome not in OUTCOMES:
+            self._send(400, {"error": f"Unknown outcome: {outcome}"})
+        elif self.session.vote(pair_id, outcome):
+            self._send(200, {"ok": True})
+        else:
+            self._send(409, {"error": "Unknown or expired pair"})
+
+    def _send_thumbnail(self, photo_id):
+        """JPEG thumbnail from the on-disk cache (rendered outside the lock)"""
+        manager = self.session.manager
+        if not photo_id.isdigit() or int(photo_id) >= len(manager.paths):
+            self._send(404, {"error": "Unknown photo"})
+            return
+        relative_path = manager.paths.path_of(int(photo_id))
+        try:
+            cached_thumbnail(manager.photo_folder, relative_path, config.THUMBNAIL_SIZE)
+            cache_path = thumbnail_cache_path(
+                manager.photo_folder, relative_path, config.THUMBNAIL_SIZE
+            )
+            with open(cache_path, "rb") as f:
+                body = f.read()
+        except Exception as e:  # Unreadable or missing file
+            self._send(500, {"error": str(e)})
+            return
+        self._send(200, body, "image/jpeg")
+
+
+def make_server(manager, host=config.SERVER_HOST, port=config.SERVER_PORT):
+    """Create the HTTP server and its RatingSession (not yet serving)"""
+    session = RatingSession(manager)
+    handler = type("BoundRatingHandler", (RatingHandler,), {"session": session})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server, session
+
+
+def serve(manager, host=config.SERVER_HOST, port=config.SERVER_PORT):
+    """Serve until interrupted, saving on the configured delay and on exit.
+    Returns the session's final stats."""
+    server, session = make_server(manager, host, port)
+
+    def flush_periodically():
+        while True:
+            time.sleep(1)
+            with session.lock:
+                manager.flush_if_due()
+
+    threading.Thread(target=flush_periodically, daemon=True).start()
+    print(f"Rating server on http://{host}:{server.server_address[1]}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        session.flush()
+    return session.stats()
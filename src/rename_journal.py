@@ -0,0 +1,287 @@
+"""
+Journaled batch renames for Photo Manager
+A rename job is planned in full before any file is touched: collisions are found
+in one pass over the plan, and files whose new name is still taken by another
+file of the same job (chains, swaps, case-only renames) are first parked under a
+temporary name. The plan is written to an intent journal, then executed in three
+phases (park, rename, unpark) in batches, optionally across a thread pool for
+network shares. Each phase is recorded in the journal as it completes, together
+with the steps that failed in it, so an interrupted job can be resumed or
+rolled back: within a phase a step is done exactly when its source is gone and
+its destination exists.
+"""
+
+import json
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import config
+from app_logging import get_logger
+from persistence import atomic_write
+
+log = get_logger(__name__)
+
+JOURNAL_FILE = ".photo_rename_journal.jsonl"
+PHASES = ("park", "rename", "unpark")
+METADATA_DONE = "metadata"  # Journal marker: metadata keys were moved and saved
+
+
+def folder_listing(photo_folder, relative_folders):
+    """normcase'd relative paths of everything in the given folders (one listdir
+    per folder, so existence checks for a whole plan stay O(N))"""
+    existing = set()
+    for folder in relative_folders:
+        full_folder = os.path.join(photo_folder, folder)
+        try:
+            names = os.listdir(full_folder)
+        except OSError:
+            continue
+        prefix = folder + "/" if folder else ""
+        existing.update(os.path.normcase(prefix + name) for name in names)
+    return existing
+
+
+def _temp_path(relative_path, token, index):
+    """Hidden temporary name next to a file; its extension keeps scans away"""
+    folder, filename = os.path.split(relative_path)
+    temp_name = f".renaming-{token}-{index}-{filename}.tmp"
+    return folder + "/" + temp_name if folder else temp_name
+
+
+def plan_renames(photo_folder, renames):
+    """Check (old, new) relative paths for collisions in O(N).
+    Returns (entries, rejected): entries are [old, new, temp] where temp is None
+    unless the new name is held by another file of the plan; rejected is
+    [(old, reason)] in the same form apply_renames() reports failures."""
+    norm = os.path.normcase
+    rejected = []
+    accepted = {}  # norm(old) -> (old, new)
+    targets = {}  # norm(new) -> norm(old)
+    for old, new in renames:
+        if old == new:
+            continue
+        if norm(new) in targets:
+            rejected.append((old, f"Another file is also being renamed to {new}"))
+            continue
+        accepted[norm(old)] = (old, new)
+        targets[norm(new)] = norm(old)
+
+    existing = folder_listing(
+        photo_folder, {os.path.dirname(new) for _, new in accepted.values()}
+    )
+    needs_temp = set()
+    blocked = []  # (norm(old), reason) of renames whose new name stays taken
+    for key, (old, new) in accepted.items():
+        if norm(new) in accepted:
+            needs_temp.add(key)  # Freed by another rename (or a case-only rename)
+        elif norm(new) in existing:
+            blocked.append((key, "File already exists"))
+
+    # A rename that cannot run keeps its file in place, which in turn blocks the
+    # rename waiting for that name (and so on down the chain)
+    while blocked:
+        key, reason = blocked.pop()
+        old, new = accepted.pop(key)
+        needs_temp.discard(key)
+        rejected.append((old, reason))
+        waiting = targets.get(key)
+        if waiting in accepted:
+            blocked.append((waiting, f"{old} could not be renamed out of the way"))
+
+    token = uuid.uuid4().hex[:8]
+    entries = []
+    for index, (key, (old, new)) in enumerate(sorted(accepted.items())):
+        temp = _temp_path(old, token, index) if key in needs_temp else None
+        entries.append([old, new, temp])
+    return entries, rejected
+
+
+class RenameJob:
+    """A planned rename of many files, backed by an intent journal in the library"""
+
+    def __init__(self, photo_folder, entries, phases_done=(), failed=None):
+        self.photo_folder = photo_folder
+        self.entries = entries
+        self.phases_done = list(phases_done)
+        self.failed = dict(failed or {})  # Source of a failed step -> error
+        self.journal_file = os.path.join(photo_folder, JOURNAL_FILE)
+
+    @classmethod
+    def plan(cls, photo_folder, renames):
+        """Plan a new job. Returns (job, rejected); see plan_renames()."""
+        if os.path.exists(os.path.join(photo_folder, JOURNAL_FILE)):
+            raise RuntimeError(
+                "An interrupted rename must be resumed or rolled back first"
+            )
+        entries, rejected = plan_renames(photo_folder, renames)
+        return cls(photo_folder, entries), rejected
+
+    @classmethod
+    def pending(cls, photo_folder):
+        """The interrupted job recorded in a library's journal (None if there is none)"""
+        journal_file = os.path.join(photo_folder, JOURNAL_FILE)
+        if not os.path.exists(journal_file):
+            return None
+        with open(journal_file, "r", encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f if line.strip()]
+        phases_done = [line["phase_done"] for line in lines[1:] if "phase_done" in line]
+        failed = {}
+        for line in lines[1:]:
+            failed.update(line.get("failed", {}))
+        return cls(photo_folder, lines[0]["entries"], phases_done, failed)
+
+    @property
+    def metadata_updated(self):
+        return METADATA_DONE in self.phases_done
+
+    def mark_metadata_updated(self):
+        """Record that the metadata now uses the new names"""
+        self._record_phase(METADATA_DONE)
+
+    def steps(self, phase):
+        """(source, destination) relative paths of one phase"""
+        if phase == "park":
+            return [(old, temp) for old, _, temp in self.entries if temp]
+        if phase == "rename":
+            return [(old, new) for old, new, temp in self.entries if not temp]
+        return [(temp, new) for _, new, temp in self.entries if temp]
+
+    def _write_journal(self):
+        header = {"created": datetime.now().isoformat(), "entries": self.entries}
+        with atomic_write(self.journal_file) as f:
+            f.write(json.dumps(header) + "\n")
+
+    def _record_phase(self, phase, failed=None):
+        """Mark a phase complete, with {source: error} of its failed steps (a
+        resumed job skips the phase and must still know they failed)"""
+        line = {"phase_done": phase}
+        if failed:
+            line["failed"] = failed
+        with open(self.journal_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(line) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.phases_done.append(phase)
+        self.failed.update(failed or {})
+
+    def _state(self, source, destination):
+        """'done', 'pending' or 'conflict' of one step of the current phase"""
+        source_exists = os.path.lexists(os.path.join(self.photo_folder, source))
+        destination_exists = os.path.lexists(
+            os.path.join(self.photo_folder, destination)
+        )
+        if destination_exists and not source_exists:
+            return "done"
+        if source_exists and not destination_exists:
+            return "pending"
+        return "conflict"
+
+    def _run_steps(self, steps, workers, progress, counter):
+        """Rename steps in batches. Returns [(source, error)] of failed steps."""
+        failed = []
+
+        def rename_one(step):
+            source, destination = step
+            try:
+                os.rename(
+                    os.path.join(self.photo_folder, source),
+                    os.path.join(self.photo_folder, destination),
+                )
+            except OSError as e:
+                return str(e)
+            return None
+
+        batch_size = config.RENAME_BATCH_SIZE
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            for start in range(0, len(steps), batch_size):
+                batch = steps[start : start + batch_size]
+                for step, error in zip(batch, executor.map(rename_one, batch)):
+                    if error:
+                        log.warning("Failed to rename %s: %s", step[0], error)
+                        failed.append((step[0], error))
+                counter[0] += len(batch)
+                if progress:
+                    progress(counter[0] - 1, counter[1], batch[-1][0])
+        return failed
+
+    def run(self, workers=config.RENAME_WORKERS, progress=None):
+        """Execute (or resume) the job. progress(index, total, relative_path) is
+        called after each batch. Returns (moved, failed): moved is {old: new} of
+        every completed rename and failed is [(old, error)]."""
+        if not self.phases_done:
+            self._write_journal()
+
+        total = sum(len(self.steps(phase)) for phase in PHASES)
+        counter = [0, total]
+        failed_sources = dict(self.failed)  # Failures recorded before an interruption
+        for phase in PHASES:
+            steps = self.steps(phase)
+            if phase in self.phases_done:
+                counter[0] += len(steps)
+                continue
+            to_run = []
+            phase_failed = {}
+            for source, destination in steps:
+                state = self._state(source, destination)
+                if state == "pending":
+                    to_run.append((source, destination))
+                elif state == "conflict":
+                    phase_failed[source] = "File is missing or its new name is taken"
+            counter[0] += len(steps) - len(to_run)
+            for source, error in self._run_steps(to_run, workers, progress, counter):
+                phase_failed[source] = error
+            failed_sources.update(phase_failed)
+            self._record_phase(phase, phase_failed)
+
+        moved = {}
+        failed = []
+        for old, new, temp in self.entries:
+            error = failed_sources.get(old) or (temp and failed_sources.get(temp))
+            if not error:
+                moved[old] = new
+                continue
+            if temp and os.path.lexists(os.path.join(self.photo_folder, temp)):
+                # Parked but not renamed: put the file back under its old name
+                if self._run_steps([(temp, old)], 1, None, [0, 1]):
+                    error += f" (file left at {temp})"
+            failed.append((old, error))
+        return moved, failed
+
+    def rollback(self, workers=config.RENAME_WORKERS, progress=None):
+        """Undo a partly or fully executed job, newest phase first.
+        Returns (restored, failed) like run(): restored is {new: old} of every
+        rename without a failed undo (the metadata needs moving back only if
+        metadata_updated)."""
+        total = sum(len(self.steps(phase)) for phase in PHASES)
+        counter = [0, total]
+        failed = []
+        started = [
+            phase
+            for i, phase in enumerate(PHASES)
+            if phase in self.phases_done or i == len(self.phases_done)
+        ]
+        for phase in reversed(started):
+            undo = [
+                (destination, source)
+                for source, destination in self.steps(phase)
+                if self._state(source, destination) == "done"
+            ]
+            failed.extend(self._run_steps(undo, workers, progress, counter))
+
+        # Entries that failed in run() were never moved, in metadata either
+        failed_paths = {path for path, _ in failed} | set(self.failed)
+        restored = {
+            new: old
+            for old, new, temp in self.entries
+            if not failed_paths & {old, new, temp}
+        }
+        return restored, failed
+
+    def finish(self):
+        """Delete the journal once metadata matches the files"""
+        try:
+            os.remove(self.journal_file)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,228 @@
+"""
+Quantile-prefix rename planning for Photo Manager
+Works out which files need a QXXX_ prefix added, updated or removed and applies
+the renames with metadata rekeying, independent of any UI. The file operations
+themselves are journaled (see rename_journal.py).
+"""
+
+import math
+import os
+import statistics
+import time
+
+import config
+from app_logging import FileSummary, get_logger
+from rename_journal import RenameJob, folder_listing
+
+log = get_logger(__name__)
+
+
+def has_quantile_prefix(filename):
+    """Whether a filename starts with a QXXX_ quantile prefix"""
+    return filename.startswith("Q") and "_" in filename[:5]
+
+
+def get_base_filename(filename):
+    """Get the base filename without quantile prefix"""
+    if has_quantile_prefix(filename):
+        underscore_pos = filename.find("_")
+        return filename[underscore_pos + 1 :]
+    return filename
+
+
+def bucket_start(quantile, bucket_size=config.PREFIX_BUCKET_SIZE):
+    """Lower edge of the prefix bucket holding a quantile (0-100)"""
+    # The epsilon keeps 56.7 in the 56.7 bucket despite float division
+    return math.floor(quantile / bucket_size + 1e-9) * bucket_size
+
+
+def quantile_prefix(quantile, bucket_size=config.PREFIX_BUCKET_SIZE):
+    """Prefix for a quantile (0-100), e.g. 56.7 -> Q567_ (or Q550_ with 5-point
+    buckets)"""
+    value = min(int(round(bucket_start(quantile, bucket_size) * 10)), 999)
+    return config.QUANTILE_PREFIX_FORMAT.format(value)
+
+
+def prefix_is_current(
+    prefixed_quantile,
+    quantile,
+    bucket_size=config.PREFIX_BUCKET_SIZE,
+    hysteresis=config.PREFIX_HYSTERESIS,
+):
+    """Whether a file prefixed with prefixed_quantile can keep its name: the
+    current quantile is still inside that prefix's bucket, widened on both sides
+    by the hysteresis margin so photos near a bucket edge don't flip back and
+    forth after every session"""
+    # Compared in bucket units, with the same rounding as bucket_start()
+    bucket = math.floor(prefixed_quantile / bucket_size + 1e-9)
+    position = quantile / bucket_size + 1e-9
+    margin = hysteresis / bucket_size
+    return bucket - margin <= position < bucket + 1 + margin
+
+
+def get_quantile_from_filename(filename):
+    """Extract quantile from filename if it has the QXXX_ prefix"""
+    if has_quantile_prefix(filename):
+        try:
+            # Convert back from 3-digit format: 506 -> 50.6
+            return int(filename[1 : filename.find("_")]) / 10.0
+        except ValueError:
+            pass
+    return None
+
+
+def _with_filename(relative_path, filename):
+    """Replace the filename of a relative path, keeping its folder"""
+    folder_part = os.path.dirname(relative_path)
+    return folder_part + "/" + filename if folder_part else filename
+
+
+def plan_prefix_renames(
+    manager,
+    add_prefix=True,
+    bucket_size=config.PREFIX_BUCKET_SIZE,
+    hysteresis=config.PREFIX_HYSTERESIS,
+):
+    """Plan renames for every existing photo in the metadata.
+    A prefixed file is only renamed when its quantile left the prefix's bucket by
+    more than the hysteresis margin (see prefix_is_current).
+    Returns (renames, unchanged): renames is a list of (old, new) relative paths
+    and unchanged lists files that already have the requested naming."""
+    renames = []
+    unchanged = []
+
+    relative_paths = list(manager.metadata.keys())
+    existing = folder_listing(
+        manager.photo_folder, {os.path.dirname(path) for path in relative_paths}
+    )
+    for relative_path in relative_paths:
+        if os.path.normcase(relative_path) not in existing:
+            continue
+
+        filename = os.path.basename(relative_path)
+        if add_prefix:
+            quantile = manager.get_quantile(relative_path)
+            prefixed_quantile = get_quantile_from_filename(filename)
+            if prefixed_quantile is not None and prefix_is_current(
+                prefixed_quantile, quantile, bucket_size, hysteresis
+            ):
+                unchanged.append(relative_path)
+                continue
+            new_filename = quantile_prefix(quantile, bucket_size) + get_base_filename(
+                filename
+            )
+        else:
+            new_filename = get_base_filename(filename)
+
+        if new_filename == filename:
+            unchanged.append(relative_path)
+        else:
+            renames.append((relative_path, _with_filename(relative_path, new_filename)))
+
+    return renames, unchanged
+
+
+def estimate_rename_cost(
+    manager, renames, unchanged, workers=config.RENAME_WORKERS, samples=20
+):
+    """Dry-run cost of a planned prefix rename: how many files and folders it
+    touches, how many a plain 0.1-point prefix would rename instead, the cached
+    thumbnails it invalidates and a rough duration from the measured latency of
+    file system calls in the library (a rename costs about two of them)."""
+    exact_renames, _ = plan_prefix_renames(manager, True, bucket_size=0.1, hysteresis=0)
+
+    renamed = {old for old, _ in renames}
+    thumbnails = 0
+    thumbnail_root = os.path.join(manager.photo_folder, config.THUMBNAIL_CACHE_FOLDER)
+    if renamed and os.path.isdir(thumbnail_root):
+        cached_names = {old.replace("/", "__") + ".jpg" for old in renamed}
+        for size_folder in os.listdir(thumbnail_root):
+            names = os.listdir(os.path.join(thumbnail_root, size_folder))
+            thumbnails += len(cached_names.intersection(names))
+
+    latencies = []
+    for old, _ in renames[:samples]:
+        start = time.perf_counter()
+        try:
+            os.stat(os.path.join(manager.photo_folder, old))
+        except OSError:
+            continue
+        latencies.append(time.perf_counter() - start)
+    latency = statistics.median(latencies) if latencies else 0.0
+
+    return {
+        "renames": len(renames),
+        "unchanged": len(unchanged),
+        "folders": len({os.path.dirname(old) for old in renamed}),
+        "renames_at_exact_prefixes": len(exact_renames),
+        "thumbnails_invalidated": thumbnails,
+        "estimated_seconds": round(2 * latency * len(renames) / max(1, workers), 2),
+    }
+
+
+def apply_renames(manager, renames, progress=None, workers=config.RENAME_WORKERS):
+    """Rename files on disk as one journaled RenameJob and move their metadata to
+    the new keys in a single pass. progress(index, total, relative_path) is
+    called after each batch. Returns (success_count, failed) where failed is
+    [(relative_path, error)], including renames rejected as collisions."""
+    job, failed = RenameJob.plan(manager.photo_folder, renames)
+    for old_relative_path, reason in failed:
+        log.warning("Skipping %s: %s", old_relative_path, reason)
+
+    moved, run_failed = job.run(workers, progress)
+    _finish_job(manager, job, moved)
+    return len(moved), failed + run_failed
+
+
+def _finish_job(manager, job, moved):
+    """Rekey the metadata of completed renames, save it and close the journal"""
+    if moved:
+        renamed = FileSummary(log, "Renamed")
+        for old_relative_path, new_relative_path in moved.items():
+            renamed.add(old_relative_path, new_relative_path)
+        renamed.done()
+        manager.metadata.rename_many(moved.items())
+        manager.log_path_changes(moved=moved)
+        manager.save_metadata()
+        # Files were renamed on disk, so write the new keys right away
+        manager.flush()
+    job.mark_metadata_updated()
+    job.finish()
+
+
+def pending_renames(photo_folder):
+    """Number of files in an interrupted rename job (0 if there is none)"""
+    job = RenameJob.pending(photo_folder)
+    return len(job.entries) if job else 0
+
+
+def resume_renames(manager, progress=None, workers=config.RENAME_WORKERS):
+    """Finish an interrupted rename job. Returns (success_count, failed) like
+    apply_renames(), or None if there was nothing to resume."""
+    job = RenameJob.pending(manager.photo_folder)
+    if job is None:
+        return None
+    if job.metadata_updated:
+        job.finish()  # Only the journal cleanup was left
+        return 0, []
+
+    moved, failed = job.run(workers, progress)
+    _finish_job(manager, job, moved)
+    return len(moved), failed
+
+
+def rollback_renames(manager, progress=None, workers=config.RENAME_WORKERS):
+    """Undo an interrupted rename job, restoring the old names. Returns
+    (restored_count, failed), or None if there was nothing to roll back."""
+    job = RenameJob.pending(manager.photo_folder)
+    if job is None:
+        return None
+
+    restored, failed = job.rollback(workers, progress)
+    if job.metadata_updated and restored:
+        manager.metadata.rename_many(restored.items())
+        manager.log_path_changes(moved=restored)
+        manager.save_metadata()
+        manager.flush()
+    job.finish()
+    return len(restored), failed
@@ -0,0 +1,54 @@
+"""
+Skill model for Photo Manager
+The Elo-style update rules shared by live voting and log merging, so a merged
+replay reproduces exactly what the votes did when they were cast
+"""
+
+import math
+
+import config
+
+# outcome -> (score of left/A, score of right/B)
+OUTCOME_SCORES = {
+    "left": (1, 0),
+    "right": (0, 1),
+    "both": (1, 1),
+    "neither": (0, 0),
+    "tie": (0.5, 0.5),
+}
+
+
+def expected_score(s_a, s_b):
+    """Probability that A beats B"""
+    return 1 / (1 + math.exp(-(s_a - s_b)))
+
+
+def dynamic_k(comparisons, prior_weight, k_0):
+    """k = k_0 / sqrt(c + 1), where c includes any quality prior weight"""
+    return k_0 / math.sqrt(comparisons + prior_weight + 1)
+
+
+def vote_update(s_a, c_a, w_a, s_b, c_b, w_b, outcome, k_0):
+    """New (skill A, skill B) after a vote; w is each photo's prior weight"""
+    score_a, score_b = OUTCOME_SCORES[outcome]
+    e_a = expected_score(s_a, s_b)
+    s_a_new = s_a + dynamic_k(c_a, w_a, k_0) * (score_a - e_a)
+    s_b_new = s_b + dynamic_k(c_b, w_b, k_0) * (score_b - (1 - e_a))
+    return s_a_new, s_b_new
+
+
+def implied_win_update(s_w, c_w, w_w, s_l, c_l, w_l, k_0):
+    """New (winner skill, loser skill) for a burst's implied win, damped by
+    config.CLUSTER_PRIOR_WEIGHT"""
+    k_w = config.CLUSTER_PRIOR_WEIGHT * dynamic_k(c_w, w_w, k_0)
+    k_l = config.CLUSTER_PRIOR_WEIGHT * dynamic_k(c_l, w_l, k_0)
+    e_w = expected_score(s_w, s_l)
+    return s_w + k_w * (1 - e_w), s_l - k_l * (1 - e_w)
+
+
+def skill_standard_error(comparisons, prior_weight):
+    """Approximate standard error of a skill estimate (scalars or numpy arrays):
+    a logistic comparison carries at most 1/4 unit of information, so n of them
+    pin a skill down to about 2 / sqrt(n). The prior weight counts as comparisons
+    and the +1 stands in for the median prior every photo starts from."""
+    return 2 / (comparisons + prior_weight + 1) ** 0.5
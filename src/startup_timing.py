@@ -0,0 +1,50 @@
+"""
+Startup timing report for Photo Manager
+Import this module first: it records the start time, and mark() records how long
+each startup phase (imports, window, metadata load, scan, first paint) took so
+regressions in time-to-first-window show up in the console.
+"""
+
+import time
+
+START = time.perf_counter()
+
+_marks = []  # (phase, seconds since START)
+_reported = False
+
+
+def mark(phase):
+    """Record the end of a startup phase (only its first occurrence). A phase that
+    ends after the report was printed, like the background library scan, gets a
+    line of its own then."""
+    if any(name == phase for name, _ in _marks):
+        return
+    _marks.append((phase, time.perf_counter() - START))
+    if _reported:
+        _print_phase(*phases()[-1])
+
+
+def _print_phase(phase, duration, elapsed):
+    print(f"  {phase:<20} {duration * 1000:8.1f} ms  (at {elapsed * 1000:8.1f} ms)")
+
+
+def phases():
+    """[(phase, duration_seconds, elapsed_seconds)] in the order they were marked"""
+    result = []
+    previous = 0.0
+    for phase, elapsed in _marks:
+        result.append((phase, elapsed - previous, elapsed))
+        previous = elapsed
+    return result
+
+
+def report():
+    """Print the startup phases marked so far (once)"""
+    global _reported
+    if _reported:
+        return
+    _reported = True
+
+    print("Startup timing:")
+    for phase, duration, elapsed in phases():
+        _print_phase(phase, duration, elapsed)
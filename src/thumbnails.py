@@ -0,0 +1,124 @@
+"""
+Thumbnail rendering for Photo Manager
+Loads images and video first frames as resized PIL images; the UI only wraps the
+result in a PhotoImage, so thumbnails can also be produced headless. Summary
+thumbnails can be cached on disk (and pre-generated from the command line).
+"""
+
+import os
+import threading
+
+import config
+import lazy_modules
+import memory_diagnostics
+import vote_timing
+from app_logging import get_logger
+
+log = get_logger(__name__)
+
+VIDEO_EXTENSIONS = frozenset(config.VIDEO_EXTENSIONS)
+
+
+def is_video(path):
+    """Whether a path has a video extension"""
+    return os.path.splitext(path)[1].lower() in VIDEO_EXTENSIONS
+
+
+def extract_video_frame(video_path):
+    """Extract first frame from video file (a placeholder image on failure)"""
+    cv2 = lazy_modules.cv2()
+    Image = lazy_modules.pil_image()
+    cap = None
+    try:
+        log.debug("Opening video: %s", video_path)
+
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            log.warning("Failed to open video: %s", video_path)
+            return Image.new("RGB", (400, 300), color="red")
+
+        # Read first frame
+        ret, frame = cap.read()
+        if not ret:
+            log.warning("Failed to read a frame from video: %s", video_path)
+            return Image.new("RGB", (400, 300), color="gray")
+
+        # Convert BGR to RGB
+        return Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+    except Exception as e:
+        log.warning("Error extracting a frame from %s: %s", video_path, e)
+        return Image.new("RGB", (400, 300), color="gray")
+    finally:
+        # Always release the video capture
+        if cap is not None:
+            cap.release()
+
+
+def load_thumbnail(path, size):
+    """Load an image (or a video's first frame) resized to fit size.
+    Returns (image, is_video)."""
+    Image = lazy_modules.pil_image()
+    video = is_video(path)
+    if video:
+        with vote_timing.phase("video_frame"):
+            img = extract_video_frame(path)
+    else:
+        img = Image.open(path)
+    img.thumbnail(size, Image.Resampling.LANCZOS)
+    return memory_diagnostics.track(img, "PIL Image"), video
+
+
+def thumbnail_cache_path(photo_folder, relative_path, size):
+    """Where the cached thumbnail of a photo at a given size is stored"""
+    folder = os.path.join(photo_folder, config.THUMBNAIL_CACHE_FOLDER)
+    name = relative_path.replace("/", "__")
+    return os.path.join(folder, f"{size[0]}x{size[1]}", name + ".jpg")
+
+
+def cached_thumbnail(photo_folder, relative_path, size):
+    """Load a thumbnail from the disk cache, creating it if missing or older than
+    the photo. Returns (image, is_video)."""
+    Image = lazy_modules.pil_image()
+    full_path = os.path.join(photo_folder, relative_path)
+    cache_path = thumbnail_cache_path(photo_folder, relative_path, size)
+    video = is_video(full_path)
+
+    try:
+        if os.path.getmtime(cache_path) >= os.path.getmtime(full_path):
+            img = Image.open(cache_path)
+            return memory_diagnostics.track(img, "PIL Image"), video
+    except OSError:
+        pass  # Not cached yet
+
+    img, video = load_thumbnail(full_path, size)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    # Per-thread temp file: concurrent requests for one photo must not interleave
+    temp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+    img.convert("RGB").save(temp_path, "JPEG", quality=85)
+    os.replace(temp_path, cache_path)
+    return img, video
+
+
+def error_thumbnail(path, error_msg, size=(400, 300)):
+    """Red placeholder naming the file that failed to load"""
+    Image = lazy_modules.pil_image()
+    ImageDraw, ImageFont = lazy_modules.pil_draw()
+    error_img = Image.new("RGB", size, color="red")
+    draw = ImageDraw.Draw(error_img)
+
+    error_text = f"ERROR\n{os.path.basename(path)}\n{error_msg[:50]}..."
+
+    # Try to use a font, fall back to default if not available
+    try:
+        font = ImageFont.truetype("arial.ttf", 16)
+    except OSError:
+        font = ImageFont.load_default()
+
+    # Get text size and center it
+    bbox = draw.textbbox((0, 0), error_text, font=font)
+    x = (size[0] - (bbox[2] - bbox[0])) // 2
+    y = (size[1] - (bbox[3] - bbox[1])) // 2
+
+    draw.text((x, y), error_text, fill="white", font=font, align="center")
+    return memory_diagnostics.track(error_img, "PIL Image")
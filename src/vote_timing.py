@@ -0,0 +1,141 @@
+"""
+Per-vote latency timing for Photo Manager
+Phase timers around the comparison hot path (selection, decode, PhotoImage
+creation, metadata saves, ...) so a slow keypress can be pinned on one phase.
+Durations go into a small rolling window per phase, from which the overlay reads
+p50/p95, and into a per-session CSV trace that is written in batches. With
+timing off, phase() returns a shared no-op context manager, and with it on a
+phase costs two perf_counter() calls and a deque append.
+"""
+
+import csv
+import os
+import time
+from collections import deque
+from contextlib import nullcontext
+from datetime import datetime
+
+import config
+import memory_diagnostics
+from app_logging import get_logger
+
+log = get_logger(__name__)
+
+TRACE_FOLDER = ".photo_timing"
+TRACE_FIELDS = ("vote", "phase", "start_ms", "duration_ms")
+
+enabled = config.ENABLE_VOTE_TIMING
+_windows = {}  # phase -> deque of recent durations (seconds)
+_pending = []  # Trace rows not written yet
+_trace_file = None
+_session_start = time.perf_counter()
+_vote = 0
+_NO_TIMING = nullcontext()
+
+
+class _Phase:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        record(self.name, self.start, time.perf_counter() - self.start)
+        if memory_diagnostics.enabled:
+            memory_diagnostics.phase_ended(self.name)
+        return False
+
+
+def phase(name):
+    """Context manager timing one phase of the current vote (memory diagnostics
+    also sample the RSS at the end of each phase)"""
+    if enabled or memory_diagnostics.enabled:
+        return _Phase(name)
+    return _NO_TIMING
+
+
+def record(name, start, duration):
+    """Add one measured phase (start is a perf_counter() value)"""
+    window = _windows.get(name)
+    if window is None:
+        window = _windows[name] = deque(maxlen=config.VOTE_TIMING_WINDOW)
+    window.append(duration)
+    if _trace_file is not None:
+        _pending.append(
+            (_vote, name, round((start - _session_start) * 1000, 3), duration * 1000)
+        )
+        if len(_pending) >= config.VOTE_TRACE_BATCH:
+            flush_trace()
+
+
+def begin_vote():
+    """Start numbering the phases of the next vote in the trace"""
+    global _vote
+    _vote += 1
+
+
+def start_session(photo_folder):
+    """Turn timing on for a library: the trace goes to a new CSV file in its
+    timing folder (one per session)"""
+    global enabled, _trace_file, _session_start, _vote
+    flush_trace()
+    enabled = True
+    _session_start = time.perf_counter()
+    _vote = 0
+    folder = os.path.join(photo_folder, TRACE_FOLDER)
+    os.makedirs(folder, exist_ok=True)
+    _trace_file = os.path.join(
+        folder, f"votes_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    )
+    with open(_trace_file, "w", newline="") as f:
+        csv.writer(f).writerow(TRACE_FIELDS)
+
+
+def flush_trace():
+    """Append the buffered trace rows to the session's CSV file"""
+    if _trace_file is None or not _pending:
+        return
+    try:
+        with open(_trace_file, "a", newline="") as f:
+            csv.writer(f).writerows(
+                (vote, name, start_ms, f"{duration_ms:.3f}")
+                for vote, name, start_ms, duration_ms in _pending
+            )
+    except OSError as e:
+        log.warning("Could not write the timing trace: %s", e)
+    _pending.clear()
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def summary():
+    """[(phase, p50_ms, p95_ms, samples)] over each phase's rolling window"""
+    rows = []
+    for name, window in _windows.items():
+        if window:
+            values = sorted(window)
+            rows.append(
+                (
+                    name,
+                    percentile(values, 0.5) * 1000,
+                    percentile(values, 0.95) * 1000,
+                    len(values),
+                )
+            )
+    return rows
+
+
+def overlay_text():
+    """Multi-line p50/p95 table for the in-app overlay"""
+    lines = [f"{'ms':<16}{'p50':>8}{'p95':>8}"]
+    for name, p50, p95, _ in summary():
+        lines.append(f"{name:<16}{p50:8.1f}{p95:8.1f}")
+    return "\n".join(lines)
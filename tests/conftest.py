@@ -0,0 +1,69 @@
+"""
+Shared setup for the Photo Manager tests
+The app's modules are flat files in src/ (imported as `import config`), and the
+synthetic libraries come from the benchmarks package at the repository root.
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+ROOT_FOLDER = os.path.normpath(os.path.join(os.path.dirname(__file__), os.pardir))
+for folder in (ROOT_FOLDER, os.path.join(ROOT_FOLDER, "src")):
+    if folder not in sys.path:
+        sys.path.insert(0, folder)
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "perf: size-scaling performance test (deselect with -m 'not perf')"
+    )
+
+
+def best_of(func, repeats=5):
+    """Fastest of several runs of func(), in seconds (the minimum is the least
+    noisy estimate of what the code itself costs)"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+@pytest.fixture
+def opened_managers():
+    """Collects MetadataManagers and flushes them before their folder is removed"""
+    managers = []
+    yield managers
+    for manager in managers:
+        manager.flush()
+
+
+@pytest.fixture
+def make_library(tmp_path):
+    """Factory: make_library(count, **kwargs) generates a synthetic library in a
+    fresh folder under tmp_path and returns (folder, relative_paths)"""
+    from benchmarks.synthetic_library import generate_library
+
+    def make(count, name="library", **kwargs):
+        folder = str(tmp_path / name)
+        return folder, generate_library(folder, count, **kwargs)
+
+    return make
+
+
+@pytest.fixture
+def open_manager(opened_managers):
+    """Factory: open_manager(folder, **load_kwargs) opens and loads a library"""
+    from metadata_manager import MetadataManager
+
+    def open_(folder, **load_kwargs):
+        manager = MetadataManager(folder)
+        manager.load_metadata(**load_kwargs)
+        opened_managers.append(manager)
+        return manager
+
+    return open_
@@ -0,0 +1,23 @@
+"""Command-line interface"""
+
+import json
+import os
+
+import cli
+
+
+def test_sync_reports_added_and_removed_files(make_library, open_manager, capsys):
+    folder, relative_paths = make_library(12)
+    open_manager(folder).flush()
+    os.remove(os.path.join(folder, relative_paths[0]))
+    with open(os.path.join(folder, "2015/01/IMG_new.jpg"), "wb") as f:
+        f.write(os.urandom(256))
+
+    assert cli.main(["sync", folder]) == 0
+    result = json.loads(capsys.readouterr().out)
+    assert (result["added"], result["removed"]) == (1, 1)
+    assert result["reattached"] == result["transferred"] == 0
+
+    assert cli.main(["sync", folder]) == 0
+    result = json.loads(capsys.readouterr().out)
+    assert (result["added"], result["removed"]) == (0, 0)
@@ -0,0 +1,67 @@
+"""ColumnarMetadata: the dict-like view over the numpy columns"""
+
+import numpy as np
+import pytest
+
+from columnar_metadata import ColumnarMetadata
+from path_table import PathTable
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ColumnarMetadata(PathTable(str(tmp_path)))
+
+
+@pytest.mark.parametrize(
+    "key, value",
+    [
+        ("skill", np.float64(1.25)),
+        ("skill", np.float32(1.25)),
+        ("prior_weight", np.float32(2.5)),
+        ("comparisons", np.int64(7)),
+        ("epoch", np.int32(3)),
+    ],
+)
+def test_numpy_scalars_go_to_the_columns(store, key, value):
+    store["a.jpg"] = {}
+    store["a.jpg"][key] = value
+    assert store["a.jpg"][key] == value
+    row = store.paths.intern("a.jpg")
+    assert store.column(key)[row] == value
+    assert not store._extra
+
+
+def test_booleans_are_not_numbers(store):
+    store["a.jpg"] = {"skill": True}
+    assert store["a.jpg"]["skill"] is True
+    assert store.column("skill")[store.paths.intern("a.jpg")] == 0
+
+
+def test_default_tags_can_be_edited_in_place(store):
+    store["a.jpg"] = {}
+    store.take_dirty_rows()
+    store["a.jpg"].edit_tags().append("favourite")
+    assert store["a.jpg"]["tags"] == ("favourite",)
+    assert store.to_dict()["a.jpg"]["tags"] == ["favourite"]
+    assert len(store.take_dirty_rows()) == 1
+
+
+def test_reading_tags_changes_nothing(store):
+    store["a.jpg"] = {}
+    store["b.jpg"] = {"tags": ["beach"]}
+    store.take_dirty_rows()
+    for relative_path in ("a.jpg", "b.jpg"):
+        dict(store[relative_path])
+        store[relative_path].get("tags")
+    assert len(store.take_dirty_rows()) == 0
+    assert list(store._sparse["tags"]) == [store.paths.intern("b.jpg")]
+
+
+def test_copied_entries_do_not_share_tags(store):
+    tags = ["beach"]
+    store["a.jpg"] = {"tags": tags}
+    store["b.jpg"] = store["a.jpg"]
+    store["b.jpg"].edit_tags().append("family")
+    tags.append("sunset")
+    assert store["a.jpg"]["tags"] == ("beach",)
+    assert store["b.jpg"]["tags"] == ("beach", "family")
@@ -0,0 +1,184 @@
+"""Merging the comparison logs back into the ratings"""
+
+import shutil
+
+import pytest
+
+import config
+
+
+@pytest.fixture
+def library(make_library):
+    folder, relative_paths = make_library(12)
+    return folder, [path for path in relative_paths if path.endswith(".jpg")]
+
+
+def _rating(manager, relative_path):
+    entry = manager.metadata[relative_path]
+    return entry["skill"], entry["comparisons"]
+
+
+def test_upgraded_library_keeps_ratings_from_before_the_logs(library, open_manager):
+    """A library rated before the comparison logs existed: the first logged vote
+    on a photo must continue from its stored rating, not from its prior"""
+    folder, photos = library
+    a, b = photos[:2]
+    manager = open_manager(folder)
+    manager.metadata[a].update(skill=2.0, comparisons=20)
+    manager.metadata[b].update(skill=-1.0, comparisons=5)
+    manager.flush()
+
+    manager.update_skills(a, b, "left")
+    after_vote = _rating(manager, a), _rating(manager, b)
+    manager.flush()
+    assert after_vote[0][1] == 21 and after_vote[0][0] > 2.0
+
+    reopened = open_manager(folder)
+    assert (_rating(reopened, a), _rating(reopened, b)) == after_vote
+
+
+def test_replay_with_custom_k_survives_a_reload(library, open_manager):
+    folder, photos = library
+    manager = open_manager(folder)
+    for _ in range(3):
+        manager.update_skills(photos[0], photos[1], "left")
+    manager.apply_cluster_ranking(photos[0], photos[2:4])
+    manager.replay_comparisons(k_0=8)
+    replayed = {path: _rating(manager, path) for path in photos[:4]}
+    manager.flush()
+
+    reopened = open_manager(folder)
+    assert {path: _rating(reopened, path) for path in photos[:4]} == replayed
+
+
+def test_votes_cast_while_a_prepared_merge_waits_are_kept(library, open_manager):
+    """The background scan prepares the merge on its worker; votes cast before
+    the UI thread finishes it must not be overwritten by the older checkpoint"""
+    from comparison_merge import LogMerger
+
+    folder, photos = library
+    manager = open_manager(folder)
+    manager.update_skills(photos[0], photos[1], "left")
+    manager.reset_all_scores()  # The next merge recomputes from scratch
+    manager.update_skills(photos[2], photos[3], "left")
+
+    merger = LogMerger(manager)
+    prepared = merger.prepare()
+    manager.update_skills(photos[2], photos[4], "right")
+    expected = {path: _rating(manager, path) for path in photos[2:5]}
+    assert merger.finish(prepared) == 2
+    assert {path: _rating(manager, path) for path in photos[2:5]} == expected
+
+
+def test_prepare_with_snapshot_priors_never_reads_the_metadata(
+    library, open_manager, monkeypatch
+):
+    """The background scan's merge runs on the worker thread while the UI thread
+    may change the metadata, so it works from priors copied beforehand"""
+    from comparison_merge import LogMerger, snapshot_priors
+
+    folder, photos = library
+    manager = open_manager(folder)
+    for i, relative_path in enumerate(photos):
+        manager.metadata[relative_path].update(prior_skill=i / 4, prior_weight=2.0)
+    manager.reset_all_scores()  # Ratings restart from the priors
+    manager.update_skills(photos[0], photos[1], "left")
+    manager.update_skills(photos[2], photos[1], "right")
+    expected = LogMerger(manager).prepare()[0]["checkpoint"]
+
+    merger = LogMerger(manager, priors=snapshot_priors(manager))
+    metadata = manager.metadata
+    monkeypatch.setattr(manager, "metadata", None)
+    prepared = merger.prepare()
+    monkeypatch.setattr(manager, "metadata", metadata)
+    assert prepared[0]["checkpoint"] == expected
+
+
+def test_initial_background_scan_merges_the_logs(library, open_manager):
+    import time
+
+    from background_scan import LibraryScan
+
+    folder, photos = library
+    manager = open_manager(folder)
+    manager.update_skills(photos[0], photos[1], "left")
+    voted = _rating(manager, photos[0])
+    manager.flush()
+
+    reopened = open_manager(folder, scan=False)
+    reopened.metadata[photos[0]].update(skill=0.0, comparisons=0)  # Stale copy
+    scan = LibraryScan(reopened, initial=True).start()
+    deadline = time.monotonic() + 30
+    while not scan.poll():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    scan.apply()
+    assert _rating(reopened, photos[0]) == voted
+
+
+def test_conflicted_copy_of_a_log_is_not_merged_twice(library, open_manager):
+    folder, photos = library
+    manager = open_manager(folder)
+    for winner, loser in zip(photos[:3], photos[3:6]):
+        manager.update_skills(winner, loser, "left")
+    voted = {path: _rating(manager, path) for path in photos}
+    manager.flush()
+    log_file = manager.comparison_log.log_file
+    shutil.copy(log_file, log_file[: -len(".jsonl")] + " (conflicted copy).jsonl")
+
+    assert manager.merge_comparison_logs() == 3  # Each vote once
+    assert {path: _rating(manager, path) for path in photos} == voted
+    reopened = open_manager(folder)
+    assert {path: _rating(reopened, path) for path in photos} == voted
+
+
+def test_devices_merge_each_others_votes_to_the_same_ratings(
+    library, open_manager, monkeypatch
+):
+    """Two machines voting on a synced library at the same time, each merging
+    with its own state: both must end with every vote applied and the same
+    ratings"""
+    folder, photos = library
+    votes = {
+        "laptop": [(photos[0], photos[1]), (photos[0], photos[2])],
+        "desktop": [(photos[1], photos[0]), (photos[3], photos[0])],
+    }
+    managers = {}
+    for device in votes:
+        monkeypatch.setattr(config, "DEVICE_ID", device)
+        managers[device] = open_manager(folder)
+    comparisons = _rating(managers["laptop"], photos[0])[1]
+    for device, pairs in votes.items():
+        for winner, loser in pairs:
+            managers[device].update_skills(winner, loser, "left")
+    for manager in managers.values():
+        manager.flush()  # The last write of the shared metadata wins
+
+    merged = {}
+    for device in votes:
+        monkeypatch.setattr(config, "DEVICE_ID", device)
+        manager = open_manager(folder)
+        merged[device] = {path: _rating(manager, path) for path in photos}
+    assert merged["laptop"] == merged["desktop"]
+    assert merged["laptop"][photos[0]][1] == comparisons + 4
+
+
+def test_undo_of_merged_votes_recomputes_the_ratings(library, open_manager):
+    folder, photos = library
+    manager = open_manager(folder)
+    manager.update_skills(photos[0], photos[1], "left")
+    manager.update_skills(photos[0], photos[2], "left")
+    before_last = {path: _rating(manager, path) for path in photos}
+    manager.update_skills(photos[1], photos[0], "left")
+    manager.flush()
+
+    reopened = open_manager(folder)  # Merges all three votes
+    assert reopened.undo_last_comparisons(1)
+    assert {path: _rating(reopened, path) for path in photos} == before_last
+    reopened.flush()
+
+    # The truncated log no longer matches the merge state, so the next merge
+    # recomputes instead of keeping the undone vote
+    assert {path: _rating(open_manager(folder), path) for path in photos} == (
+        before_last
+    )
@@ -0,0 +1,88 @@
+"""Bulk culling into delete/ and keep/"""
+
+import os
+
+import pytest
+
+import config
+from culling import apply_cull, plan_cull
+from rename_journal import JOURNAL_FILE, RenameJob
+from rename_planner import resume_renames
+
+
+@pytest.fixture
+def rated(make_library, open_manager):
+    """A library where every photo is unrated except a settled worst and best
+    photo, and a poor photo with too few comparisons to cull"""
+    folder, relative_paths = make_library(12)
+    manager = open_manager(folder)
+    for relative_path in relative_paths:
+        manager.metadata[relative_path].update(skill=0.0, comparisons=0)
+    worst, best, unsure = relative_paths[1:4]
+    epoch = manager.rating_epoch
+    manager.metadata[worst].update(skill=-6.0, comparisons=200, epoch=epoch)
+    manager.metadata[best].update(skill=6.0, comparisons=200, epoch=epoch)
+    manager.metadata[unsure].update(skill=-6.0, comparisons=1, epoch=epoch)
+    manager.save_metadata()
+    manager.flush()
+    return manager, relative_paths, worst, best
+
+
+def _exists(manager, relative_path):
+    return os.path.isfile(os.path.join(manager.photo_folder, relative_path))
+
+
+def test_plan_cull_takes_only_settled_photos(rated):
+    manager, _, worst, best = rated
+    assert plan_cull(manager) == {"delete": [worst], "keep": [best]}
+
+
+def test_apply_cull_moves_files_and_drops_their_metadata(rated, open_manager):
+    manager, relative_paths, worst, best = rated
+    moved, failed = apply_cull(manager, plan_cull(manager))
+    assert moved == {"delete": 1, "keep": 1} and not failed
+
+    assert _exists(manager, config.DELETE_FOLDER + "/" + worst)
+    assert _exists(manager, config.KEEP_FOLDER + "/" + best)
+    assert not _exists(manager, worst) and not _exists(manager, best)
+    remaining = set(relative_paths) - {worst, best}
+    assert set(manager.metadata.keys()) == remaining
+
+    # The folders are never scanned, so the photos stay out of the library
+    assert set(open_manager(manager.photo_folder).metadata.keys()) == remaining
+    assert not os.path.exists(os.path.join(manager.photo_folder, JOURNAL_FILE))
+
+
+def test_cull_does_not_overwrite_an_earlier_cull(rated):
+    manager, _, worst, best = rated
+    earlier = os.path.join(manager.photo_folder, config.DELETE_FOLDER, worst)
+    os.makedirs(os.path.dirname(earlier))
+    with open(earlier, "wb") as f:
+        f.write(b"culled before")
+
+    moved, failed = apply_cull(manager, plan_cull(manager))
+    assert moved == {"delete": 0, "keep": 1}
+    assert [path for path, _ in failed] == [worst]
+    assert _exists(manager, worst) and worst in manager.metadata
+    with open(earlier, "rb") as f:
+        assert f.read() == b"culled before"
+
+
+def test_resumed_cull_keeps_a_failed_move_in_place(rated, open_manager):
+    """A move that failed before a crash is not re-counted as moved on resume"""
+    manager, _, worst, best = rated
+    renames = [(worst, config.DELETE_FOLDER + "/" + worst)]
+    renames.append((best, config.KEEP_FOLDER + "/" + best))
+    for _, new in renames:
+        os.makedirs(os.path.join(manager.photo_folder, os.path.dirname(new)))
+    job, _ = RenameJob.plan(manager.photo_folder, renames)
+    earlier = os.path.join(manager.photo_folder, renames[0][1])
+    with open(earlier, "wb") as f:
+        f.write(b"culled before")
+    job.run()  # Then the app crashes before updating the metadata
+
+    reopened = open_manager(manager.photo_folder, scan=False)
+    count, failed = resume_renames(reopened)
+    assert count == 1 and [path for path, _ in failed] == [worst]
+    assert worst in reopened.metadata and _exists(reopened, worst)
+    assert renames[0][1] not in reopened.metadata
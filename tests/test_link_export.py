@@ -0,0 +1,66 @@
+"""Ranked link-farm export"""
+
+import os
+
+import pytest
+
+from link_export import MANIFEST_FILE, export_links, plan_link_export
+
+
+@pytest.fixture
+def library(make_library):
+    return make_library(12)
+
+
+def _linked(export_folder):
+    return sorted(name for name in os.listdir(export_folder) if name != MANIFEST_FILE)
+
+
+def test_export_links_every_photo_and_leaves_originals(library, open_manager):
+    folder, relative_paths = library
+    manager = open_manager(folder)
+    export_folder = os.path.join(folder, "ranked")
+
+    result = export_links(manager, export_folder)
+    assert result["created"] == len(relative_paths) and not result["failed"]
+    assert len(_linked(export_folder)) == len(relative_paths)
+    for relative_path in relative_paths:
+        assert os.path.isfile(os.path.join(folder, relative_path))
+
+    # Nothing changed: nothing is touched
+    again = export_links(manager, export_folder)
+    assert (again["created"], again["removed"], again["kept"]) == (
+        0,
+        0,
+        len(relative_paths),
+    )
+
+
+def test_export_follows_rating_changes(library, open_manager):
+    folder, relative_paths = library
+    manager = open_manager(folder)
+    export_folder = os.path.join(folder, "ranked")
+    export_links(manager, export_folder)
+
+    photo = relative_paths[0]
+    manager.metadata[photo].update(skill=-manager.metadata[photo]["skill"] - 4)
+    result = export_links(manager, export_folder)
+    assert (result["created"], result["removed"]) == (1, 1)
+    assert len(_linked(export_folder)) == len(relative_paths)
+
+
+def test_flattened_name_collisions_get_a_suffix(tmp_path, open_manager):
+    folder = tmp_path / "library"
+    for relative_path in ("a/b__c.jpg", "a__b/c.jpg"):
+        path = folder / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"not really a jpeg " + relative_path.encode())
+    manager = open_manager(str(folder))
+
+    links = plan_link_export(manager)
+    assert sorted(links.values()) == ["a/b__c.jpg", "a__b/c.jpg"]
+    assert any("~2" in name for name in links)
+
+    export_folder = str(tmp_path / "ranked")
+    assert export_links(manager, export_folder)["created"] == 2
+    assert len(_linked(export_folder)) == 2
@@ -0,0 +1,28 @@
+"""Loading, sharding and cache bookkeeping of MetadataManager"""
+
+import os
+
+import config
+
+
+def test_partial_shard_load_keeps_other_shards_hashes(
+    monkeypatch, make_library, open_manager
+):
+    monkeypatch.setattr(config, "METADATA_SHARD_DEPTH", 1)
+    folder, relative_paths = make_library(24)  # 2015/01..12 and 2016/01..12
+    images = [path for path in relative_paths if path.endswith(".jpg")]
+
+    manager = open_manager(folder)
+    manager.flush()
+    assert set(manager.hash_cache.get_hashes()) == set(images)
+
+    partial = open_manager(folder, shards=["2016"])
+    assert all(path.startswith("2016/") for path in partial.metadata.keys())
+    assert set(partial.hash_cache.get_hashes()) == set(images)
+    assert set(partial.fingerprints.entries) == set(relative_paths)
+
+    # A full load still forgets files that are gone
+    removed = images[0]
+    os.remove(os.path.join(folder, removed))
+    full = open_manager(folder)
+    assert removed not in full.hash_cache.get_hashes()
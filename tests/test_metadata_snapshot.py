@@ -0,0 +1,86 @@
+"""Binary metadata snapshot: writing and memory-mapping it back"""
+
+import os
+
+import pytest
+
+import config
+from columnar_metadata import ColumnarMetadata
+from metadata_snapshot import read_snapshot, write_snapshot
+from path_table import PathTable
+
+ENTRIES = {
+    "2015/01/a.jpg": {
+        "keep": True,
+        "rating": 4,
+        "tags": ["beach", "family"],
+        "last_compared": "2024-05-01T10:30:00",
+        "created_date": "2015-01-03T08:00:00",
+        "skill": 1.75,
+        "comparisons": 12,
+        "epoch": 2,
+        "prior_weight": 1.5,
+        "prior_skill": -0.25,
+        "quality": {"sharpness": 0.5, "dark_clip": 0.125, "bright_clip": 0.0},
+        "camera": "X100",
+    },
+    "2015/01/b.jpg": {"skill": -0.5, "comparisons": 3, "epoch": 2},
+    "2015/02/ünïcode name.jpg": {"skill": 0.0, "comparisons": 0, "quality": None},
+}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ColumnarMetadata.from_dict(PathTable(str(tmp_path)), ENTRIES)
+
+
+def test_snapshot_round_trip(store, tmp_path):
+    snapshot_file = str(tmp_path / "metadata.bin")
+    write_snapshot(store, snapshot_file)
+    loaded = read_snapshot(snapshot_file, str(tmp_path))
+    assert loaded.to_dict() == store.to_dict()
+    assert set(loaded.keys()) == set(ENTRIES)
+
+
+def test_snapshot_of_selected_rows(store, tmp_path):
+    snapshot_file = str(tmp_path / "metadata.bin")
+    row = store.paths.intern("2015/01/a.jpg")
+    write_snapshot(store, snapshot_file, rows=[row])
+    loaded = read_snapshot(snapshot_file, str(tmp_path))
+    assert loaded.to_dict() == store.to_dict([row])
+
+
+def test_empty_snapshot(tmp_path):
+    snapshot_file = str(tmp_path / "metadata.bin")
+    write_snapshot(ColumnarMetadata(PathTable(str(tmp_path))), snapshot_file)
+    assert len(read_snapshot(snapshot_file, str(tmp_path))) == 0
+
+
+def test_not_a_snapshot(tmp_path):
+    snapshot_file = tmp_path / "metadata.bin"
+    snapshot_file.write_bytes(b"{}" * 64)
+    with pytest.raises(ValueError):
+        read_snapshot(str(snapshot_file), str(tmp_path))
+
+
+def test_edits_to_a_mapped_snapshot_are_saved(make_library, open_manager, monkeypatch):
+    """Copy-on-write: an edit stays in memory until the manager rewrites the
+    snapshot it is mapped from, and then survives a reopen"""
+    monkeypatch.setattr(config, "METADATA_FORMAT", "binary")
+    folder, relative_paths = make_library(12)
+    converted = open_manager(folder)  # Imports the JSON metadata
+    converted.save_metadata()
+    converted.flush()
+    os.remove(converted.metadata_file)  # From here on only the snapshot exists
+
+    manager = open_manager(folder)
+    before = manager.metadata.to_dict()
+    photo = relative_paths[0]
+    manager.metadata[photo].update(skill=3.5, comparisons=40)
+    manager.metadata[photo].edit_tags().append("best")
+    manager.save_metadata()
+    manager.flush()
+
+    reopened = open_manager(folder).metadata.to_dict()
+    before[photo].update(skill=3.5, comparisons=40, tags=["best"])
+    assert reopened == before
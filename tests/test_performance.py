@@ -0,0 +1,128 @@
+"""
+Size-scaling performance tests
+Each test times an operation on synthetic libraries of two sizes and bounds how
+much the cost per vote or per file may grow between them, so an accidental
+O(n) step in the vote path or an O(n^2) loop in syncing fails here instead of on
+a user's 100k-photo library. The bounds leave room for timing noise; a change in
+complexity class overshoots them by far more.
+"""
+
+import os
+import time
+
+import numpy as np
+import pytest
+
+import config
+from benchmarks.synthetic_library import generate_library, generate_metadata
+from conftest import best_of
+from library_sync import sync_library
+from metadata_manager import MetadataManager
+from pair_selection import comparison_pool, sample_pair
+from rename_planner import get_base_filename, quantile_prefix
+
+pytestmark = pytest.mark.perf
+
+VOTE_SIZES = (1_000, 100_000)
+VOTES = 200  # Votes per timed run
+VOTE_GROWTH_LIMIT = 3.0  # Per-vote cost at the larger size / the smaller one
+
+SYNC_SIZES = (500, 5_000)
+SYNC_GROWTH_LIMIT = 3.0
+SYNC_BUDGET_PER_FILE = 100e-6  # Seconds per file for a sync with no changes
+
+RENAMED_SIZES = (500, 4_000)
+RENAMED_GROWTH_LIMIT = 3.0
+
+
+def _open(folder, opened, scan=True):
+    manager = MetadataManager(folder)
+    manager.load_metadata(scan=scan)
+    opened.append(manager)
+    return manager
+
+
+def _assert_growth(name, costs, limit):
+    small, large = costs
+    assert large <= small * limit, (
+        f"{name}: {small * 1e6:.1f}us -> {large * 1e6:.1f}us per item "
+        f"(x{large / small:.1f}, limit x{limit})"
+    )
+
+
+def test_vote_cost_independent_of_library_size(tmp_path, opened_managers):
+    """Selecting a pair and recording the vote (the app's per-keypress work)"""
+    costs = []
+    for size in VOTE_SIZES:
+        folder = str(tmp_path / f"votes_{size}")
+        generate_metadata(folder, size)
+        manager = _open(folder, opened_managers, scan=False)
+        photo_ids, _ = comparison_pool(manager, list(manager.metadata.keys()))
+        paths = manager.paths
+        rng = np.random.default_rng(0)
+
+        def vote():
+            for _ in range(VOTES):
+                left, right = sample_pair(manager, photo_ids, rng=rng)
+                manager.update_skills(paths.path_of(left), paths.path_of(right), "left")
+
+        # Saves are left out: the write-behind flush rewrites the whole file by
+        # design and is timed by the benchmarks
+        with manager.persistence.batch():
+            costs.append(best_of(vote) / VOTES)
+
+    _assert_growth("vote", costs, VOTE_GROWTH_LIMIT)
+
+
+def test_sync_unchanged_library_within_budget(tmp_path, opened_managers):
+    """sync_library (the app's Sync Files) on a library nothing changed in"""
+    costs = []
+    for size in SYNC_SIZES:
+        folder = str(tmp_path / f"sync_{size}")
+        generate_library(folder, size)
+        manager = _open(folder, opened_managers)
+        costs.append(best_of(lambda: sync_library(manager), repeats=3) / size)
+
+    assert costs[-1] <= SYNC_BUDGET_PER_FILE, (
+        f"sync: {costs[-1] * 1e6:.1f}us per file "
+        f"(budget {SYNC_BUDGET_PER_FILE * 1e6:.0f}us)"
+    )
+    _assert_growth("sync", costs, SYNC_GROWTH_LIMIT)
+
+
+@pytest.mark.parametrize("fingerprints", [True, False], ids=["content", "base_name"])
+def test_sync_renamed_files_scales_linearly(
+    tmp_path, opened_managers, monkeypatch, fingerprints
+):
+    """sync_library after every file got a new quantile prefix behind the app's
+    back: renamed files are matched by content, or by base name without
+    fingerprints, and both must stay linear in the number of renamed files"""
+    monkeypatch.setattr(config, "ENABLE_CONTENT_FINGERPRINTS", fingerprints)
+    costs = []
+    for size in RENAMED_SIZES:
+        folder = str(tmp_path / f"renamed_{size}")
+        generate_library(folder, size)
+        manager = _open(folder, opened_managers)
+
+        timings = []
+        for quantile in (10, 20, 30):
+            _prefix_every_file(manager, quantile)
+            start = time.perf_counter()
+            result = sync_library(manager)
+            timings.append(time.perf_counter() - start)
+            assert result["reattached"] + result["transferred"] == size
+            assert not result["added"] and not result["removed"]
+        costs.append(min(timings) / size)
+
+    _assert_growth("sync renamed files", costs, RENAMED_GROWTH_LIMIT)
+
+
+def _prefix_every_file(manager, quantile):
+    """Rename every file of the library to a new quantile prefix on disk only"""
+    for relative_path in list(manager.metadata.keys()):
+        folder, filename = os.path.split(relative_path)
+        new_name = quantile_prefix(quantile) + get_base_filename(filename)
+        os.rename(
+            os.path.join(manager.photo_folder, relative_path),
+            os.path.join(manager.photo_folder, folder, new_name),
+        )
@@ -0,0 +1,238 @@
+"""Journaled renames: interrupted jobs are resumed or rolled back without losing
+a file or its rating"""
+
+import os
+
+import pytest
+
+import config
+from rename_journal import RenameJob
+from rename_planner import (
+    apply_renames,
+    pending_renames,
+    resume_renames,
+    rollback_renames,
+)
+
+
+class Interrupted(Exception):
+    pass
+
+
+@pytest.fixture
+def library(make_library, monkeypatch):
+    monkeypatch.setattr(config, "RENAME_BATCH_SIZE", 2)
+    folder, relative_paths = make_library(12)
+    return folder, [path for path in relative_paths if path.endswith(".jpg")]
+
+
+def _renames(photos):
+    """Rotate the names of four photos (each new name is freed by another rename,
+    so they are parked first) and prefix the rest"""
+    rotated = photos[:4]
+    renames = list(zip(rotated, rotated[1:] + rotated[:1]))
+    for relative_path in photos[4:]:
+        folder, filename = os.path.split(relative_path)
+        renames.append((relative_path, f"{folder}/Q050_{filename}"))
+    return renames
+
+
+def _contents(folder, relative_paths):
+    contents = {}
+    for relative_path in relative_paths:
+        with open(os.path.join(folder, relative_path), "rb") as f:
+            contents[relative_path] = f.read()
+    return contents
+
+
+def _ratings(manager):
+    return {
+        path: (entry["skill"], entry["comparisons"])
+        for path, entry in manager.metadata.items()
+    }
+
+
+def _interrupt_after(batches):
+    calls = []
+
+    def progress(index, total, relative_path):
+        calls.append(relative_path)
+        if len(calls) == batches:
+            raise Interrupted
+
+    return progress
+
+
+def _renamed(mapping, renames):
+    """mapping with its keys moved to their new names"""
+    new_names = dict(renames)
+    return {new_names.get(path, path): value for path, value in mapping.items()}
+
+
+def test_apply_renames_moves_files_and_ratings(library, open_manager):
+    folder, photos = library
+    manager = open_manager(folder)
+    renames = _renames(photos)
+    contents = _contents(folder, photos)
+    ratings = _ratings(manager)
+
+    assert apply_renames(manager, renames) == (len(renames), [])
+    assert _contents(folder, [new for _, new in renames]) == _renamed(contents, renames)
+    assert _ratings(manager) == _renamed(ratings, renames)
+    assert _ratings(open_manager(folder)) == _renamed(ratings, renames)
+    assert pending_renames(folder) == 0
+
+
+@pytest.mark.parametrize("batches", [1, 3, 5, 7])
+def test_interrupted_job_is_resumed(library, open_manager, batches):
+    folder, photos = library
+    manager = open_manager(folder)
+    renames = _renames(photos)
+    contents = _contents(folder, photos)
+    ratings = _ratings(manager)
+
+    job, rejected = RenameJob.plan(folder, renames)
+    assert not rejected
+    with pytest.raises(Interrupted):
+        job.run(progress=_interrupt_after(batches))
+    assert pending_renames(folder) == len(renames)
+    with pytest.raises(RuntimeError):
+        RenameJob.plan(folder, renames)  # The journal has to be dealt with first
+
+    # Recovery runs before the startup scan, as in the app
+    reopened = open_manager(folder, scan=False)
+    assert resume_renames(reopened) == (len(renames), [])
+    assert pending_renames(folder) == 0
+    assert _contents(folder, [new for _, new in renames]) == _renamed(contents, renames)
+    assert _ratings(reopened) == _renamed(ratings, renames)
+    assert resume_renames(reopened) is None
+
+
+@pytest.mark.parametrize("batches", [1, 3, 5, 7])
+def test_interrupted_job_is_rolled_back(library, open_manager, batches):
+    folder, photos = library
+    manager = open_manager(folder)
+    renames = _renames(photos)
+    contents = _contents(folder, photos)
+    ratings = _ratings(manager)
+
+    job, _ = RenameJob.plan(folder, renames)
+    with pytest.raises(Interrupted):
+        job.run(progress=_interrupt_after(batches))
+
+    reopened = open_manager(folder, scan=False)
+    assert rollback_renames(reopened) == (len(renames), [])
+    assert pending_renames(folder) == 0
+    assert _contents(folder, photos) == contents
+    assert _ratings(reopened) == ratings
+    assert rollback_renames(reopened) is None
+
+
+def test_rollback_after_the_metadata_moved(library, open_manager):
+    """Interrupted between saving the new keys and deleting the journal: the
+    rollback moves the ratings back along with the files"""
+    folder, photos = library
+    manager = open_manager(folder)
+    renames = _renames(photos)
+    contents = _contents(folder, photos)
+    ratings = _ratings(manager)
+
+    job, _ = RenameJob.plan(folder, renames)
+    moved, _ = job.run()
+    manager.metadata.rename_many(moved.items())
+    manager.save_metadata()
+    manager.flush()
+    job.mark_metadata_updated()
+
+    reopened = open_manager(folder, scan=False)
+    assert _ratings(reopened) == _renamed(ratings, renames)
+    assert rollback_renames(reopened) == (len(renames), [])
+    assert _contents(folder, photos) == contents
+    assert _ratings(reopened) == ratings
+    assert _ratings(open_manager(folder)) == ratings
+
+
+def test_resume_after_the_metadata_moved_only_clears_the_journal(library, open_manager):
+    folder, photos = library
+    manager = open_manager(folder)
+    renames = _renames(photos)
+    job, _ = RenameJob.plan(folder, renames)
+    moved, _ = job.run()
+    manager.metadata.rename_many(moved.items())
+    manager.save_metadata()
+    manager.flush()
+    job.mark_metadata_updated()
+    ratings = _ratings(manager)
+
+    reopened = open_manager(folder, scan=False)
+    assert resume_renames(reopened) == (0, [])
+    assert pending_renames(folder) == 0
+    assert _ratings(reopened) == ratings
+
+
+def test_colliding_renames_are_rejected_and_leave_files_alone(library, open_manager):
+    folder, photos = library
+    manager = open_manager(folder)
+    contents = _contents(folder, photos)
+    taken = photos[1]  # Exists and is not renamed itself
+    renames = [(photos[0], taken), (photos[2], "new.jpg"), (photos[3], "new.jpg")]
+
+    success, failed = apply_renames(manager, renames)
+    assert success == 1
+    assert {path for path, _ in failed} == {photos[0], photos[3]}
+    assert _contents(folder, [photos[0], taken, photos[3], "new.jpg"]) == {
+        photos[0]: contents[photos[0]],
+        taken: contents[taken],
+        photos[3]: contents[photos[3]],
+        "new.jpg": contents[photos[2]],
+    }
+    assert "new.jpg" in manager.metadata and photos[2] not in manager.metadata
+
+
+def test_resume_keeps_a_failed_step_failed(library, open_manager):
+    """A step that failed before a crash (its new name was taken after planning)
+    must not count as renamed when the job is resumed, or its rating would move
+    onto the unrelated file"""
+    folder, photos = library
+    manager = open_manager(folder)
+    ratings = _ratings(manager)
+    renames = _renames(photos)
+    blocked, taken = renames[-1]
+
+    job, _ = RenameJob.plan(folder, renames)
+    with open(os.path.join(folder, taken), "wb") as f:
+        f.write(b"arrived after planning")
+    moved, failed = job.run()  # Then the app crashes before updating the metadata
+    assert blocked not in moved and [path for path, _ in failed] == [blocked]
+
+    reopened = open_manager(folder, scan=False)
+    count, failed = resume_renames(reopened)
+    assert count == len(renames) - 1
+    assert [path for path, _ in failed] == [blocked]
+    assert reopened.metadata[blocked]["skill"] == ratings[blocked][0]
+    assert taken not in reopened.metadata
+    with open(os.path.join(folder, taken), "rb") as f:
+        assert f.read() == b"arrived after planning"
+
+
+def test_rollback_leaves_the_rating_of_a_failed_step_alone(library, open_manager):
+    folder, photos = library
+    manager = open_manager(folder)
+    ratings = _ratings(manager)
+    renames = _renames(photos)
+    blocked, taken = renames[-1]
+
+    job, _ = RenameJob.plan(folder, renames)
+    with open(os.path.join(folder, taken), "wb") as f:
+        f.write(b"arrived after planning")
+    moved, _ = job.run()
+    manager.metadata[taken] = {"skill": 5.0, "comparisons": 9}
+    manager.metadata.rename_many(moved.items())
+    manager.save_metadata()
+    manager.flush()
+    job.mark_metadata_updated()
+
+    reopened = open_manager(folder, scan=False)
+    assert rollback_renames(reopened) == (len(renames) - 1, [])
+    assert _ratings(reopened)[blocked] == ratings[blocked]
+    assert _ratings(reopened)[taken] == (5.0, 9)